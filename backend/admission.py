@@ -0,0 +1,151 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from config.config import configuration
+from backend.metrics import registry
+
+# Ограничение одновременной работы по классам эндпоинтов (поиск и загрузка не отнимают слоты друг у друга),
+# ограниченная очередь ожидания с быстрым отказом 503 и сквозной дедлайн запроса.
+
+admission_rejected = registry.counter(
+    "admission_rejected_total", "Requests rejected by admission control", ("endpoint_class", "reason"))
+deadline_exceeded = registry.counter(
+    "deadline_exceeded_total", "Requests that ran out of their deadline", ("endpoint_class",))
+
+
+class Overloaded(Exception):
+    """Нет свободного слота: очередь заполнена или ожидание слота истекло"""
+
+    def __init__(self, endpoint_class: str, reason: str, retry_after: float):
+        super().__init__(f"{endpoint_class} is overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+def remaining_time() -> Optional[float]:
+    """Секунды до дедлайна текущего запроса (None - дедлайна нет)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("request deadline exceeded")
+    return remaining
+
+
+async def with_deadline(awaitable):
+    """Ожидание с оставшимся временем запроса в качестве таймаута"""
+    timeout = remaining_time()
+    if timeout is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("request deadline exceeded") from None
+
+
+class AdmissionController:
+    """Не больше max_concurrent запросов класса одновременно и не больше max_queue ожидающих.
+
+    Запрос сверх очереди отклоняется сразу; запрос из очереди, не дождавшийся слота
+    за queue_timeout (или до своего дедлайна), тоже отклоняется - клиент получает 503 с Retry-After,
+    а не ответ по таймауту после того, как его время уже истекло.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float,
+                 timeout: Optional[float] = None, retry_after: float = 1.0):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self.waiting = 0
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _reject(self, reason: str):
+        admission_rejected.inc(endpoint_class=self.name, reason=reason)
+        return Overloaded(self.name, reason, self.retry_after)
+
+    def _abandon(self, acquire: asyncio.Future):
+        """Отказ от ожидания слота: если семафор всё же захвачен, слот сразу освобождается"""
+        def release_if_acquired(task: asyncio.Future):
+            if not task.cancelled() and task.exception() is None:
+                self._semaphore.release()
+        acquire.add_done_callback(release_if_acquired)
+        acquire.cancel()
+
+    @asynccontextmanager
+    async def slot(self, use_deadline: bool = True):
+        """Слот на время обработки запроса; use_deadline=False - без сквозного дедлайна (потоковая загрузка)"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        deadline = time.monotonic() + self.timeout if self.timeout and use_deadline else None
+
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                raise self._reject("queue_full")
+            wait = self.queue_timeout if deadline is None else min(self.queue_timeout, deadline - time.monotonic())
+            self.waiting += 1
+            # Ожидание отдельной задачей, а не wait_for: слот, полученный одновременно с таймаутом
+            # или отменой запроса, возвращается (_abandon), а не теряется
+            acquire = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                done, _ = await asyncio.wait({acquire}, timeout=max(wait, 0))
+            except BaseException:
+                self._abandon(acquire)
+                raise
+            finally:
+                self.waiting -= 1
+            if not done:
+                self._abandon(acquire)
+                raise self._reject("queue_timeout")
+        else:
+            await self._semaphore.acquire()
+
+        self.active += 1
+        token = _deadline.set(deadline)
+        try:
+            yield
+        except DeadlineExceeded:
+            deadline_exceeded.inc(endpoint_class=self.name)
+            raise
+        finally:
+            _deadline.reset(token)
+            self.active -= 1
+            self._semaphore.release()
+
+    def metrics(self):
+        yield f"admission_{self.name}_active", "gauge", f"{self.name} requests being processed", self.active
+        yield f"admission_{self.name}_waiting", "gauge", f"{self.name} requests waiting for a slot", self.waiting
+
+
+search_admission = AdmissionController(
+    "search",
+    max_concurrent=configuration.search_max_concurrency,
+    max_queue=configuration.search_max_queue,
+    queue_timeout=configuration.admission_queue_timeout_seconds,
+    timeout=configuration.search_timeout_seconds,
+    retry_after=configuration.admission_retry_after_seconds,
+)
+ingest_admission = AdmissionController(
+    "ingest",
+    max_concurrent=configuration.ingest_max_concurrency,
+    max_queue=configuration.ingest_max_queue,
+    queue_timeout=configuration.admission_queue_timeout_seconds,
+    timeout=configuration.ingest_timeout_seconds,
+    retry_after=configuration.admission_retry_after_seconds,
+)
+registry.add_collector(search_admission.metrics)
+registry.add_collector(ingest_admission.metrics)
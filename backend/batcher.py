@@ -0,0 +1,97 @@
+import asyncio
+from typing import List, Optional, Tuple
+
+from config.config import configuration
+from backend.utils import embedding_cache
+from backend.embedding_server import embed_texts_cached
+from backend.metrics import embedding_batch_size
+from logger.logger import back_logger
+
+
+class EmbeddingBatcher:
+    """Динамический батчер запросов на векторизацию.
+
+    Запросы, пришедшие в пределах короткого окна (не дольше max_wait_ms и не больше
+    max_batch_size штук), векторизуются одним вызовом эмбеддера в пуле потоков
+    (или одним запросом к серверу эмбеддингов), поэтому event loop не блокируется
+    на время прохода модели или обращения к API.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        # Не оставляем висящих запросов после остановки
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Embedding batcher stopped"))
+
+    async def embed(self, text: str, use_cache: bool = True) -> List[float]:
+        if use_cache:
+            # Попадание в память отдаём сразу, без ожидания окна батчинга
+            vector = embedding_cache.get(text, memory_only=True)
+            if vector is not None:
+                return vector
+        if self._worker is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, use_cache, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, bool, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            # Запросы, которые уже отменены клиентом, не векторизуем
+            batch = [item for item in batch if not item[2].done()]
+            if not batch:
+                continue
+            embedding_batch_size.observe(len(batch), source="query_batcher")
+            texts = [text for text, _, _ in batch]
+            use_cache = [cached for _, cached, _ in batch]
+            try:
+                vectors = await embed_texts_cached(texts, use_cache)
+            except Exception as e:
+                back_logger.error(f"Error during batch embedding of {len(texts)} texts: {e}")
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, _, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+
+query_batcher = EmbeddingBatcher(
+    max_batch_size=configuration.query_batch_max_size,
+    max_wait_ms=configuration.query_batch_max_wait_ms,
+)
@@ -0,0 +1,192 @@
+import hashlib
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+import pandas as pd
+
+from backend.normalization import split_authors_column
+from config.config import configuration
+
+# Подготовка датасета статей колоночными операциями pandas.
+#
+# preprocess.py один раз превращает исходный CSV в типизированный Parquet (article_schema):
+# даты разобраны, теги и авторы разбиты на списки, текст для векторизации собран.
+# fill_vdb.py читает Parquet пакетами строк и не разбирает CSV при каждой переиндексации;
+# если подготовленного файла нет, те же функции применяются к CSV по частям.
+
+DATASET_COLUMNS = ["id", "title", "authors", "date", "topics", "text", "link", "summary"]
+# Даты датасета - день.месяц.год; ISO (год-месяц-день) допускается для статей из других источников
+DATE_FORMAT = "%d.%m.%Y"
+
+
+def _raw_column(df: pd.DataFrame, name: str) -> pd.Series:
+    return df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+
+def _text_column(df: pd.DataFrame, name: str, default: str = "") -> pd.Series:
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[name].where(df[name].notna(), default).astype(str)
+
+
+def parse_dates(values: pd.Series) -> pd.Series:
+    """Даты публикации: DATE_FORMAT, затем ISO 8601; неразобранные - NaT"""
+    values = values.astype("string").str.strip()
+    dates = pd.to_datetime(values, format=DATE_FORMAT, errors="coerce")
+    rest = dates.isna() & values.notna()
+    if rest.any():
+        dates[rest] = pd.to_datetime(values[rest], format="ISO8601", errors="coerce")
+    return dates
+
+
+def split_tags(topics: pd.Series) -> pd.Series:
+    """Строка тем "a; b, c" -> список тегов без пустых"""
+    tags = topics.fillna("").astype(str).str.replace(";", ",", regex=False).str.split(",").explode().str.strip()
+    tags = tags[tags != ""]
+    return tags.groupby(level=0).agg(list).reindex(topics.index).map(
+        lambda value: value if isinstance(value, list) else [])
+
+
+def fallback_ids(df: pd.DataFrame) -> pd.Series:
+    # Детерминированный id для строк без id (как Article.document_id): повторная загрузка не плодит дубликаты
+    keys = _text_column(df, "link")
+    keys = keys.where(keys != "", _text_column(df, "title") + "\n" + _text_column(df, "summary"))
+    return keys.map(lambda key: hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+
+def prepare_articles(df: pd.DataFrame, seen_ids: Optional[set] = None,
+                     missing_date: str = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Сырые строки датасета -> (подготовленные статьи, отклонённые строки с причиной).
+
+    Строки без аннотации и с повтором id отклоняются. Статьи с отсутствующей или неразборчивой датой
+    по умолчанию остаются без даты (дату загрузки им ставит fill_vdb.py), при missing_date="reject"
+    (MISSING_DATE_POLICY) - отклоняются.
+    seen_ids - id из предыдущих частей того же датасета (дополняется на месте).
+    """
+    missing_date = missing_date or configuration.missing_date_policy
+    ids = _raw_column(df, "id").copy()
+    if ids.isna().any():
+        ids[ids.isna()] = fallback_ids(df[ids.isna()])
+    ids = ids.astype(str)
+    raw_dates = _raw_column(df, "date")
+    dates = parse_dates(raw_dates)
+
+    # Причины проверяются от менее важной к более важной: у строки остаётся последняя подошедшая
+    reasons = pd.Series(None, index=df.index, dtype=object)
+    if missing_date == "reject":
+        reasons[dates.isna() & raw_dates.notna()] = "invalid_date"
+        reasons[raw_dates.isna()] = "missing_date"
+    reasons[_raw_column(df, "summary").isna()] = "missing_summary"
+    # Повтор id ищется среди строк, прошедших остальные проверки: отклонённая строка не отнимает id у следующей
+    valid_ids = ids[reasons.isna()]
+    duplicated = valid_ids.duplicated() | (valid_ids.isin(seen_ids) if seen_ids else False)
+    reasons[duplicated[duplicated].index] = "duplicate_id"
+    rejected = reasons.notna()
+
+    kept = df.index[~rejected]
+    if seen_ids is not None:
+        seen_ids.update(ids[kept])
+    title = _text_column(df, "title", "Без названия").str.lower()
+    abstract = _text_column(df, "summary")
+    articles = pd.DataFrame({
+        "id": ids,
+        "title": title,
+        "url": _text_column(df, "link"),
+        "abstract": abstract,
+        "full_text": _text_column(df, "text"),
+        "author": _text_column(df, "authors", "Unknown"),
+        "authors": split_authors_column(_raw_column(df, "authors")),
+        "published_date": dates.dt.date,
+        "tags": split_tags(_raw_column(df, "topics")),
+        # Текст для векторизации: Заголовок + краткое содержание
+        "text_to_embed": title + ". " + abstract,
+    }, index=df.index).loc[kept].reset_index(drop=True)
+
+    rejects = pd.DataFrame({"id": ids[rejected], "reason": reasons[rejected]})
+    return articles, rejects
+
+
+def article_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("title", pa.string()),
+        ("url", pa.string()),
+        ("abstract", pa.string()),
+        ("full_text", pa.string()),
+        ("author", pa.string()),
+        ("authors", pa.list_(pa.string())),
+        ("published_date", pa.date32()),
+        ("tags", pa.list_(pa.string())),
+        ("text_to_embed", pa.string()),
+    ])
+
+
+def read_csv_chunks(csv_path: Path, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+    """Потоковое чтение CSV: только нужные колонки, по chunk_size строк (номер строки файла - индекс)"""
+    reader = pd.read_csv(csv_path, usecols=lambda column: column in DATASET_COLUMNS,
+                         dtype={"id": str}, chunksize=chunk_size or configuration.csv_chunk_size)
+    offset = 0
+    for chunk in reader:
+        # Номер строки CSV с учётом заголовка - для отчёта об отклонённых строках
+        chunk.index = pd.RangeIndex(offset + 2, offset + 2 + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+
+def write_prepared_dataset(csv_path: Path, output_path: Path, rejects_path: Optional[Path] = None,
+                           chunk_size: int = None) -> dict:
+    """CSV -> Parquet подготовленных статей и CSV отклонённых строк; возвращает счётчики"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    output_path = Path(output_path)
+    tmp_path = output_path.with_name(output_path.name + ".tmp")
+    schema = article_schema()
+    seen_ids = set()
+    rejects = []
+    written = 0
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for chunk in read_csv_chunks(csv_path, chunk_size):
+            articles, chunk_rejects = prepare_articles(chunk, seen_ids)
+            rejects.append(chunk_rejects.rename_axis("line").reset_index())
+            if len(articles):
+                writer.write_table(pa.Table.from_pandas(articles, schema=schema, preserve_index=False))
+                written += len(articles)
+    tmp_path.replace(output_path)
+
+    rejects = pd.concat(rejects, ignore_index=True) if rejects else pd.DataFrame(columns=["line", "id", "reason"])
+    if rejects_path is not None:
+        rejects.to_csv(rejects_path, index=False)
+    return {"articles": written, "rejected": len(rejects),
+            "rejected_by_reason": rejects["reason"].value_counts().to_dict()}
+
+
+def read_prepared_dataset(path: Path, batch_size: int = None):
+    """Подготовленные статьи таблицами Arrow по batch_size строк"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_size or configuration.csv_chunk_size):
+        yield pa.Table.from_batches([batch])
+
+
+def iter_articles(dataset_path: Path, chunk_size: int = None):
+    """Подготовленные статьи таблицами Arrow (article_schema): из Parquet (preprocess.py)
+    или из CSV с подготовкой на лету"""
+    import pyarrow as pa
+
+    dataset_path = Path(dataset_path)
+    if dataset_path.suffix == ".parquet":
+        yield from read_prepared_dataset(dataset_path, chunk_size)
+        return
+    schema = article_schema()
+    seen_ids = set()
+    for chunk in read_csv_chunks(dataset_path, chunk_size):
+        articles, _ = prepare_articles(chunk, seen_ids)
+        yield pa.Table.from_pandas(articles, schema=schema, preserve_index=False)
+
+
+def default_prepared_path() -> Path:
+    return configuration.project_root / "data" / configuration.prepared_dataset_filename
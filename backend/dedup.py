@@ -0,0 +1,191 @@
+import re
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.config import configuration
+
+# Поиск почти-дубликатов статей при заполнении индекса (DEDUP_MODE).
+#
+# Кандидаты находятся MinHash/LSH по шинглам слов заголовка и аннотации: подпись из DEDUP_NUM_PERM
+# минимумов хэшей режется на DEDUP_BANDS полос, и статьи с совпавшей полосой попадают в одну
+# корзину. Стоимость проверки статьи - DEDUP_BANDS обращений к словарю и векторов только
+# кандидатов, поэтому дедупликация растёт линейно с числом статей, а не квадратично.
+# Кандидат подтверждается косинусной близостью векторов статей (DEDUP_COSINE_THRESHOLD).
+# Корзина хранит до MAX_BUCKET_ITEMS первых попавших в неё статей; повторная версия сравнивается
+# со всеми статьями своих корзин и считается дубликатом самой близкой (при равенстве - более ранней).
+# fill_vdb.py проверяет статьи в порядке датасета и при полной сборке, и при инкрементальном обновлении,
+# поэтому оставленная версия статьи не меняется между запусками.
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+# Простое число больше 2^32 для универсального хэширования (a * x + b) mod p
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+# Множитель для смешивания номера полосы с её хэшем
+BAND_SALT = np.uint64(0x9E3779B97F4A7C15)
+# Статей в одной корзине: ограничивает число кандидатов для частых полос (шаблонные аннотации)
+MAX_BUCKET_ITEMS = 8
+
+
+def shingles(text: str, size: int) -> List[str]:
+    """Шинглы из size подряд идущих слов текста без учёта регистра и пунктуации"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+class MinHashLSH:
+    """MinHash-подписи и LSH-корзины: ключ корзины - хэш полосы подписи вместе с номером полосы"""
+
+    def __init__(self, num_perm: int, bands: int, shingle_size: int, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("DEDUP_NUM_PERM must be divisible by DEDUP_BANDS")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2^29 и x < 2^32: a * x + b не переполняет uint64 до взятия остатка
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._band_powers = np.uint64(1000003) ** np.arange(self.rows, dtype=np.uint64)
+        self._band_salts = np.arange(1, bands + 1, dtype=np.uint64) * BAND_SALT
+        self._buckets: Dict[int, List[int]] = {}
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        items = shingles(text, self.shingle_size)
+        if not items:
+            return None
+        hashes = np.fromiter((zlib.crc32(item.encode("utf-8")) for item in items), dtype=np.uint64, count=len(items))
+        permuted = (hashes[:, None] * self._a + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        # Переполнение uint64 при умножении - часть хэша
+        with np.errstate(over="ignore"):
+            bands = (signature.reshape(self.bands, self.rows) * self._band_powers).sum(axis=1)
+            return (bands ^ self._band_salts).tolist()
+
+    def candidates(self, keys: Sequence[int]) -> List[int]:
+        """Статьи корзин, в которые попадает статья, в порядке добавления (без повторов)"""
+        found = {}
+        for key in keys:
+            for item in self._buckets.get(key, ()):
+                found[item] = None
+        return sorted(found)
+
+    def insert(self, keys: Sequence[int], item: int):
+        for key in keys:
+            bucket = self._buckets.setdefault(key, [])
+            if len(bucket) < MAX_BUCKET_ITEMS:
+                bucket.append(item)
+
+
+class Deduplicator:
+    """Проверка статей на почти-дубликаты уже загруженных.
+
+    vectors(keys) возвращает векторы статей по ключам хранилища эмбеддингов (None - вектора нет);
+    без хранилища векторы представителей держатся в памяти.
+    """
+
+    def __init__(self, mode: str, num_perm: int, bands: int, shingle_size: int, cosine_threshold: float,
+                 vectors: Optional[Callable[[Sequence[str]], List[Optional[np.ndarray]]]] = None):
+        self.mode = mode
+        self.cosine_threshold = cosine_threshold
+        self.lsh = MinHashLSH(num_perm, bands, shingle_size)
+        self._vectors = vectors
+        self._memory: Dict[int, np.ndarray] = {}
+        self._ids: List[str] = []
+        self._keys: List[str] = []
+        self._tags: List[List[str]] = []
+        # Объединение (DEDUP_MODE=merge): id представителя -> id дубликатов и теги
+        self.merges: Dict[str, dict] = {}
+        self.duplicates: List[Tuple[str, str, float]] = []
+        self.stats = {"checked": 0, "with_candidates": 0, "candidates": 0, "duplicates": 0}
+
+    @classmethod
+    def from_config(cls, vectors=None) -> Optional["Deduplicator"]:
+        if configuration.dedup_mode == "off":
+            return None
+        return cls(configuration.dedup_mode, configuration.dedup_num_perm, configuration.dedup_bands,
+                   configuration.dedup_shingle_size, configuration.dedup_cosine_threshold, vectors=vectors)
+
+    def _add(self, doc_id: str, key: str, tags: List[str], band_keys: List[int],
+             vector: Optional[Sequence[float]] = None):
+        item = len(self._ids)
+        self._ids.append(doc_id)
+        self._keys.append(key)
+        self._tags.append(list(tags) if self.mode == "merge" else [])
+        if self._vectors is None and vector is not None:
+            self._memory[item] = np.asarray(vector, dtype=np.float16)
+        self.lsh.insert(band_keys, item)
+
+    def _candidate_vectors(self, items: List[int]) -> List[Optional[np.ndarray]]:
+        if self._vectors is None:
+            return [self._memory.get(item) for item in items]
+        return self._vectors([self._keys[item] for item in items])
+
+    def check(self, doc_id: str, text: str, key: str, tags: List[str],
+              vector: Optional[Sequence[float]] = None) -> Optional[str]:
+        """id статьи, почти-дубликатом которой является статья (None - не дубликат, статья запоминается).
+
+        Без vector (статья не изменилась и не векторизуется) вектор берётся по ключу key из хранилища;
+        статья без вектора не проверяется, а только запоминается.
+        """
+        self.stats["checked"] += 1
+        signature = self.lsh.signature(text)
+        if signature is None:
+            return None
+        band_keys = self.lsh.band_keys(signature)
+        if vector is None and self._vectors is not None:
+            vector = self._vectors([key])[0]
+        items = [item for item in self.lsh.candidates(band_keys) if self._ids[item] != doc_id]
+        if items and vector is not None:
+            self.stats["with_candidates"] += 1
+            self.stats["candidates"] += len(items)
+            vector = np.asarray(vector, dtype=np.float32)
+            vector = vector / (np.linalg.norm(vector) or 1)
+            best, best_score = None, self.cosine_threshold
+            for item, candidate in zip(items, self._candidate_vectors(items)):
+                if candidate is None:
+                    continue
+                candidate = np.asarray(candidate, dtype=np.float32)
+                score = float(candidate @ vector / (np.linalg.norm(candidate) or 1))
+                # Кандидаты идут в порядке добавления: при равной близости остаётся более ранняя статья
+                if score > best_score or (best is None and score >= best_score):
+                    best, best_score = item, score
+            if best is not None:
+                self._record_duplicate(doc_id, best, best_score, tags)
+                return self._ids[best]
+        self._add(doc_id, key, tags, band_keys, vector)
+        return None
+
+    def _record_duplicate(self, doc_id: str, item: int, score: float, tags: List[str]):
+        canonical = self._ids[item]
+        self.stats["duplicates"] += 1
+        self.duplicates.append((doc_id, canonical, round(score, 4)))
+        if self.mode == "merge":
+            merge = self.merges.setdefault(canonical, {"duplicate_ids": [], "tags": list(self._tags[item]),
+                                                       "added_tags": []})
+            merge["duplicate_ids"].append(doc_id)
+            added = [tag for tag in tags if tag not in merge["tags"]]
+            merge["tags"] += added
+            merge["added_tags"] += added
+
+    def merge_actions(self) -> List[dict]:
+        """Частичные обновления представителей: id объединённых версий и объединение тегов"""
+        return [{"_op_type": "update", "_id": canonical,
+                 "doc": {"duplicate_ids": merge["duplicate_ids"], "metadata": {"tags": merge["tags"]}}}
+                for canonical, merge in self.merges.items()]
+
+    @property
+    def duplicate_ids(self) -> List[str]:
+        return [doc_id for doc_id, _, _ in self.duplicates]
+
+    def report(self) -> dict:
+        stats = dict(self.stats)
+        stats["dedup_rate"] = round(stats["duplicates"] / stats["checked"], 4) if stats["checked"] else 0.0
+        stats["candidates_per_article"] = round(stats["candidates"] / stats["checked"], 3) if stats["checked"] else 0.0
+        return stats
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+from logger.logger import back_logger
+
+# Варианты эмбеддера. Вектор одного текста у разных вариантов различается,
+# поэтому у каждого варианта свой индекс (backend.external.get_index_name) и свои ключи в хранилище эмбеддингов.
+
+
+class Embedder(ABC):
+    variant: str
+    # Векторы считает внешний платный API: прогрев не ускоряет первые запросы и расходует квоту
+    remote_api = False
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Векторы текстов матрицей float32 (len(texts) x dims)"""
+        ...
+
+    @abstractmethod
+    def dimension(self) -> int:
+        ...
+
+
+class GigaChatEmbedder(Embedder):
+    """GigaChat API через асинхронный клиент (backend.gigachat_client).
+
+    Клиент работает в собственном event loop в отдельном потоке: ограничения параллельности
+    и частоты запросов общие для потоков fill_vdb.py, пула потоков и event loop бэкенда.
+    """
+    variant = "gigachat"
+    remote_api = True
+
+    def __init__(self, model_name: str, credentials: str, verify_ssl: bool, **client_options):
+        super().__init__(model_name)
+        from backend.gigachat_client import AsyncGigaChatClient
+        self.client = AsyncGigaChatClient(credentials, model=model_name, verify_ssl=verify_ssl, **client_options)
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="gigachat", daemon=True).start()
+        back_logger.info("Using GigaChat API for embeddings")
+
+    def encode(self, texts):
+        return asyncio.run_coroutine_threadsafe(self.client.embed(texts), self._loop).result()
+
+    async def encode_async(self, texts: List[str]) -> np.ndarray:
+        """Векторизация из event loop без занятия потока на время запросов к API"""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.client.embed(texts), self._loop))
+
+    def dimension(self):
+        return 1024  # GigaChat embedding dimension
+
+
+class HFEmbedder(Embedder):
+    """SentenceTransformer в полной точности (эталон для квантованных вариантов)"""
+    variant = "hf"
+
+    def __init__(self, model_name: str, cache_dir: str, batch_size: int, threads: Optional[int] = None):
+        super().__init__(model_name)
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.threads = threads
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = self._load()
+        back_logger.info(f"Loaded HF model: {model_name} ({self.variant})")
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.model_name, cache_folder=self.cache_dir)
+
+    def encode(self, texts):
+        vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def dimension(self):
+        return self.model.get_sentence_embedding_dimension()
+
+
+class QuantizedHFEmbedder(HFEmbedder):
+    """Та же модель на CPU с динамической int8-квантизацией линейных слоёв (torch.quantization)"""
+    variant = "hf_int8"
+
+    def _load(self):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(self.model_name, cache_folder=self.cache_dir, device="cpu")
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class OnnxHFEmbedder(HFEmbedder):
+    """Модель, экспортированная в ONNX и исполняемая onnxruntime на CPU (sentence-transformers backend="onnx")"""
+    variant = "hf_onnx"
+
+    def _load(self):
+        import onnxruntime
+        from sentence_transformers import SentenceTransformer
+        session_options = onnxruntime.SessionOptions()
+        if self.threads:
+            session_options.intra_op_num_threads = self.threads
+        return SentenceTransformer(self.model_name, cache_folder=self.cache_dir, device="cpu", backend="onnx",
+                                   model_kwargs={"provider": "CPUExecutionProvider",
+                                                 "session_options": session_options})
+
+
+EMBEDDER_VARIANTS = {
+    embedder.variant: embedder for embedder in (GigaChatEmbedder, HFEmbedder, QuantizedHFEmbedder, OnnxHFEmbedder)
+}
+
+
+def create_embedder(variant: str, configuration) -> Embedder:
+    """Эмбеддер варианта variant с параметрами из конфигурации"""
+    if variant == GigaChatEmbedder.variant:
+        return GigaChatEmbedder(configuration.gigachat_embeddings_model, configuration.gigachat_credentials,
+                                configuration.gigachat_verify_ssl,
+                                scope=configuration.gigachat_scope,
+                                auth_url=configuration.gigachat_auth_url,
+                                api_url=configuration.gigachat_api_url,
+                                max_batch_size=configuration.gigachat_max_batch_size,
+                                max_concurrency=configuration.gigachat_max_concurrency,
+                                requests_per_second=configuration.gigachat_requests_per_second,
+                                max_retries=configuration.gigachat_max_retries,
+                                initial_backoff=configuration.gigachat_initial_backoff,
+                                max_backoff=configuration.gigachat_max_backoff,
+                                timeout=configuration.gigachat_timeout)
+    return EMBEDDER_VARIANTS[variant](configuration.hf_model_name, configuration.hf_cache_dir,
+                                      batch_size=configuration.embedding_batch_size,
+                                      threads=configuration.embedder_threads)
@@ -0,0 +1,268 @@
+import argparse
+import asyncio
+import json
+import os
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.config import configuration
+from logger.logger import back_logger
+
+# Сервер эмбеддингов для развёртывания с несколькими воркерами uvicorn: модель загружена
+# в одном процессе, воркеры обращаются к нему через Unix-сокет. Запросы всех воркеров
+# собираются в общие пакеты, поэтому память не растёт с числом воркеров, а модель
+# получает пакеты крупнее, чем пришли бы от одного воркера.
+#
+# Протокол (числа - little-endian uint32):
+#   запрос: длина + UTF-8 JSON {"texts": [...]}
+#   ответ:  n + dims + n*dims float32, либо ERROR_MARKER + длина + UTF-8 текст ошибки
+
+HEADER = struct.Struct("<I")
+RESPONSE_HEADER = struct.Struct("<II")
+ERROR_MARKER = 0xFFFFFFFF
+
+
+class EmbeddingServerError(RuntimeError):
+    pass
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+    return await reader.readexactly(length)
+
+
+def _encode_vectors(vectors: np.ndarray) -> bytes:
+    vectors = np.ascontiguousarray(vectors, dtype="<f4")
+    rows, dims = vectors.shape if vectors.size else (len(vectors), 0)
+    return RESPONSE_HEADER.pack(rows, dims) + vectors.tobytes()
+
+
+def _encode_error(message: str) -> bytes:
+    payload = message.encode("utf-8")
+    return RESPONSE_HEADER.pack(ERROR_MARKER, len(payload)) + payload
+
+
+class EmbeddingServer:
+    """Unix-сокет сервер: принимает списки текстов от клиентов и векторизует их общими пакетами"""
+
+    def __init__(self, socket_path: str, max_batch_size: int, max_wait_ms: float):
+        self.socket_path = socket_path
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def serve(self):
+        from backend.startup import EmbedderLoader
+
+        # Модель загружается и прогревается до открытия сокета: клиенты видят сервер только готовым
+        embedder_loader = EmbedderLoader(
+            configuration.embedder_warmup_batch_sizes if configuration.embedder_warmup else [])
+        await embedder_loader.start(background=False)
+        if not embedder_loader.ready:
+            raise EmbeddingServerError(f"Embedder failed to load: {embedder_loader.error}")
+
+        self._queue = asyncio.Queue()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        worker = asyncio.create_task(self._run())
+        back_logger.info(f"Embedding server listening on {self.socket_path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            worker.cancel()
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    frame = await _read_frame(reader)
+                except asyncio.IncompleteReadError:
+                    break
+                try:
+                    texts = json.loads(frame)["texts"]
+                    if not texts:
+                        # Пустой запрос - проверка доступности сервера
+                        writer.write(_encode_vectors(np.empty((0, 0), dtype=np.float32)))
+                        await writer.drain()
+                        continue
+                    future = asyncio.get_running_loop().create_future()
+                    await self._queue.put((texts, future))
+                    response = _encode_vectors(await future)
+                except Exception as e:
+                    response = _encode_error(str(e))
+                writer.write(response)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _collect(self) -> List[Tuple[List[str], asyncio.Future]]:
+        batch = [await self._queue.get()]
+        size = len(batch[0][0])
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    async def _run(self):
+        from backend.utils import get_embeddings_array
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(None, get_embeddings_array, texts)
+            except Exception as e:
+                back_logger.error(f"Error during batch embedding of {len(texts)} texts: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset:offset + len(item_texts)])
+                offset += len(item_texts)
+
+
+class EmbeddingClient:
+    """Асинхронный клиент сервера эмбеддингов с пулом соединений"""
+
+    def __init__(self, socket_path: str, pool_size: int, timeout: float):
+        self.socket_path = socket_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._connections: Optional[asyncio.Queue] = None
+        self._opened = 0
+
+    async def _acquire(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        if self._connections is None:
+            self._connections = asyncio.Queue()
+        if self._connections.empty() and self._opened < self.pool_size:
+            self._opened += 1
+            try:
+                return await asyncio.open_unix_connection(self.socket_path)
+            except Exception:
+                self._opened -= 1
+                raise
+        return await self._connections.get()
+
+    def _release(self, connection, broken: bool = False):
+        if broken:
+            self._opened -= 1
+            connection[1].close()
+        else:
+            self._connections.put_nowait(connection)
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Векторы текстов матрицей float32 (len(texts) x dims)"""
+        connection = await self._acquire()
+        try:
+            reader, writer = connection
+            payload = json.dumps({"texts": list(texts)}, ensure_ascii=False).encode("utf-8")
+            writer.write(HEADER.pack(len(payload)) + payload)
+            await writer.drain()
+            rows, dims = RESPONSE_HEADER.unpack(
+                await asyncio.wait_for(reader.readexactly(RESPONSE_HEADER.size), self.timeout))
+            if rows == ERROR_MARKER:
+                message = (await reader.readexactly(dims)).decode("utf-8", errors="replace")
+                self._release(connection)
+                raise EmbeddingServerError(message)
+            data = await reader.readexactly(rows * dims * 4)
+        except EmbeddingServerError:
+            raise
+        except BaseException:
+            # Соединение в неизвестном состоянии (таймаут, разрыв): закрываем, а не возвращаем в пул
+            self._release(connection, broken=True)
+            raise
+        self._release(connection)
+        return np.frombuffer(data, dtype="<f4").reshape(rows, dims)
+
+    async def ping(self) -> bool:
+        try:
+            await self.embed([])
+            return True
+        except Exception:
+            return False
+
+    async def close(self):
+        if self._connections is None:
+            return
+        while not self._connections.empty():
+            _, writer = self._connections.get_nowait()
+            writer.close()
+        self._opened = 0
+
+
+_embedding_client: Optional[EmbeddingClient] = None
+
+
+def get_embedding_client() -> Optional[EmbeddingClient]:
+    """Клиент сервера эмбеддингов, если задан EMBEDDING_SERVER_SOCKET, иначе None (модель в процессе)"""
+    global _embedding_client
+    if _embedding_client is None and configuration.embedding_server_socket:
+        _embedding_client = EmbeddingClient(configuration.embedding_server_socket,
+                                             pool_size=configuration.embedding_client_pool_size,
+                                             timeout=configuration.embedding_client_timeout)
+    return _embedding_client
+
+
+async def embed_texts(texts: List[str]) -> List[List[float]]:
+    """Векторизация без кэша: через сервер эмбеддингов или эмбеддером процесса
+    (GigaChat - асинхронно, локальная модель - в пуле потоков)"""
+    client = get_embedding_client()
+    if client is None:
+        from backend.utils import get_embeddings_array_async
+        return (await get_embeddings_array_async(texts)).tolist()
+    return (await client.embed(texts)).tolist()
+
+
+async def embed_texts_cached(texts: List[str], use_cache: Sequence[bool]) -> List[List[float]]:
+    """Векторизация с кэшем запросов (backend.utils.embedding_cache): эмбеддер вызывается только для промахов"""
+    from backend.external import get_embedder_type
+    if get_embedding_client() is None and get_embedder_type() != "gigachat":
+        # Локальная модель: кэш и векторизация промахов целиком в пуле потоков
+        from backend.utils import get_cached_embeddings
+        return await asyncio.get_running_loop().run_in_executor(None, get_cached_embeddings, texts, use_cache)
+
+    from backend.utils import embedding_cache
+    vectors = [embedding_cache.get(text) if cached else None for text, cached in zip(texts, use_cache)]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = await embed_texts([texts[i] for i in missing])
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            if use_cache[i]:
+                embedding_cache.put(texts[i], vector)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервер эмбеддингов для воркеров бэкенда")
+    parser.add_argument("--socket", default=configuration.embedding_server_socket or "/tmp/ai_science_finder_embeddings.sock")
+    parser.add_argument("--max-batch-size", type=int, default=configuration.embedding_server_max_batch_size)
+    parser.add_argument("--max-wait-ms", type=float, default=configuration.embedding_server_max_wait_ms)
+    args = parser.parse_args()
+
+    from logger.logger import setup_logging
+    setup_logging(configuration.project_root / "logger_config.json")
+    server = EmbeddingServer(args.socket, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    asyncio.run(server.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from backend.external import get_embedder_type, get_embedder_model_name
+
+
+def content_key(text: str, model_name: Optional[str] = None) -> str:
+    """Ключ хранилища: хэш от имени модели и векторизуемого текста"""
+    model_name = model_name or f"{get_embedder_type()}:{get_embedder_model_name()}"
+    return hashlib.sha256(f"{model_name}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """Локальное append-only хранилище эмбеддингов статей.
+
+    Векторы лежат в шардах NumPy (shard_000000.npy, ...), которые открываются через
+    memory-map, а файл index.tsv сопоставляет ключ (хэш модели и текста) с номером шарда
+    и строкой в нём. Записи только дописываются: новый шард сначала сохраняется целиком,
+    и лишь затем его ключи попадают в индекс, поэтому прерванный запуск не портит хранилище.
+    """
+
+    INDEX_FILENAME = "index.tsv"
+
+    def __init__(self, path: Path, shard_size: int = 4096):
+        self.path = Path(path)
+        self.shard_size = shard_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._index: Dict[str, tuple[int, int]] = {}
+        self._shards: Dict[int, np.ndarray] = {}
+        self._pending_keys: List[str] = []
+        self._pending_vectors: List[np.ndarray] = []
+        self._pending_lookup: Dict[str, int] = {}
+        self._next_shard = 0
+        self._load_index()
+
+    def _load_index(self):
+        index_path = self.path / self.INDEX_FILENAME
+        if index_path.is_file():
+            with open(index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if len(parts) != 3:
+                        continue  # недописанная строка после аварийного завершения
+                    key, shard, row = parts
+                    self._index[key] = (int(shard), int(row))
+        shards = [int(p.stem.split("_")[1]) for p in self.path.glob("shard_*.npy")]
+        self._next_shard = max(shards) + 1 if shards else 0
+
+    def __len__(self):
+        return len(self._index) + len(self._pending_keys)
+
+    def __contains__(self, key: str):
+        return key in self._index or key in self._pending_lookup
+
+    def _shard(self, shard: int) -> np.ndarray:
+        if shard not in self._shards:
+            self._shards[shard] = np.load(self.path / f"shard_{shard:06d}.npy", mmap_mode="r")
+        return self._shards[shard]
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        if key in self._pending_lookup:
+            return self._pending_vectors[self._pending_lookup[key]]
+        location = self._index.get(key)
+        if location is None:
+            return None
+        shard, row = location
+        return self._shard(shard)[row]
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(key) for key in keys]
+
+    def add(self, key: str, vector: Sequence[float]):
+        if key in self:
+            return
+        self._pending_lookup[key] = len(self._pending_keys)
+        self._pending_keys.append(key)
+        self._pending_vectors.append(np.asarray(vector, dtype=np.float32))
+        if len(self._pending_keys) >= self.shard_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pending_keys:
+            return
+        shard = self._next_shard
+        shard_path = self.path / f"shard_{shard:06d}.npy"
+        tmp_path = self.path / f"tmp_shard_{shard:06d}.npy"
+        np.save(tmp_path, np.stack(self._pending_vectors))
+        os.replace(tmp_path, shard_path)
+
+        with open(self.path / self.INDEX_FILENAME, "a", encoding="utf-8") as f:
+            f.writelines(f"{key}\t{shard}\t{row}\n" for row, key in enumerate(self._pending_keys))
+            f.flush()
+            os.fsync(f.fileno())
+
+        for row, key in enumerate(self._pending_keys):
+            self._index[key] = (shard, row)
+        self._next_shard += 1
+        self._pending_keys = []
+        self._pending_vectors = []
+        self._pending_lookup = {}
+
+    def close(self):
+        self.flush()
+        self._shards.clear()
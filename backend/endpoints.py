@@ -1,91 +1,333 @@
-from fastapi import APIRouter, HTTPException
-from backend.utils import get_embedding
-from backend.external import es_client, get_index_name
-from backend.model import SearchRequest, SearchResult, Article
-from typing import List
-from logger.logger import back_logger
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
+from backend.admission import DeadlineExceeded, ingest_admission, search_admission, with_deadline
+from backend.batcher import query_batcher
+from backend.metrics import backend_errors, registry, search_coalesced, search_response_cache_hits, stage
+from backend.utils import embedding_cache
+from backend.embedding_server import embed_texts
+from backend.facets import facet_service
+from backend.search_backends import get_search_backend
+from backend.pagination import search_cursors
+from backend.singleflight import search_flight, search_key, search_response_cache
+from backend.startup import embedder_loader
+from backend.text_store import get_full_text_store
+from backend.normalization import split_authors
+from backend.model import (SearchRequest, SearchResult, SearchPage, Article, ArticleFullText, IngestBatchResult,
+                           IngestItemStatus, Facets, FacetValue, DateBucket)
+from config.config import configuration
+from typing import AsyncIterator, Dict, List, Literal, Optional, Tuple
+from logger.logger import back_logger, sampled, truncate
 
 
 router = APIRouter()
+search_backend = get_search_backend()
+search_results_adapter = TypeAdapter(List[SearchResult])
+
+
+def article_document(article: Article, vector: List[float]) -> dict:
+    """Документ для индекса: статья без id, нормализованный список авторов и вектор эмбеддера
+    (в размерность индекса его приводит поисковый бэкенд проекцией того индекса, в который пишет)"""
+    doc = article.model_dump(exclude={"id"})
+    doc["metadata"]["authors"] = split_authors(article.metadata.author)
+    # Инкрементальный fill_vdb.py удаляет только отсутствующие в датасете статьи с origin "dataset"
+    doc["origin"] = "ingest"
+    doc["vector"] = vector
+    if configuration.passage_mode:
+        # Полного текста у статьи из /ingest нет: единственный пассаж - заголовок и аннотация
+        doc["passages"] = [{"vector": doc["vector"]}]
+    return doc
 
 
 @router.post("/ingest")
 async def ingest_article(article: Article):
     """Добавление статьи в базу (для наполнения)"""
+    async with ingest_admission.slot():
+        try:
+            # Векторизуем объединение заголовка и аннотации
+            text_to_embed = f"{article.title} {article.abstract}"
+            with stage("ingest", "embed"):
+                vector = await with_deadline(query_batcher.embed(text_to_embed, use_cache=False))
+
+            doc = article_document(article, vector)
+
+            with stage("ingest", "index"):
+                async for ok, item in search_backend.index_documents([{"_id": article.document_id(), "_source": doc}]):
+                    if not ok:
+                        backend_errors.inc(backend=configuration.search_backend, operation="index")
+                        raise RuntimeError(str(item))
+                    if item.get("index", {}).get("result") == "created":
+                        facet_service.add(doc["metadata"])
+            # Закэшированные ответы поиска могли не содержать новую статью
+            search_response_cache.invalidate()
+            return {"status": "success", "message": f"Статья '{article.title}' добавлена."}
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+async def read_ndjson_articles(request: Request) -> AsyncIterator[Tuple[int, Article | None, str | None]]:
+    """Построчный разбор NDJSON из тела запроса без буферизации всего тела"""
+    buffer = b""
+    line_number = 0
+
+    def parse(line: bytes):
+        try:
+            return Article.model_validate_json(line), None
+        except ValidationError as e:
+            return None, str(e)
+
+    async for chunk in request.stream():
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield line_number, *parse(line)
+    if buffer.strip():
+        yield line_number + 1, *parse(buffer)
+
+
+async def index_articles_batch(batch: List[Tuple[int, Article]]) -> List[IngestItemStatus]:
+    """Векторизация пакета статей одним вызовом эмбеддера и пакетная запись в поисковый бэкенд"""
+    texts = [f"{article.title} {article.abstract}" for _, article in batch]
     try:
-        # Векторизуем объединение заголовка и аннотации
-        text_to_embed = f"{article.title} {article.abstract}"
-        vector = get_embedding(text_to_embed)
-        
-        doc = article.model_dump()
-        doc["vector"] = vector
-        
-        await es_client.index(index=get_index_name(), document=doc)
-        return {"status": "success", "message": f"Статья '{article.title}' добавлена."}
+        with stage("ingest_batch", "embed"):
+            vectors = await embed_texts(texts)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        back_logger.error(f"Error during batch ingestion embedding: {e}")
+        return [IngestItemStatus(line=line, id=article.document_id(), status="error", error=str(e))
+                for line, article in batch]
+
+    actions = []
+    for (_, article), vector in zip(batch, vectors):
+        actions.append({"_id": article.document_id(), "_source": article_document(article, vector)})
+
+    # Повторно отправленные после 429 документы Elasticsearch возвращает после остальных, поэтому
+    # результат сопоставляется с действием по _id (одинаковые _id пакета - в порядке строк)
+    waiting: Dict[str, List[Tuple[int, dict]]] = {}
+    for (line, _), action in zip(batch, actions):
+        waiting.setdefault(action["_id"], []).append((line, action))
+
+    statuses = []
+    with stage("ingest_batch", "index"):
+        async for ok, item in search_backend.index_documents(actions):
+            info = next(iter(item.values()), {})
+            pending = waiting.get(info.get("_id"))
+            if not pending:
+                back_logger.error(f"Bulk result for unknown document: {item}")
+                continue
+            line, action = pending.pop(0)
+            statuses.append(IngestItemStatus(
+                line=line,
+                id=action["_id"],
+                status=info.get("result", "indexed") if ok else "error",
+                error=None if ok else str(info.get("error", item)),
+            ))
+            if not ok:
+                backend_errors.inc(backend=configuration.search_backend, operation="index")
+            elif info.get("result") == "created":
+                # Новая статья сразу попадает в подсказки фильтров
+                facet_service.add(action["_source"]["metadata"])
+    for doc_id, pending in waiting.items():
+        for line, _ in pending:
+            statuses.append(IngestItemStatus(line=line, id=doc_id, status="error", error="No bulk result"))
+    if any(status.status != "error" for status in statuses):
+        search_response_cache.invalidate()
+    return statuses
+
+
+@router.post("/ingest/batch", response_model=IngestBatchResult)
+async def ingest_articles_batch(request: Request):
+    """Пакетное добавление статей: тело запроса - NDJSON, по одной статье (Article) в строке.
+
+    Занимает слот загрузки без сквозного дедлайна: длительность определяется размером тела.
+    """
+    items: List[IngestItemStatus] = []
+    batch: List[Tuple[int, Article]] = []
+    async with ingest_admission.slot(use_deadline=False):
+        try:
+            async for line, article, error in read_ndjson_articles(request):
+                if article is None:
+                    items.append(IngestItemStatus(line=line, status="error", error=error))
+                    continue
+                batch.append((line, article))
+                if len(batch) >= configuration.ingest_batch_size:
+                    items.extend(await index_articles_batch(batch))
+                    batch = []
+            if batch:
+                items.extend(await index_articles_batch(batch))
+        except Exception as e:
+            back_logger.error(f"Error during batch ingestion {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+    items.sort(key=lambda item: item.line)
+    failed = sum(item.status == "error" for item in items)
+    back_logger.info(f"Batch ingestion: {len(items) - failed} indexed, {failed} failed")
+    return IngestBatchResult(indexed=len(items) - failed, failed=failed, items=items)
+
+
+async def run_search(request: SearchRequest, k: int) -> List[SearchResult]:
+    """knn-поиск k ближайших статей с учётом фильтров.
+
+    Одинаковые (после нормализации) запросы, пришедшие одновременно, выполняются одним
+    вызовом эмбеддера и поискового бэкенда (SEARCH_COALESCING); независимо от этого при
+    SEARCH_RESPONSE_CACHE_TTL_SECONDS > 0 результат кэшируется до истечения TTL или до записи в индекс.
+    """
+    back_logger.info("Received search query: %s", request.query)
+    key = search_key(request, k)
+    if search_response_cache.enabled:
+        results = search_response_cache.get(key)
+        if results is not None:
+            search_response_cache_hits.inc()
+            return results
+    generation = search_response_cache.generation
+    if configuration.search_coalescing:
+        # Дедлайн ограничивает ожидание чужого запроса, но не отменяет его (shield в SingleFlight)
+        results, shared = await with_deadline(search_flight.do(key, lambda: execute_search(request, k)))
+        if shared:
+            # Результат уже положил в кэш выполнивший поиск запрос
+            search_coalesced.inc()
+            return results
+    else:
+        results = await execute_search(request, k)
+    search_response_cache.put(key, results, generation)
+    return results
+
+
+async def execute_search(request: SearchRequest, k: int) -> List[SearchResult]:
+    # Перевод запроса в эмбеддинг
+    with stage("search", "embed"):
+        query_vector = await with_deadline(query_batcher.embed(request.query))
+
+    # Число кандидатов knn растёт с k, но не выше KNN_MAX_NUM_CANDIDATES (k при этом обязателен)
+    num_candidates = min(max(configuration.knn_num_candidates, k), max(configuration.knn_max_num_candidates, k))
+    with stage("search", "backend"):
+        try:
+            results = await with_deadline(search_backend.search(query_vector, request, k=k,
+                                                                num_candidates=num_candidates))
+        except DeadlineExceeded:
+            raise
+        except Exception:
+            backend_errors.inc(backend=configuration.search_backend, operation="search")
+            raise
+    # Выдача логируется выборочно: сериализация результатов заметна в хвостовых задержках
+    if sampled(configuration.log_results_sample_rate) and back_logger.isEnabledFor(logging.INFO):
+        summary = [(r.id, round(r.similarity_score, 4), r.title) for r in results]
+        back_logger.info("Search returned results: %s", truncate(str(summary), configuration.log_results_max_chars))
+    return results
+
 
 @router.post("/search", response_model=List[SearchResult])
 async def search_articles(request: SearchRequest):
-    try:
-        # Перевод запроса в эмбеддинг
-        back_logger.info(f"Received search query: {request.query}")
-        query_vector = get_embedding(request.query)
-        
-        # Формирование запроса к ES
-        filter_clauses = []
-
-        # Фильтры
-        if request.author_filter:
-            filter_clauses.append({"wildcard": {"metadata.author": f"*{request.author_filter.strip().lower()}*"}})
-            back_logger.info(f"Applying author filter: {request.author_filter}")
-        
-        if request.date_from or request.date_to:
-            range_query = {}
-            if request.date_from:
-                range_query["gte"] = request.date_from
-            if request.date_to:
-                range_query["lte"] = request.date_to
-            filter_clauses.append({"range": {"metadata.published_date": range_query}})
-            back_logger.info(f"Applying date range filter: {range_query}")
-
-        if request.tags_filter:
-            filter_clauses.append({"term": {"metadata.tags": f"{request.tags_filter.strip().lower()}"}})
-            back_logger.info(f"Applying tags filter: {request.tags_filter}")
-
-        # Построение KNN запроса
-        knn_query = {
-            "field": "vector",
-            "query_vector": query_vector,
-            "k": request.top_k,
-            "num_candidates": 100
-        }
-        
-        if filter_clauses:
-            knn_query["filter"] = filter_clauses
-
-        # Выполнение запроса
-        response = await es_client.search(
-            index=get_index_name(),
-            knn=knn_query,
-            source=["title", "url", "abstract", "metadata"] # Исключаем вектор из выдачи
-        )
-        
-        # Формирование ответа
-        results = []
-        for hit in response['hits']['hits']:
-            results.append(SearchResult(
-                id=hit['_id'],
-                title=hit['_source']['title'],
-                url=hit['_source']['url'],
-                abstract=hit['_source']['abstract'],
-                similarity_score=hit['_score'],
-                metadata=hit['_source']['metadata']
-            ))
-        back_logger.info(f"Search returned results: {[r.model_dump(exclude={'abstract'}) for r in results]}")
-            
-        return results
+    async with search_admission.slot():
+        try:
+            results = await run_search(request, request.top_k)
 
-    except Exception as e:
-        back_logger.error(f"Error during search operation {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+            # Сериализуем сами, чтобы измерить этап и не валидировать результаты повторно
+            with stage("search", "serialize"):
+                body = search_results_adapter.dump_json(results)
+            return Response(content=body, media_type="application/json")
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            back_logger.error(f"Error during search operation {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/search/page", response_model=SearchPage)
+async def search_articles_page(request: SearchRequest):
+    """Страница выдачи: top_k результатов начиная с offset.
+
+    Первая страница выполняет knn с запасом (SEARCH_PAGE_WINDOW) и возвращает курсор;
+    следующие страницы с этим курсором берутся из сохранённой выдачи без повторного поиска.
+    """
+    end = request.offset + request.top_k
+    if end > configuration.search_max_results:
+        raise HTTPException(status_code=400,
+                            detail=f"offset + top_k must not exceed {configuration.search_max_results}")
+    async with search_admission.slot():
+        try:
+            entry = search_cursors.get(request.cursor, request)
+            cursor = request.cursor if entry is not None else None
+            # Курсора нет, он устарел или страница выходит за сохранённое окно - повторяем поиск с окном побольше
+            if entry is None or (end > entry.window and not entry.exhausted):
+                window = min(max(configuration.search_page_window, end, 2 * entry.window if entry else 0),
+                             configuration.search_max_results)
+                results = await run_search(request, window)
+                cursor = search_cursors.put(request, results, window, cursor=cursor)
+                entry = search_cursors.get(cursor, request)
+
+            page = entry.results[request.offset:end]
+            has_more = end < len(entry.results) or (not entry.exhausted and end < configuration.search_max_results)
+            with stage("search", "serialize"):
+                body = SearchPage(results=page, cursor=cursor, offset=request.offset,
+                                  next_offset=end if has_more else None,
+                                  total=len(entry.results)).model_dump_json()
+            return Response(content=body, media_type="application/json")
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            back_logger.error(f"Error during search operation {e}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/articles/{article_id}/full_text", response_model=ArticleFullText)
+async def article_full_text(article_id: str):
+    """Полный текст статьи: в поисковом индексе его нет, он читается по id из хранилища полных текстов"""
+    with stage("full_text", "read"):
+        full_text = await asyncio.get_running_loop().run_in_executor(None, get_full_text_store().get, article_id)
+    if full_text is None:
+        raise HTTPException(status_code=404, detail=f"Full text of article {article_id} not found")
+    return ArticleFullText(id=article_id, full_text=full_text)
+
+
+@router.get("/facets", response_model=Facets)
+async def facets(prefix: str = "", field: Optional[Literal["tags", "authors", "dates"]] = None,
+                 limit: int = Query(default=20, ge=1, le=configuration.facets_max_limit),
+                 interval: Literal["month", "year"] = "month"):
+    """Подсказки фильтров: самые частые теги и авторы, начинающиеся с prefix, и число статей по датам.
+
+    Отвечает из снимка счётчиков в памяти (backend.facets), без агрегации в индексе;
+    field ограничивает ответ одним фасетом.
+    """
+    with stage("facets", "query"):
+        index = await facet_service.get()
+        result = Facets(documents=index.documents)
+        if field in (None, "tags"):
+            result.tags = [FacetValue(value=value, count=count) for value, count in index.top_tags(prefix, limit)]
+        if field in (None, "authors"):
+            result.authors = [FacetValue(value=value, count=count)
+                              for value, count in index.top_authors(prefix, limit)]
+        if field in (None, "dates"):
+            result.dates = [DateBucket(key=key, count=count) for key, count in index.date_histogram(interval)]
+    return result
+
+
+@router.get("/healthz")
+async def healthz():
+    """Процесс жив и обрабатывает запросы"""
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz():
+    """Готовность принимать трафик: эмбеддер загружен и прогрет"""
+    return JSONResponse(embedder_loader.status(), status_code=200 if embedder_loader.ready else 503)
+
+
+@router.get("/metrics")
+async def metrics():
+    """Метрики в текстовом формате Prometheus"""
+    return Response(content=registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.get("/stats/embedding_cache")
+async def embedding_cache_stats():
+    """Счётчики кэша эмбеддингов запросов"""
+    return embedding_cache.stats()
@@ -1,35 +1,70 @@
+import threading
+
 from config.config import configuration
 from elasticsearch import AsyncElasticsearch
-from gigachat import GigaChat
-from logger.logger import back_logger
 
-if not configuration.gigachat_credentials and not configuration.use_hf_embedder:
+
+def get_embedder_type():
+    """Вариант эмбеддера: EMBEDDER, либо hf/gigachat по USE_HF_EMBEDDER"""
+    if configuration.embedder:
+        return configuration.embedder
+    return 'hf' if configuration.use_hf_embedder else 'gigachat'
+
+
+if not configuration.gigachat_credentials and get_embedder_type() == 'gigachat':
     raise ValueError("GIGACHAT_CREDENTIALS не установлены или USE_HF_EMBEDDER=true")
 
-giga = None
-if not configuration.use_hf_embedder:
-    giga = GigaChat(credentials=configuration.gigachat_credentials,
-                    verify_ssl_certs=configuration.gigachat_verify_ssl)
-    back_logger.info("Using GigaChat API for embeddings")
-else:
-    back_logger.info("Using HF embedder for embeddings")
+# Эмбеддер создаётся лениво при первом обращении: импорт модуля не загружает модель
+# и не подключается к API, а загрузку можно запустить заранее в фоне (backend.startup)
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from backend.embedders import create_embedder
+                _embedder = create_embedder(get_embedder_type(), configuration)
+    return _embedder
+
+
+def load_embedder():
+    """Создаёт эмбеддер, выбранный в конфигурации (повторные вызовы ничего не делают)"""
+    return get_embedder()
+
+
+def is_embedder_loaded() -> bool:
+    return _embedder is not None
 
-hf_model = None
-if configuration.use_hf_embedder:
-    from sentence_transformers import SentenceTransformer
-    hf_model = SentenceTransformer(configuration.hf_model_name, cache_folder=configuration.hf_cache_dir)
-    back_logger.info(f"Loaded HF model: {configuration.hf_model_name}")
 
 es_client = AsyncElasticsearch(
     hosts="http://localhost:9200"
 )
 
+def get_embedder_model_name():
+    return configuration.gigachat_embeddings_model if get_embedder_type() == 'gigachat' else configuration.hf_model_name
+
 def get_index_name():
-    embedder = 'hf' if configuration.use_hf_embedder else 'gigachat'
-    return f"scientific_articles_{embedder}"
+    # Имя алиаса: fill_vdb.py собирает версионные индексы (..._v1, ..._v2) и переключает алиас на готовый.
+    # Вариант эмбеддера входит в имя: векторы hf, hf_int8 и hf_onnx не смешиваются в одном индексе
+    # Понижение размерности тоже: индекс с векторами 256 и 1024 измерений - разные индексы
+    # Режим пассажей тоже: в его индексе векторы пассажей полного текста (nested)
+    name = f"scientific_articles_{get_embedder_type()}"
+    if configuration.vector_reduction != "none":
+        name += f"_{configuration.vector_reduction}{configuration.vector_dims}"
+    if configuration.passage_mode:
+        name += "_passages"
+    return name
 
 def get_embedding_dimension():
-    if configuration.use_hf_embedder:
-        return hf_model.get_sentence_embedding_dimension()
-    else:
-        return 1024  # GigaChat embedding dimension
\ No newline at end of file
+    if get_embedder_type() == 'gigachat':
+        return 1024  # GigaChat embedding dimension
+    return get_embedder().dimension()
+
+def get_index_dimension():
+    """Размерность векторов в индексе: VECTOR_DIMS при понижении размерности, иначе размерность эмбеддера"""
+    if configuration.vector_reduction != "none":
+        return configuration.vector_dims
+    return get_embedding_dimension()
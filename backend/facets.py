@@ -0,0 +1,276 @@
+import asyncio
+import heapq
+import json
+import os
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.config import configuration
+from backend.normalization import normalize_author
+from logger.logger import back_logger
+
+# Фасеты для подсказок фильтров: число статей по тегам, авторам и месяцам публикации.
+#
+# Счётчики держатся в памяти; подсказки по префиксу - бинарный поиск по отсортированным ключам
+# (для авторов - по словам имён, как у фильтра по автору) и выбор самых частых значений.
+# fill_vdb.py сохраняет снимок счётчиков индекса в FACETS_DIR, бэкенд подхватывает его по mtime
+# файла и дополняет статьями из /ingest, поэтому запрос фасетов не выполняет агрегацию в индексе.
+# Статьи из /ingest учитываются в каждом перечитанном снимке, пока не выйдет снимок, собранный позже них.
+
+SNAPSHOT_FORMAT = 1
+# Ответы на повторяющиеся префиксы (набор текста в поле фильтра) до изменения счётчиков
+QUERY_CACHE_SIZE = 1024
+# Журнал статей из /ingest для снимков, собранных до них: более старые записи вытесняются
+# (их счётчики появятся со следующим снимком fill_vdb.py)
+PENDING_MAX_ARTICLES = 100_000
+# Слова имён новых авторов копятся отдельно и перестраивают словарь слов, когда их становится больше
+AUTHOR_DELTA_MAX_WORDS = 50_000
+
+
+def top_by_count(ids: np.ndarray, counts: np.ndarray, limit: int) -> np.ndarray:
+    """limit id с наибольшими счётчиками по убыванию (argpartition, без сортировки всех)"""
+    if ids.size > limit:
+        ids = ids[np.argpartition(-counts[ids], limit - 1)[:limit]]
+    return ids[np.argsort(-counts[ids], kind="stable")]
+
+
+class FacetIndex:
+    """Счётчики статей по тегам (без учёта регистра), нормализованным авторам и месяцам публикации.
+
+    Авторы пронумерованы, их счётчики - массив numpy. Словарь слов имён - отсортированные слова
+    и CSR-списки id авторов: префикс слова даёт диапазон слов и одним срезом - id подходящих авторов.
+    """
+
+    def __init__(self):
+        # Статьи из /ingest, добавленные раньше, снимок уже содержит: fill_vdb.py ставит это время
+        # перед тем, как прочитать их из индекса и учесть в снимке
+        self.built_at = time.time()
+        self.documents = 0
+        # Тег в нижнем регистре -> [первое встреченное написание, число статей]
+        self.tags: Dict[str, list] = {}
+        self._tag_keys: List[str] = []
+        self.dates: Dict[str, int] = {}
+        self._author_ids: Dict[str, int] = {}
+        self._author_names: List[str] = []
+        self._author_counts = np.zeros(1024, dtype=np.int64)
+        self._words: List[str] = []
+        self._word_offsets = np.zeros(1, dtype=np.int64)
+        self._word_authors = np.empty(0, dtype=np.int64)
+        self._delta_words: Dict[str, List[int]] = {}
+        self._delta_size = 0
+        self._cache: "OrderedDict[tuple, list]" = OrderedDict()
+
+    def add(self, metadata: dict, document: bool = True):
+        """Учесть статью (document=False - только добавленные к статье значения, например теги при слиянии)"""
+        self._cache.clear()
+        if document:
+            self.documents += 1
+            published = metadata.get("published_date")
+            if published:
+                month = str(published)[:7]
+                self.dates[month] = self.dates.get(month, 0) + 1
+        tags = {tag.strip().lower(): tag.strip() for tag in metadata.get("tags") or () if tag and tag.strip()}
+        for key, tag in tags.items():
+            entry = self.tags.get(key)
+            if entry is None:
+                self.tags[key] = [tag, 1]
+                insort(self._tag_keys, key)
+            else:
+                entry[1] += 1
+        for name in set(metadata.get("authors") or ()):
+            author = self._author_id(name)
+            self._author_counts[author] += 1
+
+    def _author_id(self, name: str) -> int:
+        author = self._author_ids.get(name)
+        if author is None:
+            author = len(self._author_names)
+            self._author_ids[name] = author
+            self._author_names.append(name)
+            if author == self._author_counts.size:
+                self._author_counts = np.concatenate([self._author_counts, np.zeros_like(self._author_counts)])
+            for word in set(name.split()):
+                self._delta_words.setdefault(word, []).append(author)
+                self._delta_size += 1
+        return author
+
+    def _build_word_index(self):
+        """Словарь слов имён всех авторов заново (после сборки или когда накопилось много новых слов)"""
+        authors_by_word: Dict[str, List[int]] = {}
+        for author, name in enumerate(self._author_names):
+            for word in set(name.split()):
+                authors_by_word.setdefault(word, []).append(author)
+        self._words = sorted(authors_by_word)
+        sizes = [len(authors_by_word[word]) for word in self._words]
+        self._word_offsets = np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64)
+        self._word_authors = np.fromiter((author for word in self._words for author in authors_by_word[word]),
+                                         dtype=np.int64, count=int(self._word_offsets[-1]))
+        self._delta_words = {}
+        self._delta_size = 0
+
+    def _authors_with_word_prefix(self, prefix: str) -> np.ndarray:
+        if self._delta_size > AUTHOR_DELTA_MAX_WORDS or (not self._words and self._delta_words):
+            self._build_word_index()
+        start = bisect_left(self._words, prefix)
+        end = bisect_left(self._words, prefix + "\uffff")
+        parts = [self._word_authors[self._word_offsets[start]:self._word_offsets[end]]]
+        parts += [np.asarray(authors, dtype=np.int64) for word, authors in self._delta_words.items()
+                  if word.startswith(prefix)]
+        return np.unique(np.concatenate(parts))
+
+    def _cached(self, key: tuple, compute):
+        result = self._cache.get(key)
+        if result is None:
+            result = compute()
+            self._cache[key] = result
+            while len(self._cache) > QUERY_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(key)
+        return result
+
+    def top_tags(self, prefix: str = "", limit: int = 20) -> List[Tuple[str, int]]:
+        """Самые частые теги, начинающиеся с prefix"""
+        prefix = prefix.strip().lower()
+
+        def compute():
+            start = bisect_left(self._tag_keys, prefix)
+            end = bisect_left(self._tag_keys, prefix + "\uffff")
+            best = heapq.nlargest(limit, self._tag_keys[start:end], key=lambda key: self.tags[key][1])
+            return [(self.tags[key][0], self.tags[key][1]) for key in best]
+        return self._cached(("tags", prefix, limit), compute)
+
+    def top_authors(self, prefix: str = "", limit: int = 20) -> List[Tuple[str, int]]:
+        """Самые частые авторы, у которых каждое слово prefix - начало какого-либо слова имени"""
+        words = normalize_author(prefix).split()
+
+        def compute():
+            if not words:
+                authors = np.arange(len(self._author_names), dtype=np.int64)
+            for position, word in enumerate(words):
+                found = self._authors_with_word_prefix(word)
+                authors = found if position == 0 else np.intersect1d(authors, found, assume_unique=True)
+            best = top_by_count(authors, self._author_counts, limit)
+            return [(self._author_names[author], int(self._author_counts[author])) for author in best]
+        return self._cached(("authors", " ".join(words), limit), compute)
+
+    def date_histogram(self, interval: str = "month") -> List[Tuple[str, int]]:
+        """Число статей по месяцам (YYYY-MM) или годам (YYYY) в порядке дат"""
+        if interval == "month":
+            return sorted(self.dates.items())
+        buckets: Dict[str, int] = {}
+        for month, count in self.dates.items():
+            buckets[month[:4]] = buckets.get(month[:4], 0) + count
+        return sorted(buckets.items())
+
+    def save(self, path: Path):
+        """Атомарная запись снимка: бэкенд не прочитает недописанный файл"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        counts = self._author_counts[:len(self._author_names)].tolist()
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"format": SNAPSHOT_FORMAT, "built_at": self.built_at,
+                       "documents": self.documents, "tags": list(self.tags.values()),
+                       "authors": dict(zip(self._author_names, counts)), "dates": self.dates},
+                      f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "FacetIndex":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported facet snapshot format in {path}")
+        index = cls()
+        # Снимок без времени сборки (сохранён до его появления) - время записи файла
+        index.built_at = data.get("built_at") or path.stat().st_mtime
+        index.documents = data["documents"]
+        index.tags = {tag.lower(): [tag, count] for tag, count in data["tags"]}
+        index._tag_keys = sorted(index.tags)
+        index.dates = data["dates"]
+        index._author_names = list(data["authors"])
+        index._author_ids = {name: author for author, name in enumerate(index._author_names)}
+        index._author_counts = np.fromiter(data["authors"].values(), dtype=np.int64, count=len(index._author_names))
+        index._author_counts = np.concatenate([index._author_counts, np.zeros(1024, dtype=np.int64)])
+        index._build_word_index()
+        return index
+
+
+def get_facets_path() -> Path:
+    from backend.external import get_index_name
+    path = Path(configuration.facets_dir)
+    if not path.is_absolute():
+        path = configuration.project_root / path
+    return path / f"{get_index_name()}.json"
+
+
+class FacetService:
+    """Фасеты текущего индекса в памяти процесса бэкенда.
+
+    Снимок fill_vdb.py перечитывается при изменении файла; если снимка нет (индекс собран
+    до появления фасетов), счётчики один раз строятся проходом по документам поискового бэкенда.
+    """
+
+    def __init__(self):
+        self.index: Optional[FacetIndex] = None
+        self._version = None
+        self._lock: Optional[asyncio.Lock] = None
+        # Журнал статей из /ingest (время добавления, metadata): снимок, собранный раньше, их не содержит,
+        # поэтому они заново добавляются к каждому перечитанному снимку
+        self._pending: Deque[Tuple[float, dict]] = deque(maxlen=PENDING_MAX_ARTICLES)
+
+    def _snapshot_version(self):
+        try:
+            return get_facets_path().stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    async def get(self) -> FacetIndex:
+        version = self._snapshot_version()
+        if self.index is not None and version == self._version:
+            return self.index
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            version = self._snapshot_version()
+            if self.index is None or version != self._version:
+                if version is not None:
+                    index = await asyncio.get_running_loop().run_in_executor(None, FacetIndex.load, get_facets_path())
+                    back_logger.info(f"Loaded facet snapshot {get_facets_path()} ({index.documents} articles)")
+                    self.index = self._replay(index)
+                elif self.index is None:
+                    # Проход по индексу видит статьи из /ingest, добавленные до его начала
+                    self.index = self._replay(await self._scan())
+                self._version = version
+        return self.index
+
+    def _replay(self, index: FacetIndex) -> FacetIndex:
+        """Статьи журнала, добавленные после сборки снимка index; более ранние из журнала удаляются"""
+        self._pending = deque(((added_at, metadata) for added_at, metadata in self._pending
+                               if added_at >= index.built_at), maxlen=PENDING_MAX_ARTICLES)
+        for _, metadata in self._pending:
+            index.add(metadata)
+        return index
+
+    async def _scan(self) -> FacetIndex:
+        from backend.search_backends import get_search_backend
+        index = FacetIndex()
+        async for metadata in get_search_backend().scan_metadata():
+            index.add(metadata)
+        back_logger.info(f"Facet snapshot {get_facets_path()} not found, "
+                         f"counted facets of {index.documents} indexed articles")
+        return index
+
+    def add(self, metadata: dict):
+        """Новая статья из /ingest; обновлённые статьи не пересчитываются до следующего снимка"""
+        self._pending.append((time.time(), metadata))
+        if self.index is not None:
+            self.index.add(metadata)
+
+
+facet_service = FacetService()
@@ -0,0 +1,195 @@
+import asyncio
+import random
+import time
+import uuid
+from typing import List, Optional, Sequence
+
+import httpx
+import numpy as np
+
+from backend.metrics import gigachat_requests, gigachat_token_refreshes
+
+# Асинхронный клиент эмбеддингов GigaChat API (httpx).
+#
+# Список текстов режется на запросы по max_batch_size текстов, которые выполняются параллельно,
+# но не больше max_concurrency одновременно. Запросы проходят через token bucket
+# (requests_per_second, burst), поэтому пакетная загрузка не упирается в лимит API; на 429 и 5xx
+# запрос повторяется с экспоненциальной задержкой (или по Retry-After), а 429 ещё и приостанавливает
+# token bucket для всех запросов. Токен доступа получается один раз и переиспользуется до истечения.
+
+AUTH_URL = "https://ngw.devices.sberbank.ru:9443/api/v2/oauth"
+API_URL = "https://gigachat.devices.sberbank.ru/api/v1"
+DEFAULT_SCOPE = "GIGACHAT_API_PERS"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Токен обновляется заранее, чтобы запрос не ушёл с токеном, истекающим в пути
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+
+class GigaChatAPIError(RuntimeError):
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class TokenBucket:
+    """Ограничение частоты запросов: rate запросов в секунду, до burst подряд (rate <= 0 - без ограничения)"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # Под блокировкой ждущие получают токены по очереди
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Ответ 429: новые запросы не отправляются ближайшие seconds секунд"""
+        if self.rate <= 0:
+            return
+        self._refill()
+        self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AsyncGigaChatClient:
+    """Эмбеддинги GigaChat API: пакетные запросы, ограничение параллельности и частоты, повторы"""
+
+    def __init__(self, credentials: str, scope: Optional[str] = None, model: str = "Embeddings",
+                 verify_ssl: bool = False, auth_url: str = AUTH_URL, api_url: str = API_URL,
+                 max_batch_size: int = 32, max_concurrency: int = 4, requests_per_second: float = 0,
+                 max_retries: int = 5, initial_backoff: float = 0.5, max_backoff: float = 30.0,
+                 timeout: float = 60.0):
+        self.credentials = credentials
+        self.scope = scope or DEFAULT_SCOPE
+        self.model = model
+        self.verify_ssl = verify_ssl
+        self.auth_url = auth_url
+        self.api_url = api_url.rstrip("/")
+        self.max_batch_size = max_batch_size
+        self.max_concurrency = max_concurrency
+        self.requests_per_second = requests_per_second
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self._client = None
+        self._token: Optional[str] = None
+        self._token_expires_at = 0.0
+        self._token_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[TokenBucket] = None
+
+    def _http(self) -> httpx.AsyncClient:
+        # Клиент и примитивы синхронизации создаются в event loop, где выполняются запросы
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                verify=self.verify_ssl, timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency + 1,
+                                    max_keepalive_connections=self.max_concurrency + 1))
+            self._token_lock = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._bucket = TokenBucket(self.requests_per_second, burst=self.max_concurrency)
+        return self._client
+
+    def _token_valid(self) -> bool:
+        return self._token is not None and time.time() < self._token_expires_at - TOKEN_REFRESH_MARGIN_SECONDS
+
+    async def _access_token(self, stale: Optional[str] = None) -> str:
+        """Токен доступа; stale - токен, отвергнутый API (401): он обновляется один раз на всех ждущих"""
+        if self._token_valid() and self._token != stale:
+            return self._token
+        async with self._token_lock:
+            if self._token_valid() and self._token != stale:
+                return self._token
+            response = await self._http().post(
+                self.auth_url, data={"scope": self.scope},
+                headers={"Authorization": f"Basic {self.credentials}", "RqUID": str(uuid.uuid4()),
+                         "Accept": "application/json"})
+            if response.status_code != 200:
+                raise GigaChatAPIError(f"GigaChat auth failed: {response.status_code} {response.text[:200]}",
+                                       response.status_code)
+            data = response.json()
+            self._token = data["access_token"]
+            # expires_at - в миллисекундах
+            self._token_expires_at = data["expires_at"] / 1000
+            gigachat_token_refreshes.inc()
+            return self._token
+
+    def _backoff(self, attempt: int) -> float:
+        # Случайная доля задержки: одновременно отклонённые запросы не повторяются одновременно
+        return random.uniform(0.5, 1.0) * min(self.max_backoff, self.initial_backoff * 2 ** attempt)
+
+    async def _embed_request(self, texts: Sequence[str]) -> np.ndarray:
+        client = self._http()
+        async with self._semaphore:
+            attempt = 0
+            refreshed = False
+            while True:
+                await self._bucket.acquire()
+                token = await self._access_token()
+                retry_after = None
+                try:
+                    response = await client.post(f"{self.api_url}/embeddings",
+                                                 json={"model": self.model, "input": list(texts)},
+                                                 headers={"Authorization": f"Bearer {token}",
+                                                          "Accept": "application/json"})
+                except httpx.TransportError as e:
+                    gigachat_requests.inc(status="error")
+                    error = GigaChatAPIError(f"GigaChat request failed: {e!r}")
+                else:
+                    gigachat_requests.inc(status=str(response.status_code))
+                    if response.status_code == 200:
+                        # API возвращает индекс каждого текста, порядок восстанавливаем по нему
+                        data = sorted(response.json()["data"], key=lambda item: item["index"])
+                        return np.asarray([item["embedding"] for item in data], dtype=np.float32)
+                    if response.status_code == 401 and not refreshed:
+                        refreshed = True
+                        await self._access_token(stale=token)
+                        continue
+                    error = GigaChatAPIError(f"GigaChat embeddings failed: {response.status_code} "
+                                             f"{response.text[:200]}", response.status_code)
+                    if response.status_code not in RETRY_STATUSES:
+                        raise error
+                    retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+
+                if attempt >= self.max_retries:
+                    raise error
+                delay = retry_after if retry_after is not None else self._backoff(attempt)
+                if error.status == 429:
+                    self._bucket.pause(delay)
+                attempt += 1
+                await asyncio.sleep(delay)
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Векторы текстов матрицей float32 (len(texts) x dims)"""
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        parts = [texts[start:start + self.max_batch_size] for start in range(0, len(texts), self.max_batch_size)]
+        vectors: List[np.ndarray] = await asyncio.gather(*(self._embed_request(part) for part in parts))
+        return np.vstack(vectors)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
@@ -0,0 +1,176 @@
+import json
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from elasticsearch import Elasticsearch, NotFoundError, helpers
+
+from config.config import configuration
+
+# Управление индексами Elasticsearch: поиск идёт через алиас (get_index_name),
+# а полная переиндексация собирает новый версионный индекс и атомарно переключает алиас.
+
+
+def load_index_body(dims: int) -> dict:
+    """Тело создания индекса из mapping.json с заданной размерностью векторов"""
+    mapping_path = configuration.project_root / "data" / configuration.data_mapping_filename
+    with open(mapping_path, "r", encoding="utf-8") as json_mapfile:
+        body = json.load(json_mapfile)
+    body["mappings"]["properties"]["vector"]["dims"] = dims
+    body["mappings"]["properties"]["vector"]["index_options"] = {
+        "type": "hnsw",
+        "m": configuration.knn_hnsw_m,
+        "ef_construction": configuration.knn_hnsw_ef_construction,
+    }
+    if configuration.passage_mode:
+        # Поиск идёт по nested-векторам пассажей (первый - вектор заголовка и аннотации),
+        # поэтому граф HNSW по вектору статьи не строится
+        vector = body["mappings"]["properties"]["vector"]
+        body["mappings"]["properties"]["passages"] = {"type": "nested", "properties": {"vector": dict(vector)}}
+        body["mappings"]["properties"]["vector"] = {"type": "dense_vector", "dims": dims, "index": False}
+    return body
+
+
+def resolve_alias(es: Elasticsearch, alias: str) -> List[str]:
+    """Конкретные индексы, на которые указывает алиас"""
+    try:
+        return sorted(es.indices.get_alias(name=alias).keys())
+    except NotFoundError:
+        return []
+
+
+def is_legacy_index(es: Elasticsearch, alias: str) -> bool:
+    """Индекс со старой схемы: конкретный индекс с именем алиаса"""
+    return bool(es.indices.exists(index=alias)) and not resolve_alias(es, alias)
+
+
+def current_index(es: Elasticsearch, alias: str) -> Optional[str]:
+    indices = resolve_alias(es, alias)
+    if indices:
+        return indices[-1]
+    if es.indices.exists(index=alias):
+        return alias
+    return None
+
+
+def next_index_version(es: Elasticsearch, alias: str) -> str:
+    pattern = re.compile(rf"^{re.escape(alias)}_v(\d+)$")
+    versions = [int(match.group(1)) for name in es.indices.get(index=f"{alias}_v*").keys()
+                if (match := pattern.match(name))]
+    return f"{alias}_v{max(versions, default=0) + 1}"
+
+
+def create_build_index(es: Elasticsearch, alias: str, body: dict) -> str:
+    """Новый версионный индекс для полной переиндексации.
+
+    На время заливки отключены refresh и реплики: сегменты не публикуются после каждого
+    bulk-запроса, а данные не копируются второй раз. Алиас продолжает указывать на старый индекс.
+    """
+    index = next_index_version(es, alias)
+    body = json.loads(json.dumps(body))
+    body.setdefault("settings", {}).setdefault("index", {}).update({
+        "refresh_interval": "-1",
+        "number_of_replicas": 0,
+    })
+    es.indices.create(index=index, body=body)
+    return index
+
+
+def finalize_build_index(es: Elasticsearch, index: str):
+    """Возврат рабочих настроек индекса после заливки"""
+    es.indices.put_settings(index=index, settings={"index": {
+        "refresh_interval": configuration.es_refresh_interval,
+        "number_of_replicas": configuration.es_number_of_replicas,
+    }})
+    es.indices.refresh(index=index)
+
+
+def swap_alias(es: Elasticsearch, alias: str, new_index: str, delete_old: bool = True) -> List[str]:
+    """Атомарное переключение алиаса на новый индекс, возвращает прежние индексы"""
+    old_indices = [index for index in resolve_alias(es, alias) if index != new_index]
+    actions = [{"remove": {"index": index, "alias": alias}} for index in old_indices]
+    if is_legacy_index(es, alias):
+        # Старый конкретный индекс с именем алиаса удаляется в той же атомарной операции
+        actions.append({"remove_index": {"index": alias}})
+    actions.append({"add": {"index": new_index, "alias": alias, "is_write_index": True}})
+    es.indices.update_aliases(actions=actions)
+
+    if delete_old:
+        for index in old_indices:
+            es.indices.delete(index=index)
+    return old_indices
+
+
+class BulkIndexer:
+    """Параллельная загрузка пакетов документов через streaming_bulk.
+
+    Каждый пакет отправляется в пуле из threads потоков; внутри пакета streaming_bulk режет
+    запросы по chunk_size документов и max_chunk_bytes байт и повторяет отклонённые с 429
+    документы с экспоненциальной задержкой. Число пакетов в очереди ограничено, поэтому
+    память не растёт, если векторизация опережает Elasticsearch.
+    """
+
+    def __init__(self, es: Elasticsearch, index: str, threads: int = None, chunk_size: int = None,
+                 max_chunk_bytes: int = None, max_retries: int = None, initial_backoff: float = None,
+                 max_backoff: float = None, logger=None):
+        self.es = es
+        self.index = index
+        self.threads = threads or configuration.bulk_threads
+        self.bulk_options = {
+            "chunk_size": chunk_size or configuration.bulk_chunk_size,
+            "max_chunk_bytes": max_chunk_bytes or configuration.bulk_max_chunk_bytes,
+            "max_retries": configuration.bulk_max_retries if max_retries is None else max_retries,
+            "initial_backoff": initial_backoff or configuration.bulk_initial_backoff,
+            "max_backoff": max_backoff or configuration.bulk_max_backoff,
+        }
+        self.logger = logger
+        self.succeeded = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix="bulk")
+        self._max_pending = self.threads * 2
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+
+    def submit(self, actions: List[dict]):
+        if not actions:
+            return
+        self._slots.acquire()
+        future = self._executor.submit(self._send, actions)
+        future.add_done_callback(lambda _: self._slots.release())
+
+    def _send(self, actions: List[dict]):
+        succeeded, failed = 0, 0
+        try:
+            for ok, item in helpers.streaming_bulk(self.es, actions, index=self.index, raise_on_error=False,
+                                                   **self.bulk_options):
+                if ok:
+                    succeeded += 1
+                else:
+                    failed += 1
+                    if self.logger is not None:
+                        self.logger.error(f"Bulk item failed: {item}")
+        except Exception as e:
+            failed += len(actions) - succeeded - failed
+            if self.logger is not None:
+                self.logger.error(f"Bulk request failed: {e}")
+        with self._lock:
+            self.succeeded += succeeded
+            self.failed += failed
+
+    def flush(self):
+        """Ожидание загрузки всех отправленных пакетов: занятые слоты освобождаются по завершении пакетов"""
+        for _ in range(self._max_pending):
+            self._slots.acquire()
+        for _ in range(self._max_pending):
+            self._slots.release()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        return self.succeeded, self.failed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,732 @@
+import json
+import os
+import re
+import shutil
+import threading
+from bisect import bisect_left, insort
+from datetime import date
+from functools import partial
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from backend.normalization import normalize_author, split_authors
+from backend.projection import Projection
+
+# Локальный векторный индекс: альтернатива Elasticsearch для небольших корпусов (~10^5 статей).
+#
+# Папка индекса содержит версии v1, v2, ... и файл CURRENT с именем текущей версии: fill_vdb.py
+# собирает новую версию рядом и переключает на неё CURRENT одной операцией os.replace.
+# Формат папки версии (индекс, собранный до появления версий, лежит прямо в папке индекса):
+#   meta.json        - количество векторов, размерность, тип (float32/float16)
+#   vectors.bin      - нормированные векторы подряд, открываются через np.memmap
+#   documents.jsonl  - документы (_id и _source без вектора), offsets.npy - смещения строк
+#   dates.npy        - дата публикации в днях от 1970-01-01 (NO_DATE, если даты нет)
+#   tag_keys.json, tag_offsets.npy, tag_rows.npy - инвертированный индекс тегов (CSR)
+#   author_keys.json, author_offsets.npy, author_rows.npy - то же для слов имён авторов
+#   passages.bin, passage_offsets.npy - векторы пассажей полного текста (PASSAGE_MODE) подряд по статьям
+#                    и смещения пассажей каждой статьи (CSR); оценка статьи - максимум по её пассажам
+#   projection.npz   - проекция векторов (VECTOR_REDUCTION), которой проецируются запросы и статьи из /ingest
+#   delta.jsonl      - статьи, добавленные через /ingest после сборки (дописываются; когда устаревших
+#                    записей повторно добавленных статей становится больше актуальных, файл сжимается)
+
+STORE_FORMAT = 2
+NO_DATE = np.iinfo(np.int32).min
+EPOCH = date(1970, 1, 1)
+SCORE_BLOCK_ROWS = 65536
+CURRENT_FILE = "CURRENT"
+VERSION_RE = re.compile(r"^v(\d+)$")
+# Сжатие delta.jsonl не раньше, чем наберётся столько устаревших записей
+DELTA_COMPACT_MIN_RECORDS = 10_000
+
+
+def current_version_path(path: Path) -> Optional[Path]:
+    """Папка текущей версии индекса path (None - индекс ещё не собран)"""
+    try:
+        name = (path / CURRENT_FILE).read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        return path if (path / "meta.json").is_file() else None
+    return path / name
+
+
+def next_version_name(path: Path) -> str:
+    versions = [int(match.group(1)) for item in path.iterdir() if (match := VERSION_RE.match(item.name))]
+    return f"v{max(versions, default=0) + 1}"
+
+
+def date_to_days(value) -> int:
+    if not value:
+        return NO_DATE
+    try:
+        return (date.fromisoformat(str(value)[:10]) - EPOCH).days
+    except ValueError:
+        return NO_DATE
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def build_postings(rows_by_key: Dict[str, List[int]]):
+    """Инвертированный индекс в формате CSR: отсортированные ключи, смещения и строки"""
+    keys = sorted(rows_by_key)
+    offsets = np.cumsum([0] + [len(rows_by_key[key]) for key in keys]).astype(np.int64)
+    rows = (np.concatenate([np.asarray(rows_by_key[key], dtype=np.int32) for key in keys]) if keys
+            else np.empty(0, dtype=np.int32))
+    return keys, offsets, rows
+
+
+class FilterColumns:
+    """Колоночные массивы для фильтров по метаданным.
+
+    Даты - int32 дней; теги и слова нормализованных имён авторов - инвертированные индексы
+    (CSR: отсортированные ключи, offsets, rows). Префиксный фильтр по автору - бинарный поиск
+    диапазона слов в отсортированном словаре и объединение их списков строк.
+    """
+
+    def __init__(self, dates: np.ndarray, tag_keys: List[str], tag_offsets: np.ndarray, tag_rows: np.ndarray,
+                 author_keys: List[str], author_offsets: np.ndarray, author_rows: np.ndarray):
+        self.dates = dates
+        self.tag_keys, self.tag_offsets, self.tag_rows = tag_keys, tag_offsets, tag_rows
+        self.tag_positions = {tag: i for i, tag in enumerate(tag_keys)}
+        self.author_keys = np.array(author_keys, dtype=str)
+        self.author_offsets, self.author_rows = author_offsets, author_rows
+
+    @classmethod
+    def from_sources(cls, sources: Sequence[dict]) -> "FilterColumns":
+        metadata = [source.get("metadata", {}) for source in sources]
+        dates = np.array([date_to_days(m.get("published_date")) for m in metadata], dtype=np.int32)
+        rows_by_tag: Dict[str, List[int]] = {}
+        rows_by_author_token: Dict[str, List[int]] = {}
+        for row, m in enumerate(metadata):
+            for tag in set(t.strip().lower() for t in m.get("tags", [])):
+                rows_by_tag.setdefault(tag, []).append(row)
+            authors = m.get("authors") or split_authors(m.get("author"))
+            for token in set(token for author in authors for token in author.split()):
+                rows_by_author_token.setdefault(token, []).append(row)
+        return cls(dates, *build_postings(rows_by_tag), *build_postings(rows_by_author_token))
+
+    def save(self, path: Path):
+        np.save(path / "dates.npy", self.dates)
+        for name, keys, offsets, rows in (("tag", self.tag_keys, self.tag_offsets, self.tag_rows),
+                                          ("author", self.author_keys.tolist(), self.author_offsets,
+                                           self.author_rows)):
+            with open(path / f"{name}_keys.json", "w", encoding="utf-8") as f:
+                json.dump(list(keys), f, ensure_ascii=False)
+            np.save(path / f"{name}_offsets.npy", offsets)
+            np.save(path / f"{name}_rows.npy", rows)
+
+    @classmethod
+    def load(cls, path: Path) -> "FilterColumns":
+        parts = []
+        for name in ("tag", "author"):
+            with open(path / f"{name}_keys.json", "r", encoding="utf-8") as f:
+                keys = json.load(f)
+            parts += [keys, np.load(path / f"{name}_offsets.npy"), np.load(path / f"{name}_rows.npy", mmap_mode="r")]
+        return cls(np.load(path / "dates.npy"), *parts)
+
+    def rows_with_tag(self, tag: str) -> np.ndarray:
+        position = self.tag_positions.get(tag)
+        if position is None:
+            return np.empty(0, dtype=np.int32)
+        return self.tag_rows[self.tag_offsets[position]:self.tag_offsets[position + 1]]
+
+    def rows_with_author_prefix(self, token: str) -> np.ndarray:
+        """Строки, у которых какое-либо слово имени автора начинается с token (строки могут повторяться)"""
+        start = np.searchsorted(self.author_keys, token, side="left")
+        end = np.searchsorted(self.author_keys, token + "\uffff", side="left")
+        return self.author_rows[self.author_offsets[start]:self.author_offsets[end]]
+
+    def _author_mask(self, size: int, author: str) -> np.ndarray:
+        mask = np.ones(size, dtype=bool)
+        for token in normalize_author(author).split():
+            condition = np.zeros(size, dtype=bool)
+            condition[self.rows_with_author_prefix(token)] = True
+            mask &= condition
+        return mask
+
+    def mask(self, size: int, author: Optional[str] = None, date_from: Optional[str] = None,
+             date_to: Optional[str] = None, tag: Optional[str] = None) -> Optional[np.ndarray]:
+        """Булева маска строк, подходящих под фильтры (None - фильтров нет)"""
+        mask = None
+
+        def combine(condition):
+            nonlocal mask
+            mask = condition if mask is None else mask & condition
+
+        if tag:
+            condition = np.zeros(size, dtype=bool)
+            condition[self.rows_with_tag(tag.strip().lower())] = True
+            combine(condition)
+        if date_from:
+            combine(self.dates >= date_to_days(date_from))
+        if date_to:
+            combine((self.dates <= date_to_days(date_to)) & (self.dates != NO_DATE))
+        if author and normalize_author(author):
+            combine(self._author_mask(size, author))
+        return mask
+
+
+class DeltaColumns(FilterColumns):
+    """Фильтры статей из /ingest: дополняются по одной статье без перестройки CSR.
+
+    Даты - растущий удвоением массив, теги и слова имён авторов - словари списков строк;
+    слова авторов для префиксного фильтра дополнительно держатся отсортированными.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._dates = np.empty(1024, dtype=np.int32)
+        self._rows_by_tag: Dict[str, List[int]] = {}
+        self._rows_by_author_token: Dict[str, List[int]] = {}
+        self._author_tokens: List[str] = []
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[:self.size]
+
+    def append(self, metadata: dict):
+        row = self.size
+        if row == self._dates.size:
+            self._dates = np.concatenate([self._dates, np.empty_like(self._dates)])
+        self._dates[row] = date_to_days(metadata.get("published_date"))
+        self.size += 1
+        for tag in set(t.strip().lower() for t in metadata.get("tags", [])):
+            self._rows_by_tag.setdefault(tag, []).append(row)
+        authors = metadata.get("authors") or split_authors(metadata.get("author"))
+        for token in set(token for author in authors for token in author.split()):
+            rows = self._rows_by_author_token.get(token)
+            if rows is None:
+                rows = self._rows_by_author_token[token] = []
+                insort(self._author_tokens, token)
+            rows.append(row)
+
+    def rows_with_tag(self, tag: str) -> np.ndarray:
+        return np.asarray(self._rows_by_tag.get(tag, ()), dtype=np.int32)
+
+    def rows_with_author_prefix(self, token: str) -> np.ndarray:
+        start = bisect_left(self._author_tokens, token)
+        end = bisect_left(self._author_tokens, token + "\uffff")
+        return np.asarray([row for key in self._author_tokens[start:end] for row in self._rows_by_author_token[key]],
+                          dtype=np.int32)
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Индексы k наибольших значений по убыванию (argpartition + сортировка только k элементов)"""
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class LocalVectorStore:
+    """Точный поиск ближайших соседей по косинусной близости над memory-mapped матрицей"""
+
+    def __init__(self, path: Path, fallback_projection: Optional[Path] = None):
+        self.path = Path(path)
+        # Проекция для версий, собранных без projection.npz (до сохранения проекции в папке версии)
+        self.fallback_projection = fallback_projection
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._documents = None
+        self._loaded_version = None
+        self._failed_version = False
+        self.load()
+
+    # --- Загрузка ---
+
+    def _version(self):
+        """Папка текущей версии и mtime её meta.json (None - индекса ещё нет)"""
+        version_path = current_version_path(self.path)
+        if version_path is None:
+            return None
+        try:
+            return str(version_path), (version_path / "meta.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return str(version_path), None  # версия удалена следующей сборкой
+
+    def _read_projection(self, path: Path) -> Optional[Projection]:
+        for projection_path in (path / "projection.npz", self.fallback_projection):
+            if projection_path is not None and projection_path.is_file():
+                return Projection.load(projection_path)
+        return None
+
+    def _read(self, version) -> dict:
+        """Файлы версии индекса; загруженное состояние при этом не меняется"""
+        if version is None:
+            return {"version_path": self.path, "projection": self._read_projection(self.path),
+                    "size": 0, "dims": 0, "dtype": np.float32,
+                    "vectors": np.empty((0, 0), dtype=np.float32), "_offsets": np.empty(0, dtype=np.int64),
+                    "_documents": None, "ids": [], "columns": FilterColumns.from_sources([]),
+                    "passage_vectors": np.empty((0, 0), dtype=np.float32),
+                    "passage_offsets": np.zeros(1, dtype=np.int64)}
+        path = Path(version[0])
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("format") != STORE_FORMAT:
+            raise RuntimeError(f"Local store {path} has an outdated format, rebuild it with fill_vdb.py")
+        size, dims, dtype = meta["size"], meta["dims"], np.dtype(meta["dtype"])
+        passages = meta.get("passages", 0)
+        with open(path / "ids.json", "r", encoding="utf-8") as f:
+            ids = json.load(f)
+        state = {
+            "version_path": path, "projection": self._read_projection(path),
+            "size": size, "dims": dims, "dtype": dtype, "ids": ids,
+            "vectors": (np.memmap(path / "vectors.bin", dtype=dtype, mode="r", shape=(size, dims))
+                        if size else np.empty((0, dims), dtype=dtype)),
+            "_offsets": np.load(path / "offsets.npy"),
+            "columns": FilterColumns.load(path),
+            "passage_vectors": (np.memmap(path / "passages.bin", dtype=dtype, mode="r", shape=(passages, dims))
+                                if passages else np.empty((0, dims), dtype=dtype)),
+            "passage_offsets": (np.load(path / "passage_offsets.npy") if passages
+                                else np.zeros(size + 1, dtype=np.int64)),
+        }
+        state["_documents"] = open(path / "documents.jsonl", "rb")
+        return state
+
+    def load(self):
+        """Загрузка текущей версии: файлы читаются до замены загруженной, поэтому при ошибке
+        (версия удалена новой сборкой или повреждена) поиск продолжает работать по прежней"""
+        version = self._version()
+        state = self._read(version)
+        with self._lock:
+            # Прежний documents.jsonl не закрывается явно: его ещё могут читать начатые поиски,
+            # файл закроется вместе с последней ссылкой на него
+            self.__dict__.update(state)
+            self._loaded_version = version
+            self.row_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+            self.deleted = np.zeros(self.size, dtype=bool)
+            self._reset_delta()
+            self._replay_delta()
+
+    def _reset_delta(self):
+        # Статьи из /ingest дописываются строками; повторно добавленная статья получает новую строку,
+        # а прежняя помечается удалённой. Векторы - в буфере, растущем удвоением
+        self._delta_ids: List[str] = []
+        self._delta_sources: List[dict] = []
+        self._delta_row_by_id: Dict[str, int] = {}
+        self._delta_vectors = np.empty((0, self.dims), dtype=np.float32)
+        self._delta_deleted = np.zeros(0, dtype=bool)
+        self._delta_columns = DeltaColumns()
+        # Записей в delta.jsonl, включая устаревшие
+        self._delta_records = 0
+
+    def reload_if_changed(self):
+        """Подхват пересобранного индекса (fill_vdb.py переключает CURRENT на новую версию).
+
+        Если новую версию загрузить не удалось, остаётся загруженная, а исключение передаётся
+        вызывающему один раз: повторно та же версия не загружается.
+        """
+        if self._version() in (self._loaded_version, self._failed_version):
+            return
+        with self._reload_lock:
+            version = self._version()
+            if version in (self._loaded_version, self._failed_version):
+                return
+            try:
+                self.load()
+            except Exception:
+                self._failed_version = version
+                raise
+
+    def _replay_delta(self):
+        delta_path = self.version_path / "delta.jsonl"
+        if not delta_path.is_file():
+            return
+        items = []
+        with open(delta_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # пустая или недописанная при падении процесса строка
+                items.append((record["_id"], record["_source"], record["vector"]))
+        if items:
+            self._apply_delta(items, self._delta_matrix(items))
+            self._delta_records = len(items)
+            self._compact_delta_if_needed()
+
+    # --- Чтение документов ---
+
+    @staticmethod
+    def _read_document(documents, offsets: np.ndarray, row: int) -> dict:
+        """Строка документа через os.pread: без общего положения в файле, параллельно с другими поисками"""
+        start = int(offsets[row])
+        end = int(offsets[row + 1]) if row + 1 < offsets.shape[0] else os.fstat(documents.fileno()).st_size
+        return json.loads(os.pread(documents.fileno(), end - start, start))
+
+    def iter_metadata(self) -> Iterator[dict]:
+        """metadata неудалённых статей индекса и статей из /ingest; документы читаются отдельным дескриптором"""
+        with self._lock:
+            path = self.version_path / "documents.jsonl" if self.size else None
+            deleted = self.deleted.copy()
+            delta_sources = [source for source, removed in zip(self._delta_sources, self._delta_deleted) if not removed]
+        if path is not None:
+            with open(path, "rb") as f:
+                for row, line in enumerate(f):
+                    if not deleted[row]:
+                        yield json.loads(line)["_source"].get("metadata", {})
+        for source in delta_sources:
+            yield source.get("metadata", {})
+
+    def iter_ingested(self) -> Iterator[tuple]:
+        """_id и _source статей из /ingest: перенесённых в версию при сборке и добавленных после неё"""
+        with self._lock:
+            path = self.version_path / "documents.jsonl" if self.size else None
+            deleted = self.deleted.copy()
+            delta = [(doc_id, source) for doc_id, source, removed
+                     in zip(self._delta_ids, self._delta_sources, self._delta_deleted) if not removed]
+        if path is not None:
+            with open(path, "rb") as f:
+                for row, line in enumerate(f):
+                    if not deleted[row]:
+                        doc = json.loads(line)
+                        if doc["_source"].get("origin") == "ingest":
+                            yield doc["_id"], doc["_source"]
+        yield from delta
+
+    # --- Добавление статей через /ingest ---
+
+    def _delta_matrix(self, items: Sequence[tuple]) -> np.ndarray:
+        """Нормированные векторы статей; размерность должна совпадать с размерностью индекса"""
+        vectors = normalize_rows(np.asarray([vector for _, _, vector in items], dtype=np.float32))
+        if vectors.ndim != 2 or (self.dims and vectors.shape[1] != self.dims):
+            raise ValueError(f"Vectors must have {self.dims} dims")
+        return vectors
+
+    def _reserve_delta(self, size: int):
+        capacity = self._delta_vectors.shape[0]
+        if size <= capacity:
+            return
+        used = len(self._delta_ids)
+        capacity = max(size, 2 * capacity, 1024)
+        vectors = np.empty((capacity, self.dims), dtype=np.float32)
+        vectors[:used] = self._delta_vectors[:used]
+        deleted = np.zeros(capacity, dtype=bool)
+        deleted[:used] = self._delta_deleted[:used]
+        self._delta_vectors, self._delta_deleted = vectors, deleted
+
+    def _apply_delta(self, items: Sequence[tuple], vectors: np.ndarray):
+        if self.dims == 0:
+            self.dims = vectors.shape[1]
+            self._delta_vectors = np.empty((0, self.dims), dtype=np.float32)
+        self._reserve_delta(len(self._delta_ids) + len(items))
+        for (doc_id, source, _), vector in zip(items, vectors):
+            if doc_id in self.row_by_id:
+                self.deleted[self.row_by_id[doc_id]] = True
+            previous = self._delta_row_by_id.get(doc_id)
+            if previous is not None:
+                self._delta_deleted[previous] = True
+            row = len(self._delta_ids)
+            self._delta_row_by_id[doc_id] = row
+            self._delta_ids.append(doc_id)
+            self._delta_sources.append(source)
+            self._delta_vectors[row] = vector
+            self._delta_columns.append(source.get("metadata", {}))
+
+    def _compact_delta_if_needed(self):
+        """Перезапись delta.jsonl и строк в памяти без устаревших записей повторно добавленных статей"""
+        live = len(self._delta_row_by_id)
+        if self._delta_records - live <= max(DELTA_COMPACT_MIN_RECORDS, live):
+            return
+        rows = sorted(self._delta_row_by_id.values())
+        items = [(self._delta_ids[row], self._delta_sources[row], self._delta_vectors[row]) for row in rows]
+        delta_path = self.version_path / "delta.jsonl"
+        tmp_path = delta_path.with_name(delta_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for doc_id, source, vector in items:
+                f.write(json.dumps({"_id": doc_id, "_source": source, "vector": vector.tolist()},
+                                   ensure_ascii=False) + "\n")
+        os.replace(tmp_path, delta_path)
+        vectors = np.array([vector for _, _, vector in items], dtype=np.float32).reshape(len(items), self.dims)
+        self._reset_delta()
+        self._apply_delta(items, vectors)
+        self._delta_records = len(items)
+
+    def add(self, items: Sequence[tuple]) -> List[str]:
+        """Upsert статей (_id, _source, вектор эмбеддера), возвращает результат для каждой: created/updated"""
+        with self._lock:
+            results = ["updated" if doc_id in self.row_by_id or doc_id in self._delta_row_by_id else "created"
+                       for doc_id, _, _ in items]
+            if not items:
+                return results
+            if self.projection is not None:
+                # В delta.jsonl пишутся векторы в размерности этой версии индекса
+                projected = self.projection.apply([vector for _, _, vector in items])
+                items = [(doc_id, source, vector) for (doc_id, source, _), vector in zip(items, projected)]
+            vectors = self._delta_matrix(items)
+            self.version_path.mkdir(parents=True, exist_ok=True)
+            with open(self.version_path / "delta.jsonl", "a", encoding="utf-8") as f:
+                for doc_id, source, vector in items:
+                    f.write(json.dumps({"_id": doc_id, "_source": source, "vector": list(map(float, vector))},
+                                       ensure_ascii=False) + "\n")
+            self._apply_delta(items, vectors)
+            self._delta_records += len(items)
+            self._compact_delta_if_needed()
+            return results
+
+    # --- Поиск ---
+
+    def _scores(self, vectors: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Косинусная близость блоками, чтобы float16-матрица не приводилась к float32 целиком"""
+        if rows is not None:
+            return np.asarray(vectors[rows], dtype=np.float32) @ query
+        scores = np.empty(vectors.shape[0], dtype=np.float32)
+        for start in range(0, vectors.shape[0], SCORE_BLOCK_ROWS):
+            block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+            scores[start:start + block.shape[0]] = block @ query
+        return scores
+
+    def _with_passages(self, passage_vectors: np.ndarray, passage_offsets: np.ndarray,
+                       scores: np.ndarray, query: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """Свёртка пассажей: оценка статьи - максимум близости её вектора и векторов её пассажей"""
+        if passage_vectors.shape[0] == 0:
+            return scores
+        if rows is None:
+            starts = passage_offsets[:-1]
+            counts = np.diff(passage_offsets)
+            passage_scores = self._scores(passage_vectors, query, None)
+        else:
+            counts = passage_offsets[rows + 1] - passage_offsets[rows]
+            starts = np.cumsum(counts) - counts
+            # Номера пассажей выбранных строк подряд: смещение каждой строки плюс сквозной номер
+            passage_rows = np.repeat(passage_offsets[rows] - starts, counts) + np.arange(counts.sum())
+            passage_scores = self._scores(passage_vectors, query, passage_rows)
+        has_passages = counts > 0
+        if has_passages.any():
+            scores[has_passages] = np.maximum(scores[has_passages],
+                                              np.maximum.reduceat(passage_scores, starts[has_passages]))
+        return scores
+
+    @staticmethod
+    def _segment_mask(columns, size, excluded, filters) -> Optional[np.ndarray]:
+        """Строки сегмента, подходящие под фильтры и не удалённые (None - подходят все)"""
+        mask = columns.mask(size, **filters)
+        if excluded is not None and excluded.any():
+            mask = ~excluded if mask is None else mask & ~excluded
+        return mask
+
+    def _segment_top_k(self, vectors, mask, query, k, collapse=None):
+        size = vectors.shape[0]
+        if size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        collapse = collapse or (lambda scores, query, rows: scores)
+        if mask is None:
+            scores = collapse(self._scores(vectors, query, None), query, None)
+            best = top_k(scores, k)
+            return best, scores[best]
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        if rows.size < size // 4:
+            # Селективный фильтр: считаем близость только для подходящих строк
+            scores = collapse(self._scores(vectors, query, rows), query, rows)
+            best = top_k(scores, k)
+            return rows[best], scores[best]
+        scores = collapse(self._scores(vectors, query, None), query, None)
+        scores[~mask] = -np.inf
+        best = top_k(scores, min(k, rows.size))
+        return best, scores[best]
+
+    def search(self, query_vector: Sequence[float], k: int, author: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None,
+               tag: Optional[str] = None) -> List[tuple]:
+        """Top-k статей для вектора эмбеддера: список (_id, score, _source); score как у ES для cosine: (1 + cos) / 2.
+
+        Под блокировкой берутся только ссылки на загруженную версию (с её проекцией) и маски статей
+        из /ingest; близость считается и документы читаются без неё, параллельно с другими поисками
+        и /ingest. Буферы /ingest не перезаписываются: новые статьи пишутся за снятой длиной,
+        а при росте и сжатии создаются новые массивы и списки.
+        """
+        filters = {"author": author, "date_from": date_from, "date_to": date_to, "tag": tag}
+        with self._lock:
+            if self.size == 0 and not self._delta_ids:
+                return []
+            projection = self.projection
+            vectors, columns, deleted = self.vectors, self.columns, self.deleted.copy()
+            collapse = partial(self._with_passages, self.passage_vectors, self.passage_offsets)
+            documents, offsets = self._documents, self._offsets
+            delta_size = len(self._delta_ids)
+            delta_ids, delta_sources = self._delta_ids, self._delta_sources
+            delta_vectors = self._delta_vectors[:delta_size]
+            delta_mask = self._segment_mask(self._delta_columns, delta_size, self._delta_deleted[:delta_size], filters)
+
+        query = np.asarray(query_vector, dtype=np.float32)[None, :]
+        if projection is not None:
+            query = projection.apply(query)
+        query = normalize_rows(query)[0]
+        base_mask = self._segment_mask(columns, vectors.shape[0], deleted, filters)
+        base_rows, base_scores = self._segment_top_k(vectors, base_mask, query, k, collapse=collapse)
+        delta_rows, delta_scores = self._segment_top_k(delta_vectors, delta_mask, query, k)
+        candidates = [(float(score), "base", int(row)) for row, score in zip(base_rows, base_scores)]
+        candidates += [(float(score), "delta", int(row)) for row, score in zip(delta_rows, delta_scores)]
+        candidates.sort(key=lambda candidate: -candidate[0])
+
+        results = []
+        for score, segment, row in candidates[:k]:
+            if segment == "base":
+                doc = self._read_document(documents, offsets, row)
+                doc_id, source = doc["_id"], doc["_source"]
+            else:
+                doc_id, source = delta_ids[row], delta_sources[row]
+            results.append((doc_id, (1 + score) / 2, source))
+        return results
+
+    def close(self):
+        if self._documents is not None:
+            self._documents.close()
+
+
+def merge_partial(source: dict, doc: dict):
+    """Частичное обновление как у update в Elasticsearch: вложенные объекты сливаются, остальное заменяется"""
+    for key, value in doc.items():
+        if isinstance(value, dict) and isinstance(source.get(key), dict):
+            merge_partial(source[key], value)
+        else:
+            source[key] = value
+
+
+class LocalStoreWriter:
+    """Сборка новой версии локального индекса и атомарное переключение на неё по окончании.
+
+    Повторяет интерфейс BulkIndexer (submit/flush/close, succeeded/failed), поэтому
+    fill_vdb.process_dataset может писать и в Elasticsearch, и в локальный индекс.
+    """
+
+    def __init__(self, path: Path, dtype: str = "float32", logger=None):
+        self.path = Path(path)
+        self.dtype = np.dtype(dtype)
+        self.logger = logger
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.version = next_version_name(self.path)
+        self.build_path = self.path / self.version
+        self.build_path.mkdir()
+        self._vectors = open(self.build_path / "vectors.bin", "wb")
+        self._documents = open(self.build_path / "documents.jsonl", "wb")
+        self._passages = open(self.build_path / "passages.bin", "wb")
+        self._passage_offsets: List[int] = [0]
+        self._offsets: List[int] = []
+        self._ids: List[str] = []
+        self._metadata: List[dict] = []
+        self._seen = set()
+        # Частичные обновления уже записанных документов (_op_type update, DEDUP_MODE=merge)
+        self._updates: Dict[str, dict] = {}
+        # Проекция векторов версии (передаёт ProjectingIndexer), сохраняется в её папке до переключения
+        self.projection: Optional[Projection] = None
+        self.dims = None
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, actions: Iterable[dict]):
+        for action in actions:
+            if action.get("_op_type", "index") == "update":
+                merge_partial(self._updates.setdefault(action["_id"], {}), action["doc"])
+                continue
+            if action.get("_op_type", "index") != "index":
+                continue  # локальный индекс всегда собирается целиком, удаления не нужны
+            source = dict(action["_source"])
+            vector = normalize_rows(np.asarray(source.pop("vector"), dtype=np.float32)[None, :])[0]
+            passages = [passage["vector"] for passage in source.pop("passages", ())]
+            if self.dims is None:
+                self.dims = vector.shape[0]
+            if vector.shape[0] != self.dims or action["_id"] in self._seen:
+                self.failed += 1
+                if self.logger is not None:
+                    self.logger.error(f"Local store: skipped document {action['_id']} (duplicate id or wrong dims)")
+                continue
+            self._seen.add(action["_id"])
+            self._vectors.write(vector.astype(self.dtype).tobytes())
+            if passages:
+                passages = normalize_rows(np.asarray(passages, dtype=np.float32))
+                self._passages.write(passages.astype(self.dtype).tobytes())
+            self._passage_offsets.append(self._passage_offsets[-1] + len(passages))
+            self._offsets.append(self._documents.tell())
+            self._documents.write(json.dumps({"_id": action["_id"], "_source": source},
+                                             ensure_ascii=False).encode("utf-8") + b"\n")
+            self._ids.append(action["_id"])
+            self._metadata.append({"metadata": source.get("metadata", {})})
+            self.succeeded += 1
+
+    def flush(self):
+        """submit синхронный, ждать нечего: интерфейс BulkIndexer"""
+
+    def _apply_updates(self):
+        """Обновления применяются к записанным документам одной перезаписью documents.jsonl"""
+        path = self.build_path / "documents.jsonl"
+        updated_path = self.build_path / "documents.jsonl.tmp"
+        applied = set()
+        with open(path, "rb") as src, open(updated_path, "wb") as dst:
+            for row, line in enumerate(src):
+                self._offsets[row] = dst.tell()
+                update = self._updates.get(self._ids[row])
+                if update is not None:
+                    doc = json.loads(line)
+                    merge_partial(doc["_source"], update)
+                    self._metadata[row] = {"metadata": doc["_source"].get("metadata", {})}
+                    line = json.dumps(doc, ensure_ascii=False).encode("utf-8") + b"\n"
+                    applied.add(doc["_id"])
+                dst.write(line)
+        os.replace(updated_path, path)
+        self.succeeded += len(applied)
+        missing = len(self._updates) - len(applied)
+        if missing:
+            self.failed += missing
+            if self.logger is not None:
+                self.logger.error(f"Local store: {missing} updates refer to missing documents")
+
+    def close(self):
+        self._vectors.close()
+        self._documents.close()
+        self._passages.close()
+        if self._updates:
+            self._apply_updates()
+        np.save(self.build_path / "offsets.npy", np.array(self._offsets, dtype=np.int64))
+        np.save(self.build_path / "passage_offsets.npy", np.array(self._passage_offsets, dtype=np.int64))
+        FilterColumns.from_sources(self._metadata).save(self.build_path)
+        with open(self.build_path / "ids.json", "w", encoding="utf-8") as f:
+            json.dump(self._ids, f, ensure_ascii=False)
+        with open(self.build_path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump({"format": STORE_FORMAT, "size": len(self._ids), "dims": self.dims or 0,
+                       "dtype": self.dtype.name, "passages": self._passage_offsets[-1]}, f)
+
+        if self.projection is not None:
+            self.projection.save(self.build_path / "projection.npz")
+        self._publish()
+        return self.succeeded, self.failed
+
+    def _publish(self):
+        """Переключение CURRENT на собранную версию одной операцией: бэкенд видит либо прежнюю версию,
+        либо новую. Прежние версии (и файлы индекса без версий) удаляются вместе с delta.jsonl (статьи из /ingest
+        fill_vdb.py переносит в новую версию при сборке): процессы с открытым memmap
+        дочитают старые файлы, а начатая загрузка удалённой версии оставит загруженную"""
+        pointer = self.path / (CURRENT_FILE + ".tmp")
+        pointer.write_text(self.version, encoding="utf-8")
+        os.replace(pointer, self.path / CURRENT_FILE)
+        for item in self.path.iterdir():
+            if item.name in (CURRENT_FILE, self.version):
+                continue
+            if item.is_dir():
+                shutil.rmtree(item, ignore_errors=True)
+            else:
+                item.unlink(missing_ok=True)
+
+    def abort(self):
+        """Отмена сборки: текущий индекс остаётся без изменений"""
+        self._vectors.close()
+        self._documents.close()
+        self._passages.close()
+        shutil.rmtree(self.build_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
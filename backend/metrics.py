@@ -0,0 +1,225 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config.config import configuration
+
+# Встроенные метрики в текстовом формате Prometheus: счётчики и гистограммы с метками
+# без внешних зависимостей. Обновление - поиск корзины и инкремент под блокировкой,
+# поэтому метрики можно держать включёнными в продакшене.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждой комбинации меток: счётчики по корзинам (последняя - +Inf), сумма и количество
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> Tuple[float, int]:
+        """Сумма и количество наблюдений"""
+        state = self._values.get(self._key(labels))
+        return (state[1], state[2]) if state else (0.0, 0)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(state[0]), state[1], state[2]) for key, state in self._values.items()]
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        # Коллекторы считывают значения в момент запроса /metrics (например, статистику кэша)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, float]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, str, str, float]]]):
+        """collector возвращает кортежи (имя, тип, описание, значение)"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        for collector in self._collectors:
+            for name, kind, documentation, value in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status"))
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route"))
+stage_seconds = registry.histogram(
+    "stage_duration_seconds", "Latency of request/pipeline stages", ("operation", "stage"))
+embedding_batch_size = registry.histogram(
+    "embedding_batch_size", "Texts per embedder call", ("source",), buckets=SIZE_BUCKETS)
+embedding_seconds = registry.histogram(
+    "embedding_duration_seconds", "Embedder call latency", ("embedder",))
+backend_errors = registry.counter(
+    "search_backend_errors_total", "Failed search backend operations", ("backend", "operation"))
+search_coalesced = registry.counter(
+    "search_coalesced_total", "Searches answered by an identical in-flight search")
+search_response_cache_hits = registry.counter(
+    "search_response_cache_hits_total", "Searches answered from the response cache")
+gigachat_requests = registry.counter(
+    "gigachat_requests_total", "GigaChat embeddings API requests by HTTP status (error - no response)", ("status",))
+gigachat_token_refreshes = registry.counter(
+    "gigachat_token_refreshes_total", "GigaChat access tokens obtained")
+ingest_passages = registry.counter(
+    "ingest_passages_total", "Full-text passages by outcome: embedded, duplicate, short, over_budget", ("result",))
+ingest_duplicates = registry.counter(
+    "ingest_duplicates_total", "Near-duplicate articles found during ingestion by DEDUP_MODE action", ("action",))
+
+
+# Разбивка по этапам текущего запроса для заголовка Server-Timing
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings]
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def stage(operation: str, name: str):
+    """Замер этапа: гистограмма stage_duration_seconds и запись в Server-Timing текущего запроса"""
+    if not configuration.metrics_enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, operation=operation, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def stage_report(operation: str) -> Dict[str, dict]:
+    """Суммарное время и количество замеров по этапам операции (для логов пакетных скриптов)"""
+    report = {}
+    with stage_seconds._lock:
+        keys = [key for key in stage_seconds._values if key[0] == operation]
+    for key in keys:
+        total, count = stage_seconds.summary(operation=operation, stage=key[1])
+        report[key[1]] = {"seconds": round(total, 3), "count": count}
+    return report
@@ -1,6 +1,9 @@
-from pydantic import BaseModel
+import hashlib
+from pydantic import BaseModel, Field
 from typing import List, Optional
 
+from config.config import configuration
+
 
 class ArticleMetadata(BaseModel):
     author: str
@@ -8,18 +11,41 @@ class ArticleMetadata(BaseModel):
     tags: List[str]
 
 class Article(BaseModel):
+    id: Optional[str] = None
     title: str
     url: str
     abstract: str
     metadata: ArticleMetadata
 
+    def document_id(self) -> str:
+        # Детерминированный _id: повторная отправка той же статьи перезаписывает документ, а не дублирует его
+        if self.id:
+            return self.id
+        key = self.url or f"{self.title}\n{self.abstract}"
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+class IngestItemStatus(BaseModel):
+    line: int
+    id: Optional[str] = None
+    status: str
+    error: Optional[str] = None
+
+class IngestBatchResult(BaseModel):
+    indexed: int
+    failed: int
+    items: List[IngestItemStatus]
+
 class SearchRequest(BaseModel):
     query: str
     author_filter: Optional[str] = None
     date_from: Optional[str] = None
     date_to: Optional[str] = None
     tags_filter: Optional[str] = None
-    top_k: int = 5
+    top_k: int = Field(default=5, ge=1, le=configuration.search_max_top_k)
+    # Пагинация (/search/page): top_k - размер страницы, offset - номер первого результата,
+    # cursor - идентификатор сохранённой ранжированной выдачи из ответа на предыдущую страницу
+    offset: int = Field(default=0, ge=0)
+    cursor: Optional[str] = None
 
 class SearchResult(BaseModel):
     id: str
@@ -27,4 +53,30 @@ class SearchResult(BaseModel):
     url: str
     abstract: str
     similarity_score: float
-    metadata: ArticleMetadata
\ No newline at end of file
+    metadata: ArticleMetadata
+
+
+class ArticleFullText(BaseModel):
+    id: str
+    full_text: str
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+class DateBucket(BaseModel):
+    key: str
+    count: int
+
+class Facets(BaseModel):
+    documents: int
+    tags: List[FacetValue] = []
+    authors: List[FacetValue] = []
+    dates: List[DateBucket] = []
+
+class SearchPage(BaseModel):
+    results: List[SearchResult]
+    cursor: Optional[str] = None
+    offset: int
+    next_offset: Optional[int] = None
+    total: int
@@ -0,0 +1,40 @@
+import re
+from typing import List
+
+import pandas as pd
+
+# Нормализация авторов: поле metadata.authors хранит каждого автора отдельно
+# в нижнем регистре, с ё -> е и без знаков препинания, чтобы фильтр работал по префиксам слов.
+
+AUTHOR_SEPARATORS_RE = re.compile(r"[;,\n]+")
+NON_WORD_RE = re.compile(r"[^\w\-]+", re.UNICODE)
+
+
+def normalize_author(name: str) -> str:
+    name = name.lower().replace("ё", "е")
+    return " ".join(NON_WORD_RE.sub(" ", name).split())
+
+
+def split_authors(authors_raw) -> List[str]:
+    """Строка авторов из датасета -> список нормализованных имён без повторов"""
+    if not isinstance(authors_raw, str):
+        return []
+    authors = []
+    for name in AUTHOR_SEPARATORS_RE.split(authors_raw):
+        name = normalize_author(name)
+        if name and name not in authors:
+            authors.append(name)
+    return authors
+
+
+def split_authors_column(authors: pd.Series) -> pd.Series:
+    """split_authors для целой колонки строковыми операциями pandas (списки в том же индексе)"""
+    names = authors.where(authors.map(type) == str).str.split(AUTHOR_SEPARATORS_RE).explode()
+    names = (names.str.lower().str.replace("ё", "е", regex=False)
+             .str.replace(NON_WORD_RE, " ", regex=True).str.split().str.join(" "))
+    names = names[names.notna() & (names != "")]
+    # Повторы внутри одной строки авторов убираются с сохранением порядка
+    pairs = pd.DataFrame({"row": names.index, "name": names.to_numpy()})
+    names = names[~pairs.duplicated().to_numpy()]
+    result = names.groupby(level=0).agg(list).reindex(authors.index)
+    return result.map(lambda value: value if isinstance(value, list) else [])
@@ -0,0 +1,71 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional, Tuple
+
+from config.config import configuration
+from backend.model import SearchRequest, SearchResult
+
+
+class RankedHits(NamedTuple):
+    request_key: Tuple
+    results: List[SearchResult]
+    window: int
+    created: float
+
+    @property
+    def exhausted(self) -> bool:
+        # Бэкенд вернул меньше, чем просили: дальше результатов нет
+        return len(self.results) < self.window
+
+
+def request_key(request: SearchRequest) -> Tuple:
+    """Запрос и фильтры без параметров страницы"""
+    return (request.query, request.author_filter, request.date_from, request.date_to, request.tags_filter)
+
+
+class SearchCursorCache:
+    """Ранжированные выдачи knn-поиска для постраничного просмотра.
+
+    Первая страница выполняет knn с запасом (window результатов) и сохраняет выдачу под курсором;
+    следующие страницы берутся срезом из неё, без повторной векторизации запроса и поиска.
+    Старые курсоры вытесняются по LRU и по истечении TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[str, RankedHits]" = OrderedDict()
+
+    def get(self, cursor: Optional[str], request: SearchRequest) -> Optional[RankedHits]:
+        if not cursor:
+            return None
+        entry = self._entries.get(cursor)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created > self.ttl:
+            del self._entries[cursor]
+            return None
+        # Курсор от другого запроса или других фильтров не используем
+        if entry.request_key != request_key(request):
+            return None
+        self._entries.move_to_end(cursor)
+        return entry
+
+    def put(self, request: SearchRequest, results: List[SearchResult], window: int,
+            cursor: Optional[str] = None) -> str:
+        cursor = cursor or uuid.uuid4().hex
+        self._entries[cursor] = RankedHits(request_key(request), results, window, time.monotonic())
+        self._entries.move_to_end(cursor)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return cursor
+
+    def clear(self):
+        self._entries.clear()
+
+
+search_cursors = SearchCursorCache(
+    max_entries=configuration.search_cursor_cache_size,
+    ttl_seconds=configuration.search_cursor_ttl_seconds,
+)
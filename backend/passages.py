@@ -0,0 +1,97 @@
+import hashlib
+import re
+from collections import OrderedDict, deque
+from typing import Iterator, List, Tuple
+
+from config.config import configuration
+
+# Пассажи полного текста для векторизации (PASSAGE_MODE).
+#
+# Текст читается потоково по словам (finditer, без разбиения всего текста): окно из
+# PASSAGE_MAX_TOKENS слов сдвигается на PASSAGE_MAX_TOKENS - PASSAGE_OVERLAP_TOKENS слов.
+# Разбор останавливается после PASSAGE_MAX_PER_ARTICLE окон, поэтому время разбиения и число
+# векторизуемых пассажей статьи ограничены бюджетом, а не длиной текста.
+# Окна, уже встречавшиеся в этой или предыдущих статьях (колонтитулы, шаблонные разделы,
+# повторы), пропускаются по хэшу нормализованного текста, но расходуют бюджет.
+
+WORD_RE = re.compile(r"\S+")
+# Хэши пассажей для пропуска повторов между статьями: LRU, часто повторяющиеся шаблоны не вытесняются
+DEDUP_MAX_HASHES = 1_000_000
+
+
+def passage_hash(text: str) -> bytes:
+    """Хэш пассажа без учёта регистра и пробелов"""
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
+class PassageChunker:
+    """Разбиение полных текстов на перекрывающиеся пассажи с бюджетом на статью и пропуском повторов"""
+
+    def __init__(self, max_tokens: int, overlap_tokens: int, min_tokens: int, max_passages: int):
+        if not 0 <= overlap_tokens < max_tokens:
+            raise ValueError("PASSAGE_OVERLAP_TOKENS must be non-negative and less than PASSAGE_MAX_TOKENS")
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+        self.max_passages = max_passages
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+        self.stats = {"articles": 0, "passages": 0, "duplicate": 0, "short": 0, "over_budget": 0}
+
+    @classmethod
+    def from_config(cls) -> "PassageChunker":
+        return cls(configuration.passage_max_tokens, configuration.passage_overlap_tokens,
+                   configuration.passage_min_tokens, configuration.passage_max_per_article)
+
+    def windows(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Окна текста: (начало, конец, число новых слов); слова дальше последнего окна не читаются"""
+        stride = self.max_tokens - self.overlap_tokens
+        window = deque()
+        emitted = False
+        for match in WORD_RE.finditer(text):
+            window.append(match.span())
+            if len(window) == self.max_tokens:
+                yield window[0][0], window[-1][1], stride if emitted else len(window)
+                emitted = True
+                for _ in range(stride):
+                    window.popleft()
+        # Хвост: слова после последнего полного окна вместе с перекрытием
+        new_words = len(window) - (self.overlap_tokens if emitted else 0)
+        if new_words > 0:
+            yield window[0][0], window[-1][1], new_words
+
+    def _is_duplicate(self, key: bytes) -> bool:
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            return True
+        self._seen[key] = None
+        if len(self._seen) > DEDUP_MAX_HASHES:
+            self._seen.popitem(last=False)
+        return False
+
+    def split(self, text: str) -> List[str]:
+        """Пассажи полного текста статьи для векторизации"""
+        self.stats["articles"] += 1
+        passages = []
+        budget = self.max_passages
+        for start, end, new_words in self.windows(text or ""):
+            if budget == 0:
+                self.stats["over_budget"] += 1
+                break
+            budget -= 1
+            if new_words < self.min_tokens:
+                self.stats["short"] += 1
+                continue
+            passage = " ".join(text[start:end].split())
+            if self._is_duplicate(passage_hash(passage)):
+                self.stats["duplicate"] += 1
+                continue
+            passages.append(passage)
+        self.stats["passages"] += len(passages)
+        return passages
+
+
+def passage_settings() -> dict:
+    """Параметры разбиения: входят в хэш содержимого документа, их изменение переиндексирует статьи"""
+    return {"max_tokens": configuration.passage_max_tokens, "overlap_tokens": configuration.passage_overlap_tokens,
+            "min_tokens": configuration.passage_min_tokens, "max_per_article": configuration.passage_max_per_article}
@@ -0,0 +1,226 @@
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config.config import configuration
+
+# Понижение размерности векторов индекса (VECTOR_REDUCTION). Память графа HNSW и время knn растут
+# с размерностью, поэтому векторы статей можно хранить в VECTOR_DIMS измерениях:
+#   pca      - проекция на главные компоненты, обученная на векторах корпуса при заполнении базы;
+#   truncate - первые VECTOR_DIMS координат (для моделей, обученных как Matryoshka).
+# Проекция сохраняется для каждой версии индекса до переключения на неё: PROJECTION_DIR/<версионный индекс>.npz
+# для Elasticsearch и projection.npz в папке версии локального индекса. Поисковый бэкенд применяет
+# к векторам запросов и статей из /ingest проекцию того индекса, к которому обращается, поэтому
+# после переключения алиаса векторы запроса и индекса всегда в одной системе координат.
+# Хранилище эмбеддингов и кэш запросов содержат полные векторы.
+
+
+class Projection:
+    """Линейная проекция (vectors - mean) @ components.T с нормировкой результата"""
+
+    def __init__(self, method: str, components: Optional[np.ndarray], mean: Optional[np.ndarray],
+                 source_dims: int, dims: int, explained_variance: Optional[float] = None):
+        self.method = method
+        self.components = components
+        self.mean = mean
+        self.source_dims = source_dims
+        self.dims = dims
+        self.explained_variance = explained_variance
+
+    @classmethod
+    def fit_pca(cls, vectors: np.ndarray, dims: int) -> "Projection":
+        vectors = np.asarray(vectors, dtype=np.float64)
+        if dims > min(vectors.shape):
+            raise ValueError(f"Cannot fit {dims} components on {vectors.shape[0]} vectors of {vectors.shape[1]} dims")
+        mean = vectors.mean(axis=0)
+        # Собственные векторы ковариации (source_dims x source_dims) дешевле SVD всей матрицы корпуса
+        covariance = np.cov(vectors - mean, rowvar=False)
+        eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+        order = np.argsort(eigenvalues)[::-1][:dims]
+        explained = float(eigenvalues[order].sum() / eigenvalues.sum()) if eigenvalues.sum() > 0 else 1.0
+        return cls("pca", eigenvectors[:, order].T.astype(np.float32), mean.astype(np.float32),
+                   source_dims=vectors.shape[1], dims=dims, explained_variance=explained)
+
+    @classmethod
+    def truncate(cls, source_dims: int, dims: int) -> "Projection":
+        if dims > source_dims:
+            raise ValueError(f"Cannot truncate {source_dims}-dimensional vectors to {dims} dims")
+        return cls("truncate", None, None, source_dims=source_dims, dims=dims)
+
+    @classmethod
+    def fit(cls, method: str, vectors: np.ndarray, dims: int) -> "Projection":
+        if method == "pca":
+            return cls.fit_pca(vectors, dims)
+        return cls.truncate(np.asarray(vectors).shape[1], dims)
+
+    def apply(self, vectors) -> np.ndarray:
+        """Проекция матрицы векторов (n x source_dims) в нормированную матрицу float32 (n x dims)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.shape[-1] != self.source_dims:
+            raise ValueError(f"Projection expects {self.source_dims}-dimensional vectors, got {vectors.shape[-1]}")
+        if self.method == "pca":
+            projected = (vectors - self.mean) @ self.components.T
+        else:
+            projected = vectors[..., :self.dims]
+        norms = np.linalg.norm(projected, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        return (projected / norms).astype(np.float32)
+
+    def apply_one(self, vector: Sequence[float]) -> List[float]:
+        return self.apply(np.asarray(vector, dtype=np.float32)[None, :])[0].tolist()
+
+    def save(self, path: Path):
+        """Атомарная запись: процессы бэкенда не прочитают недописанный файл"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, method=self.method, source_dims=self.source_dims, dims=self.dims,
+                     components=self.components if self.components is not None else np.empty(0, dtype=np.float32),
+                     mean=self.mean if self.mean is not None else np.empty(0, dtype=np.float32),
+                     explained_variance=np.nan if self.explained_variance is None else self.explained_variance)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "Projection":
+        with np.load(path) as data:
+            method = str(data["method"])
+            explained = float(data["explained_variance"])
+            return cls(method,
+                       data["components"] if method == "pca" else None,
+                       data["mean"] if method == "pca" else None,
+                       source_dims=int(data["source_dims"]), dims=int(data["dims"]),
+                       explained_variance=None if np.isnan(explained) else explained)
+
+
+def project_actions(actions: Iterable[dict], projection: Projection) -> List[dict]:
+    """Проекция векторов документов bulk-действий (и векторов их пассажей) на месте"""
+    actions = list(actions)
+    indexed = [action["_source"] for action in actions if "vector" in action.get("_source", {})]
+    # Векторы пассажей (PASSAGE_MODE) проецируются той же проекцией, что и вектор статьи
+    for items in (indexed, [passage for source in indexed for passage in source.get("passages", ())]):
+        if items:
+            vectors = projection.apply([item["vector"] for item in items])
+            for item, vector in zip(items, vectors):
+                item["vector"] = vector.tolist()
+    return actions
+
+
+class ProjectingIndexer:
+    """Обёртка над BulkIndexer/LocalStoreWriter, проецирующая векторы документов перед записью.
+
+    Если проекция не передана, первые fit_samples документов буферизуются, на их векторах
+    обучается проекция, после чего буфер и все следующие пакеты уходят в индекс уже спроецированными.
+    На небольшом корпусе проекция обучается на всех документах при закрытии.
+    """
+
+    def __init__(self, indexer, method: str, dims: int, fit_samples: int,
+                 projection: Optional[Projection] = None, logger=None):
+        self.indexer = indexer
+        self.method = method
+        self.dims = dims
+        self.fit_samples = fit_samples
+        self.projection = projection
+        self.logger = logger
+        self._buffer: List[dict] = []
+        self._buffered_vectors = 0
+
+    @property
+    def succeeded(self):
+        return self.indexer.succeeded
+
+    @property
+    def failed(self):
+        return self.indexer.failed
+
+    def _project(self, actions: Iterable[dict]) -> List[dict]:
+        return project_actions(actions, self.projection)
+
+    def _fit(self):
+        vectors = [action["_source"]["vector"] for action in self._buffer if "vector" in action.get("_source", {})]
+        if not vectors:
+            return
+        self.projection = Projection.fit(self.method, np.asarray(vectors, dtype=np.float32), self.dims)
+        if self.logger is not None:
+            explained = (f", explained variance {self.projection.explained_variance:.3f}"
+                         if self.projection.explained_variance is not None else "")
+            self.logger.info(f"Fitted {self.method} projection {self.projection.source_dims} -> {self.dims} dims "
+                             f"on {len(vectors)} vectors{explained}")
+        buffer, self._buffer = self._buffer, []
+        self.indexer.submit(self._project(buffer))
+
+    def submit(self, actions: List[dict]):
+        if self.projection is not None:
+            self.indexer.submit(self._project(actions))
+            return
+        self._buffer.extend(actions)
+        self._buffered_vectors += sum("vector" in action.get("_source", {}) for action in actions)
+        if self._buffered_vectors >= self.fit_samples:
+            self._fit()
+
+    def _flush(self):
+        if self.projection is None:
+            self._fit()
+        if self._buffer:
+            self.indexer.submit(self._buffer)  # в буфере остались только удаления
+            self._buffer = []
+        # LocalStoreWriter сохраняет проекцию в папке собираемой версии до переключения на неё
+        if hasattr(self.indexer, "projection"):
+            self.indexer.projection = self.projection
+
+    def flush(self):
+        self._flush()
+        self.indexer.flush()
+
+    def close(self):
+        self._flush()
+        return self.indexer.close()
+
+    def __enter__(self):
+        self.indexer.__enter__()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self._flush()
+        return self.indexer.__exit__(exc_type, *exc_info)
+
+
+def get_projection_path(index_name: Optional[str] = None) -> Path:
+    """Файл проекции версионного индекса Elasticsearch (без index_name - файл алиаса,
+    который сохранялся до появления проекций по версиям)"""
+    from backend.external import get_index_name
+    path = Path(configuration.projection_dir)
+    if not path.is_absolute():
+        path = configuration.project_root / path
+    return path / f"{index_name or get_index_name()}.npz"
+
+
+_projections: Dict[Path, Tuple[int, Projection]] = {}
+_projection_lock = threading.Lock()
+
+
+def load_projection(path: Path) -> Projection:
+    """Проекция из файла; повторно файл читается, только если он изменился"""
+    version = path.stat().st_mtime_ns
+    cached = _projections.get(path)
+    if cached is None or cached[0] != version:
+        with _projection_lock:
+            cached = _projections.get(path)
+            if cached is None or cached[0] != version:
+                cached = _projections[path] = (version, Projection.load(path))
+    return cached[1]
+
+
+def get_projection(index_name: Optional[str] = None) -> Optional[Projection]:
+    """Проекция версионного индекса index_name (None без понижения размерности)"""
+    if configuration.vector_reduction == "none":
+        return None
+    for path in (get_projection_path(index_name), get_projection_path()):
+        if path.is_file():
+            return load_projection(path)
+    raise RuntimeError(f"Projection {get_projection_path(index_name)} not found, "
+                       f"build the index with fill_vdb.py --mode rebuild")
@@ -0,0 +1,278 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+from elasticsearch import NotFoundError, helpers
+
+from config.config import configuration
+from backend.metrics import stage
+from backend.model import SearchRequest, SearchResult
+from backend.normalization import normalize_author
+from backend.projection import get_projection, get_projection_path, project_actions
+from logger.logger import back_logger
+
+
+class SearchBackend(ABC):
+    """Хранилище статей для векторного поиска"""
+
+    @abstractmethod
+    async def search(self, query_vector: List[float], request: SearchRequest, k: int,
+                     num_candidates: int) -> List[SearchResult]:
+        """Поиск по вектору эмбеддера; при VECTOR_REDUCTION бэкенд проецирует его проекцией индекса"""
+        ...
+
+    @abstractmethod
+    def index_documents(self, actions: List[dict]) -> AsyncIterator[Tuple[bool, dict]]:
+        """Upsert документов {"_id", "_source"}; результаты в формате bulk API с _id документа.
+
+        Порядок результатов не гарантирован: Elasticsearch возвращает повторно отправленные
+        после 429 документы после остальных.
+        """
+        ...
+
+    @abstractmethod
+    def scan_metadata(self) -> AsyncIterator[dict]:
+        """metadata всех статей индекса (подсчёт фасетов без снимка fill_vdb.py)"""
+        ...
+
+    async def close(self):
+        pass
+
+
+# Сколько секунд запоминается версионный индекс за алиасом (и его проекция)
+ALIAS_CACHE_SECONDS = 1.0
+
+
+class ElasticsearchBackend(SearchBackend):
+    def __init__(self, client=None, index_name: Optional[str] = None):
+        # Проекция сохраняется для версионных индексов за алиасом, который собирает fill_vdb.py
+        self.project = index_name is None and configuration.vector_reduction != "none"
+        if client is None or index_name is None:
+            from backend.external import es_client, get_index_name
+            client = client or es_client
+            index_name = index_name or get_index_name()
+        self.client = client
+        self.index_name = index_name
+        self._target_cache = None
+
+    async def _target(self):
+        """Версионный индекс за алиасом и его проекция.
+
+        Запрос и статьи из /ingest проецируются проекцией того индекса, к которому обращается бэкенд:
+        переключение алиаса между проекцией и поиском не смешивает системы координат.
+        """
+        if not self.project:
+            return self.index_name, None
+        now = time.monotonic()
+        if self._target_cache is None or self._target_cache[0] <= now:
+            try:
+                index = next(iter(await self.client.indices.get_alias(name=self.index_name)))
+            except NotFoundError:
+                index = self.index_name  # индекс, собранный до появления алиасов
+            self._target_cache = (now + ALIAS_CACHE_SECONDS, index, get_projection(index))
+        return self._target_cache[1:]
+
+    @staticmethod
+    def build_filters(request: SearchRequest) -> List[dict]:
+        filter_clauses = []
+
+        # Фильтры
+        author = normalize_author(request.author_filter) if request.author_filter else ""
+        if author:
+            # Подполе с edge n-gram: каждое слово запроса - поиск одного терма, без перебора словаря
+            filter_clauses.append({"match": {"metadata.authors.prefix": {"query": author, "operator": "and"}}})
+            back_logger.info("Applying author filter: %s", request.author_filter)
+
+        if request.date_from or request.date_to:
+            range_query = {}
+            if request.date_from:
+                range_query["gte"] = request.date_from
+            if request.date_to:
+                range_query["lte"] = request.date_to
+            filter_clauses.append({"range": {"metadata.published_date": range_query}})
+            back_logger.info("Applying date range filter: %s", range_query)
+
+        if request.tags_filter:
+            # Теги индексируются нормализатором tag_normalizer (mapping.json): без учёта регистра, как фасеты
+            # и локальный бэкенд, поэтому фильтр по тегу из подсказок фасетов находит статьи
+            filter_clauses.append({"term": {"metadata.tags": f"{request.tags_filter.strip().lower()}"}})
+            back_logger.info("Applying tags filter: %s", request.tags_filter)
+        return filter_clauses
+
+    async def search(self, query_vector, request, k, num_candidates):
+        try:
+            return await self._search(query_vector, request, k, num_candidates)
+        except NotFoundError:
+            if not self.project:
+                raise
+            # Прежний индекс удалён после переключения алиаса: повтор по новому индексу за алиасом
+            self._target_cache = None
+            return await self._search(query_vector, request, k, num_candidates)
+
+    async def _search(self, query_vector, request, k, num_candidates):
+        index, projection = await self._target()
+        if projection is not None:
+            with stage("search", "project"):
+                query_vector = projection.apply_one(query_vector)
+
+        # Построение KNN запроса; в режиме пассажей - по nested-векторам пассажей: Elasticsearch
+        # оценивает статью по ближайшему пассажу и возвращает каждую статью один раз
+        knn_query = {
+            "field": "passages.vector" if configuration.passage_mode else "vector",
+            "query_vector": query_vector,
+            "k": k,
+            "num_candidates": num_candidates
+        }
+
+        filter_clauses = self.build_filters(request)
+        if filter_clauses:
+            knn_query["filter"] = filter_clauses
+
+        # Выполнение запроса; при дедлайне запроса Elasticsearch не ждём дольше оставшегося времени
+        from backend.admission import remaining_time
+        remaining = remaining_time()
+        client = self.client if remaining is None else self.client.options(request_timeout=remaining)
+        with stage("search", "es_query"):
+            response = await client.search(
+                index=index,
+                knn=knn_query,
+                source=["title", "url", "abstract", "metadata"] # Исключаем вектор из выдачи
+            )
+
+        # Формирование ответа
+        results = []
+        with stage("search", "build_results"):
+            for hit in response['hits']['hits']:
+                results.append(SearchResult(
+                    id=hit['_id'],
+                    title=hit['_source']['title'],
+                    url=hit['_source']['url'],
+                    abstract=hit['_source']['abstract'],
+                    similarity_score=hit['_score'],
+                    metadata=hit['_source']['metadata']
+                ))
+        return results
+
+    async def index_documents(self, actions):
+        index, projection = await self._target()
+        if projection is not None:
+            actions = project_actions(actions, projection)
+        async for ok, item in helpers.async_streaming_bulk(
+            self.client, actions, index=index,
+            chunk_size=configuration.bulk_chunk_size,
+            max_chunk_bytes=configuration.bulk_max_chunk_bytes,
+            max_retries=configuration.bulk_max_retries,
+            initial_backoff=configuration.bulk_initial_backoff,
+            max_backoff=configuration.bulk_max_backoff,
+            raise_on_error=False,
+            raise_on_exception=False,
+        ):
+            yield ok, item
+
+    async def scan_metadata(self):
+        async for hit in helpers.async_scan(self.client, index=self.index_name, _source=["metadata"],
+                                            size=configuration.bulk_chunk_size):
+            yield hit["_source"].get("metadata", {})
+
+    async def close(self):
+        await self.client.close()
+
+
+class LocalBackend(SearchBackend):
+    """Поиск в процессе по локальному индексу (backend.local_store), без Elasticsearch"""
+
+    def __init__(self, path: Path, fallback_projection: Optional[Path] = None):
+        from backend.local_store import LocalVectorStore
+        self.store = LocalVectorStore(path, fallback_projection=fallback_projection)
+
+    def _reload(self):
+        try:
+            self.store.reload_if_changed()
+        except Exception as e:
+            back_logger.error(f"Failed to load new version of local store {self.store.path}, "
+                              f"keeping the loaded one: {e}")
+
+    def _search(self, query_vector, request, k):
+        self._reload()
+        return self.store.search(query_vector, k, author=request.author_filter, date_from=request.date_from,
+                                 date_to=request.date_to, tag=request.tags_filter)
+
+    async def search(self, query_vector, request, k, num_candidates):
+        # Перемножение матриц отпускает GIL, поэтому поиск выполняется в пуле потоков
+        hits = await asyncio.get_running_loop().run_in_executor(None, self._search, query_vector, request, k)
+        return [
+            SearchResult(
+                id=doc_id,
+                title=source['title'],
+                url=source['url'],
+                abstract=source['abstract'],
+                similarity_score=score,
+                metadata=source['metadata']
+            )
+            for doc_id, score, source in hits
+        ]
+
+    def _add(self, items):
+        # Статьи дописываются к текущей версии, а не к заменённой новой сборкой
+        self._reload()
+        return self.store.add(items)
+
+    async def index_documents(self, actions):
+        items = []
+        for action in actions:
+            source = dict(action["_source"])
+            vector = source.pop("vector")
+            # У статей из /ingest единственный пассаж - вектор статьи, отдельно его хранить не нужно
+            source.pop("passages", None)
+            items.append((action["_id"], source, vector))
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(None, self._add, items)
+        except Exception as e:
+            for action in actions:
+                yield False, {"index": {"_id": action["_id"], "error": str(e)}}
+            return
+        for action, result in zip(actions, results):
+            yield True, {"index": {"_id": action["_id"], "result": result}}
+
+    async def scan_metadata(self):
+        # Документы читаются с диска частями в пуле потоков
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._reload)
+        items = self.store.iter_metadata()
+        while True:
+            chunk = await loop.run_in_executor(None, lambda: list(islice(items, configuration.csv_chunk_size)))
+            if not chunk:
+                break
+            for metadata in chunk:
+                yield metadata
+
+    async def close(self):
+        self.store.close()
+
+
+def get_local_store_path() -> Path:
+    from backend.external import get_index_name
+    path = Path(configuration.local_store_dir)
+    if not path.is_absolute():
+        path = configuration.project_root / path
+    return path / get_index_name()
+
+
+_search_backend: Optional[SearchBackend] = None
+
+
+def get_search_backend() -> SearchBackend:
+    global _search_backend
+    if _search_backend is None:
+        if configuration.search_backend == "local":
+            # Версии, собранные до сохранения проекции в папке версии, используют файл проекции алиаса
+            _search_backend = LocalBackend(get_local_store_path(), fallback_projection=(
+                get_projection_path() if configuration.vector_reduction != "none" else None))
+            back_logger.info(f"Using local vector search backend: {get_local_store_path()}")
+        else:
+            _search_backend = ElasticsearchBackend()
+            back_logger.info("Using Elasticsearch search backend")
+    return _search_backend
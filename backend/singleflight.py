@@ -0,0 +1,86 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from config.config import configuration
+from backend.model import SearchRequest
+from backend.normalization import normalize_author
+from backend.utils import normalize_query
+
+
+def search_key(request: SearchRequest, k: int) -> Tuple:
+    """Канонический ключ поиска: запросы, которые бэкенд выполнит одинаково, получают один ключ"""
+    return (
+        normalize_query(request.query),
+        normalize_author(request.author_filter) or None if request.author_filter else None,
+        request.date_from or None,
+        request.date_to or None,
+        request.tags_filter.strip().lower() or None if request.tags_filter else None,
+        k,
+    )
+
+
+class SingleFlight:
+    """Объединение одновременных одинаковых вызовов: пока вызов с ключом выполняется,
+    остальные вызовы с тем же ключом ждут его результат, а не запускают свой.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Результат fn() и признак того, что он получен от чужого вызова"""
+        task = self._in_flight.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        # shield: отмена одного ожидающего (клиент отключился) не отменяет вызов для остальных
+        return await asyncio.shield(task), shared
+
+
+class ResponseCache:
+    """Кэш ответов с коротким TTL; сбрасывается целиком при записи в индекс (invalidate)"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        # Поколение растёт при каждом сбросе: ответ поиска, начатого до записи, в кэш не попадает
+        self.generation = 0
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, value = entry
+        if time.monotonic() - created > self.ttl:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, generation: int):
+        if not self.enabled or generation != self.generation:
+            return
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self):
+        self.generation += 1
+        self._entries.clear()
+
+
+search_flight = SingleFlight()
+search_response_cache = ResponseCache(
+    max_entries=configuration.search_response_cache_size,
+    ttl_seconds=configuration.search_response_cache_ttl_seconds,
+)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from config.config import configuration
+from backend.external import load_embedder, get_embedder_type
+from backend.utils import get_embeddings
+from logger.logger import back_logger
+
+# Текст для прогрева: типичная длина заголовка с аннотацией
+WARMUP_TEXT = ("Применение методов машинного обучения для анализа научных публикаций. "
+               "В статье рассматриваются подходы к векторному представлению текстов и поиску похожих работ.")
+
+
+class EmbedderLoader:
+    """Фоновая загрузка и прогрев эмбеддера при старте бэкенда.
+
+    Загрузка модели и первые проходы с типичными размерами пакетов выполняются в пуле потоков,
+    пока приложение уже принимает запросы; /readyz отвечает 200 только после прогрева.
+    Эмбеддеры внешнего API (GigaChat) только создаются, без прогрева.
+    """
+
+    def __init__(self, warmup_batch_sizes: List[int], remote: bool = False):
+        self.warmup_batch_sizes = warmup_batch_sizes
+        # remote: модель живёт в сервере эмбеддингов, готовность - его доступность
+        self.remote = remote
+        self.state = "not_started"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def _load_and_warm_up(self):
+        start = time.perf_counter()
+        embedder = load_embedder()
+        self.load_seconds = time.perf_counter() - start
+
+        if embedder.remote_api:
+            # Эмбеддер внешнего API не прогревается: каждый запуск бэкенда расходовал бы платные запросы
+            self.warmup_batch_sizes = []
+            self.warmup_seconds = 0.0
+            return
+
+        self.state = "warming_up"
+        start = time.perf_counter()
+        for batch_size in self.warmup_batch_sizes:
+            get_embeddings([WARMUP_TEXT] * batch_size)
+        self.warmup_seconds = time.perf_counter() - start
+
+    async def _wait_for_server(self):
+        from backend.embedding_server import get_embedding_client
+
+        self.state = "waiting_for_server"
+        client = get_embedding_client()
+        start = time.perf_counter()
+        while not await client.ping():
+            await asyncio.sleep(0.5)
+        self.load_seconds = time.perf_counter() - start
+        self.warmup_seconds = 0.0
+        self.state = "ready"
+        back_logger.info(f"Embedding server {client.socket_path} is available")
+
+    async def _run(self):
+        if self.remote:
+            await self._wait_for_server()
+            return
+        self.state = "loading"
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._load_and_warm_up)
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            back_logger.error(f"Embedder loading failed: {e}")
+            return
+        self.state = "ready"
+        back_logger.info(f"Embedder {get_embedder_type()} ready: loaded in {self.load_seconds:.2f}s, "
+                         f"warmed up in {self.warmup_seconds:.2f}s (batch sizes {self.warmup_batch_sizes})")
+
+    async def start(self, background: bool = True):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if not background:
+            await self._task
+
+    async def stop(self):
+        # Поток загрузки модели прервать нельзя: дожидаться его при остановке не нужно
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    def status(self) -> dict:
+        return {
+            "status": self.state,
+            "embedder": get_embedder_type(),
+            "embedding_server": configuration.embedding_server_socket if self.remote else None,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "error": self.error,
+        }
+
+
+embedder_loader = EmbedderLoader(
+    warmup_batch_sizes=configuration.embedder_warmup_batch_sizes if configuration.embedder_warmup else [],
+    remote=bool(configuration.embedding_server_socket),
+)
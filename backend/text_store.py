@@ -0,0 +1,94 @@
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Set, Tuple
+
+from config.config import configuration
+
+# Хранилище полных текстов статей отдельно от поискового индекса: в документе индекса
+# остаются заголовок, аннотация, метаданные и вектор, поэтому шарды и слияния сегментов меньше,
+# а page cache занят графом HNSW, а не текстом. Полный текст нужен только при открытии статьи
+# (GET /articles/{id}/full_text) и читается по id из SQLite, тексты сжаты zlib.
+
+
+class FullTextStore:
+    """SQLite-таблица id -> сжатый zlib полный текст статьи"""
+
+    def __init__(self, path: Path, compression_level: int = 6):
+        self.path = Path(path)
+        self.compression_level = compression_level
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        # WAL: fill_vdb.py пишет, пока бэкенд читает
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute('''
+            CREATE TABLE IF NOT EXISTS full_texts (
+                id TEXT PRIMARY KEY,
+                text BLOB NOT NULL,
+                size INTEGER NOT NULL
+            )
+        ''')
+        self._db.commit()
+
+    def put_many(self, items: Iterable[Tuple[str, str]]):
+        rows = []
+        for doc_id, text in items:
+            data = text.encode("utf-8")
+            rows.append((doc_id, zlib.compress(data, self.compression_level), len(data)))
+        if not rows:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO full_texts VALUES (?, ?, ?)", rows)
+            self._db.commit()
+
+    def get(self, doc_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT text FROM full_texts WHERE id = ?", (doc_id,)).fetchone()
+        return None if row is None else zlib.decompress(row[0]).decode("utf-8")
+
+    def delete_many(self, ids: Iterable[str]):
+        with self._lock:
+            self._db.executemany("DELETE FROM full_texts WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._db.commit()
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT id FROM full_texts")]
+
+    def retain(self, keep_ids: Set[str]) -> int:
+        """Удаление текстов статей, которых нет в keep_ids (после полной переиндексации)"""
+        removed = [doc_id for doc_id in self.ids() if doc_id not in keep_ids]
+        self.delete_many(removed)
+        return len(removed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, raw_bytes, compressed_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(text)), 0) FROM full_texts").fetchone()
+        return {"documents": count, "text_bytes": raw_bytes, "compressed_bytes": compressed_bytes,
+                "file_bytes": self.path.stat().st_size if self.path.exists() else 0}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def get_full_text_store_path() -> Path:
+    path = Path(configuration.full_text_store_path)
+    return path if path.is_absolute() else configuration.project_root / path
+
+
+_full_text_store: Optional[FullTextStore] = None
+_full_text_store_lock = threading.Lock()
+
+
+def get_full_text_store() -> FullTextStore:
+    global _full_text_store
+    if _full_text_store is None:
+        with _full_text_store_lock:
+            if _full_text_store is None:
+                _full_text_store = FullTextStore(get_full_text_store_path(),
+                                                 compression_level=configuration.full_text_compression_level)
+    return _full_text_store
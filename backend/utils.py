@@ -1,11 +1,191 @@
-from typing import List
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
 from config.config import configuration
-from backend.external import giga, hf_model
+from backend.external import get_embedder, get_embedder_type, get_embedder_model_name, is_embedder_loaded
+from backend.metrics import embedding_batch_size, embedding_seconds, registry
+
+
+def get_embeddings(texts: List[str]) -> List[List[float]]:
+    """Пакетная векторизация: один вызов модели (или API) на весь список текстов"""
+    if not texts:
+        return []
+    return get_embeddings_array(texts).tolist()
+
+
+def get_embeddings_array(texts: List[str]) -> np.ndarray:
+    """Пакетная векторизация в матрицу float32 (len(texts) x dims)"""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    embedding_batch_size.observe(len(texts), source="embedder")
+    with embedding_seconds.time(embedder=get_embedder_type()):
+        return get_embedder().encode(texts)
+
+
+async def get_embeddings_array_async(texts: List[str]) -> np.ndarray:
+    """get_embeddings_array для event loop: эмбеддер с асинхронным API (GigaChat) вызывается напрямую,
+    локальная модель - в пуле потоков"""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    embedder = get_embedder() if is_embedder_loaded() else None
+    if not hasattr(embedder, "encode_async"):
+        return await asyncio.get_running_loop().run_in_executor(None, get_embeddings_array, texts)
+    embedding_batch_size.observe(len(texts), source="embedder")
+    with embedding_seconds.time(embedder=get_embedder_type()):
+        return await embedder.encode_async(texts)
+
+
+def get_cached_embeddings(texts: List[str], use_cache: Optional[Sequence[bool]] = None) -> List[List[float]]:
+    """Пакетная векторизация с кэшем: эмбеддер вызывается только для промахов"""
+    if use_cache is None:
+        use_cache = [True] * len(texts)
+    vectors: List[Optional[List[float]]] = [
+        embedding_cache.get(text) if cached else None for text, cached in zip(texts, use_cache)
+    ]
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = get_embeddings([texts[i] for i in missing])
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            if use_cache[i]:
+                embedding_cache.put(texts[i], vector)
+    return vectors
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Кэш эмбеддингов запросов.
+
+    Ключ - (тип эмбеддера, имя модели, нормализованный текст). Первый уровень - LRU в памяти
+    с ограничением размера и TTL, второй (необязательный) - SQLite-файл, переживающий
+    перезапуск сервиса. Векторы во втором уровне хранятся как сырые float32.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, path: Optional[Path] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._memory: "OrderedDict[tuple, tuple[float, List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "persistent_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._db = None
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS query_embeddings (
+                    embedder TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (embedder, model, query)
+                )
+            ''')
+            self._db.commit()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    @staticmethod
+    def make_key(text: str) -> tuple:
+        return get_embedder_type(), get_embedder_model_name(), normalize_query(text)
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created_at > self.ttl_seconds
+
+    def get(self, text: str, memory_only: bool = False) -> Optional[List[float]]:
+        if not self.enabled:
+            return None
+        key = self.make_key(text)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created_at, vector = entry
+                if not self._expired(created_at):
+                    self._memory.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return vector
+                del self._memory[key]
+                self._stats["expirations"] += 1
+            if memory_only or self._db is None:
+                if not memory_only:
+                    self._stats["misses"] += 1
+                return None
+            row = self._db.execute(
+                "SELECT vector, created_at FROM query_embeddings WHERE embedder = ? AND model = ? AND query = ?",
+                key,
+            ).fetchone()
+            if row is None or self._expired(row[1]):
+                self._stats["misses"] += 1
+                return None
+            vector = np.frombuffer(row[0], dtype=np.float32).tolist()
+            self._stats["persistent_hits"] += 1
+            self._insert_memory(key, row[1], vector)
+            return vector
+
+    def put(self, text: str, vector: List[float]):
+        if not self.enabled:
+            return
+        key = self.make_key(text)
+        created_at = time.time()
+        with self._lock:
+            self._insert_memory(key, created_at, vector)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?, ?)",
+                    (*key, np.asarray(vector, dtype=np.float32).tobytes(), created_at),
+                )
+                self._db.commit()
+
+    def _insert_memory(self, key: tuple, created_at: float, vector: List[float]):
+        self._memory[key] = (created_at, vector)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._memory)
+        lookups = stats["hits"] + stats["persistent_hits"] + stats["misses"]
+        stats["hit_ratio"] = (stats["hits"] + stats["persistent_hits"]) / lookups if lookups else 0.0
+        return stats
+
+
+def _cache_path() -> Optional[Path]:
+    if not configuration.query_cache_path:
+        return None
+    path = Path(configuration.query_cache_path)
+    return path if path.is_absolute() else configuration.project_root / path
+
+
+embedding_cache = EmbeddingCache(
+    max_size=configuration.query_cache_size,
+    ttl_seconds=configuration.query_cache_ttl_seconds,
+    path=_cache_path(),
+)
+
+
+def embedding_cache_metrics():
+    stats = embedding_cache.stats()
+    yield "embedding_cache_hits_total", "counter", "Query embedding cache hits in memory", stats["hits"]
+    yield "embedding_cache_persistent_hits_total", "counter", "Query embedding cache hits in SQLite", stats["persistent_hits"]
+    yield "embedding_cache_misses_total", "counter", "Query embedding cache misses", stats["misses"]
+    yield "embedding_cache_evictions_total", "counter", "Query embedding cache LRU evictions", stats["evictions"]
+    yield "embedding_cache_size", "gauge", "Query embeddings held in memory", stats["size"]
+    yield "embedding_cache_hit_ratio", "gauge", "Query embedding cache hit ratio", stats["hit_ratio"]
 
 
-def get_embedding(text: str) -> List[float]:
-    if configuration.use_hf_embedder:
-        return hf_model.encode(text).tolist()
-    else:
-        embeddings = giga.embeddings(texts=[text])
-        return embeddings.data[0].embedding
\ No newline at end of file
+registry.add_collector(embedding_cache_metrics)
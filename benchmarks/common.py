@@ -0,0 +1,125 @@
+import hashlib
+import json
+import re
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from config.config import configuration
+
+# Общие утилиты бенчмарков: детерминированный эмбеддер без модели и сети,
+# загрузка датасета с синтетическим увеличением, точный поиск и статистика задержек.
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class FakeEmbedder:
+    """Детерминированный эмбеддер: сумма псевдослучайных векторов слов (с сидом от хэша слова).
+
+    Тексты с общими словами получают близкие векторы, поэтому соседи осмысленны,
+    а результат воспроизводим между запусками и не требует загрузки модели.
+    """
+
+    def __init__(self, dims: int = 256):
+        self.dims = dims
+        self._cache: Dict[str, np.ndarray] = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._cache.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.sha1(token.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dims).astype(np.float32)
+            self._cache[token] = vector
+        return vector
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        result = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in TOKEN_RE.findall(text.lower()):
+                result[i] += self._token_vector(token)
+        return normalize(result)
+
+    def __call__(self, texts: Sequence[str]) -> List[List[float]]:
+        return self.embed(texts).tolist()
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return (vectors / norms).astype(np.float32)
+
+
+def default_dataset_path() -> Path:
+    return configuration.project_root / "data" / configuration.data_csv_filename
+
+
+def load_articles(csv_path: Optional[Path] = None) -> pd.DataFrame:
+    """Статьи датасета, подготовленные так же, как для fill_vdb.py (backend.dataset.prepare_articles):
+    id, title, url, abstract, full_text, author, authors, published_date (ISO), tags, text_to_embed"""
+    from backend.dataset import prepare_articles, read_csv_chunks
+    seen_ids = set()
+    df = pd.concat([prepare_articles(chunk, seen_ids)[0]
+                    for chunk in read_csv_chunks(csv_path or default_dataset_path())], ignore_index=True)
+    df["published_date"] = pd.to_datetime(df["published_date"]).dt.strftime("%Y-%m-%d")
+    return df
+
+
+def scale_up(vectors: np.ndarray, target_size: int, noise: float = 0.05, seed: int = 0) -> np.ndarray:
+    """Синтетическое увеличение корпуса: копии векторов с гауссовым шумом"""
+    if target_size <= len(vectors):
+        return vectors[:target_size]
+    rng = np.random.default_rng(seed)
+    source = rng.integers(0, len(vectors), size=target_size - len(vectors))
+    extra = vectors[source] + noise * rng.standard_normal((len(source), vectors.shape[1])).astype(np.float32)
+    return normalize(np.vstack([vectors, extra]))
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int,
+                mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """Точные k ближайших соседей по косинусу (векторы нормированы) - ground truth"""
+    scores = queries @ corpus.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    k = min(k, corpus.shape[0] if mask is None else int(mask.sum()))
+    if k == 0:
+        return np.empty((len(queries), 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: Sequence[Sequence[str]], truth: Sequence[Sequence[str]]) -> float:
+    recalls = [len(set(f) & set(t)) / len(t) for f, t in zip(found, truth) if len(t)]
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def latency_summary(latencies: Sequence[float], wall_time: Optional[float] = None) -> dict:
+    """p50/p95/p99 в миллисекундах и QPS"""
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    wall_time = wall_time if wall_time is not None else float(np.sum(latencies))
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "qps": round(len(values) / wall_time, 2) if wall_time > 0 else None,
+    }
+
+
+class Timer:
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def write_report(report: dict, output: Optional[str]):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        Path(output).write_text(text, encoding="utf-8")
+    else:
+        print(text)
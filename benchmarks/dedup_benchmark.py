@@ -0,0 +1,160 @@
+"""Точность, полнота и время поиска почти-дубликатов статей при заполнении базы (DEDUP_MODE).
+
+Корпус размера --sizes строится из заголовков и аннотаций датасета: статьи сверх датасета -
+сильно переписанные (--rewrite-rate слов заменено) варианты статей, а доля --duplicate-rate
+статей - копии с небольшими правками (до --max-edit слов заменено, удалено или повторено),
+как повторные публикации и версии статьи. Статьи проверяются backend.dedup.Deduplicator
+в случайном порядке; измеряются время на статью, статей в секунду, кандидатов LSH на статью,
+точность и полнота по известным копиям. Для размеров до --brute-force-max для сравнения
+считается попарное сравнение векторов: его время растёт квадратично, а время LSH - линейно.
+
+Векторы строит детерминированный FakeEmbedder (сумма векторов слов), поэтому копии с
+правками получают близкие векторы, как у модели.
+
+Пример:
+    python -m benchmarks.dedup_benchmark --sizes 10000,40000,160000 --duplicate-rate 0.1 --output dedup.json
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import FakeEmbedder, Timer, latency_summary, load_articles, write_report
+from backend.dedup import Deduplicator
+from config.config import configuration
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def edit_words(words, rate: float, vocabulary, rng: random.Random):
+    """Копия слов, в которой доля rate слов заменена, удалена или повторена"""
+    result = []
+    for word in words:
+        if rng.random() >= rate:
+            result.append(word)
+            continue
+        operation = rng.randrange(3)
+        if operation == 0:
+            result.append(rng.choice(vocabulary))
+        elif operation == 2:
+            result += [word, word]
+    return result
+
+
+def make_corpus(texts, size: int, args):
+    """(id, текст, группа) - статьи одной группы являются копиями друг друга"""
+    rng = random.Random(args.seed)
+    words = [text.split() for text in texts]
+    vocabulary = sorted({word for item in words for word in item})
+    originals = int(size * (1 - args.duplicate_rate))
+    corpus = []
+    for i in range(originals):
+        base = words[i % len(words)]
+        if i >= len(words):
+            base = edit_words(base, args.rewrite_rate, vocabulary, rng)
+        corpus.append((f"a{i}", base, i))
+    for i in range(size - originals):
+        _, base, group = corpus[rng.randrange(originals)]
+        corpus.append((f"d{i}", edit_words(base, rng.uniform(0, args.max_edit), vocabulary, rng), group))
+    rng.shuffle(corpus)
+    return [(doc_id, " ".join(item), group) for doc_id, item, group in corpus]
+
+
+def run_dedup(corpus, vectors, args):
+    dedup = Deduplicator("skip", args.num_perm, args.bands, args.shingle_size, args.cosine_threshold)
+    latencies = []
+    with Timer() as timer:
+        for (doc_id, text, _), vector in zip(corpus, vectors):
+            start = time.perf_counter()
+            dedup.check(doc_id, text, doc_id, [], vector)
+            latencies.append(time.perf_counter() - start)
+    return dedup, latencies, timer.elapsed
+
+
+def quality(corpus, dedup):
+    groups = {doc_id: group for doc_id, _, group in corpus}
+    expected = len(corpus) - len(set(groups.values()))
+    correct = sum(groups[doc_id] == groups[canonical] for doc_id, canonical, _ in dedup.duplicates)
+    found = len(dedup.duplicates)
+    return {
+        "expected": expected,
+        "found": found,
+        "precision": round(correct / found, 4) if found else None,
+        "recall": round(correct / expected, 4) if expected else None,
+    }
+
+
+def brute_force(vectors, threshold: float, chunk: int = 2048):
+    """Попарное сравнение: статья - дубликат, если близка к какой-либо предыдущей"""
+    duplicates = 0
+    with Timer() as timer:
+        for start in range(0, len(vectors), chunk):
+            scores = vectors[start:start + chunk] @ vectors[:start + chunk].T
+            rows = start + np.arange(scores.shape[0])
+            # Сравнение только с предыдущими статьями
+            scores[rows[:, None] <= np.arange(scores.shape[1])[None, :]] = -1
+            duplicates += int((scores.max(axis=1) >= threshold).sum())
+    return duplicates, timer.elapsed
+
+
+def main(args):
+    df = load_articles(args.csv)
+    texts = df["text_to_embed"].tolist()
+    embedder = FakeEmbedder(args.dims)
+    results = []
+    for size in args.sizes:
+        corpus = make_corpus(texts, size, args)
+        vectors = embedder.embed([text for _, text, _ in corpus])
+        dedup, latencies, seconds = run_dedup(corpus, vectors, args)
+        report = dedup.report()
+        result = {
+            "size": size,
+            "seconds": round(seconds, 3),
+            "articles_per_second": round(size / seconds, 1),
+            "latency": latency_summary(latencies),
+            "dedup_rate": report["dedup_rate"],
+            "candidates_per_article": report["candidates_per_article"],
+            **quality(corpus, dedup),
+        }
+        if size <= args.brute_force_max:
+            duplicates, brute_seconds = brute_force(vectors, args.cosine_threshold)
+            result["brute_force"] = {"seconds": round(brute_seconds, 3), "duplicates": duplicates,
+                                     "lsh_recall": round(report["duplicates"] / duplicates, 4) if duplicates else None}
+        results.append(result)
+        print(result, file=sys.stderr)
+
+    write_report({
+        "params": {"articles": len(texts), "duplicate_rate": args.duplicate_rate, "max_edit": args.max_edit,
+                   "rewrite_rate": args.rewrite_rate, "num_perm": args.num_perm, "bands": args.bands,
+                   "shingle_size": args.shingle_size, "cosine_threshold": args.cosine_threshold, "dims": args.dims},
+        "results": results,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Точность и время поиска почти-дубликатов статей")
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--sizes", type=int_list, default=[10000, 40000, 160000], help="Размеры корпуса")
+    parser.add_argument("--duplicate-rate", type=float, default=0.1, help="Доля копий с правками")
+    parser.add_argument("--max-edit", type=float, default=0.1, help="Наибольшая доля изменённых слов копии")
+    parser.add_argument("--rewrite-rate", type=float, default=0.6,
+                        help="Доля заменённых слов в статьях сверх датасета")
+    parser.add_argument("--num-perm", type=int, default=configuration.dedup_num_perm)
+    parser.add_argument("--bands", type=int, default=configuration.dedup_bands)
+    parser.add_argument("--shingle-size", type=int, default=configuration.dedup_shingle_size)
+    parser.add_argument("--cosine-threshold", type=float, default=configuration.dedup_cosine_threshold)
+    parser.add_argument("--dims", type=int, default=256, help="Размерность FakeEmbedder")
+    parser.add_argument("--brute-force-max", type=int, default=40000,
+                        help="Наибольший размер корпуса для попарного сравнения векторов")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
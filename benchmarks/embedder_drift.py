@@ -0,0 +1,95 @@
+"""Проверка согласованности вариантов эмбеддера с эталонной моделью.
+
+Векторизует выборку статей датасета эталоном (по умолчанию hf - SentenceTransformer в полной точности)
+и каждым вариантом (hf_int8, hf_onnx), затем сообщает косинусный дрейф (среднее, минимум, 1-й и 5-й
+перцентили косинуса между векторами одного текста), совпадение k ближайших соседей внутри выборки
+и скорость векторизации. Результат помогает выбрать EMBEDDER по соотношению скорости и качества.
+
+Пример:
+    python -m benchmarks.embedder_drift --variants hf_int8,hf_onnx --samples 1000 --threads 4 --output drift.json
+"""
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import Timer, exact_top_k, load_articles, normalize, recall_at_k, write_report
+from backend.embedders import EMBEDDER_VARIANTS
+from config.config import configuration
+
+
+def encode(variant: str, texts, threads):
+    embedder = EMBEDDER_VARIANTS[variant](configuration.hf_model_name, configuration.hf_cache_dir,
+                                          batch_size=configuration.embedding_batch_size, threads=threads)
+    embedder.encode(texts[:8])  # прогрев
+    with Timer() as timer:
+        vectors = embedder.encode(texts)
+    return normalize(vectors), len(texts) / timer.elapsed
+
+
+def drift_report(reference: np.ndarray, candidate: np.ndarray, k: int) -> dict:
+    cosines = np.sum(reference * candidate, axis=1)
+    k = min(k, len(reference) - 1)
+    # Соседи внутри выборки: первый результат - сам текст, его пропускаем
+    reference_neighbors = exact_top_k(reference, reference, k + 1)[:, 1:]
+    candidate_neighbors = exact_top_k(candidate, candidate, k + 1)[:, 1:]
+    return {
+        "cosine_mean": round(float(cosines.mean()), 5),
+        "cosine_min": round(float(cosines.min()), 5),
+        "cosine_p1": round(float(np.percentile(cosines, 1)), 5),
+        "cosine_p5": round(float(np.percentile(cosines, 5)), 5),
+        f"neighbor_recall_at_{k}": round(recall_at_k(candidate_neighbors.tolist(), reference_neighbors.tolist()), 4),
+    }
+
+
+def main(args):
+    df = load_articles(args.csv)
+    texts = df["text_to_embed"].sample(n=min(args.samples, len(df)), random_state=args.seed).tolist()
+
+    print(f"Encoding {len(texts)} texts with reference {args.reference}", file=sys.stderr)
+    reference, reference_speed = encode(args.reference, texts, args.threads)
+    results = [{"variant": args.reference, "texts_per_second": round(reference_speed, 1)}]
+
+    for variant in args.variants:
+        print(f"Encoding {len(texts)} texts with {variant}", file=sys.stderr)
+        vectors, speed = encode(variant, texts, args.threads)
+        if vectors.shape != reference.shape:
+            raise ValueError(f"{variant} returned vectors of shape {vectors.shape}, expected {reference.shape}")
+        results.append({
+            "variant": variant,
+            "texts_per_second": round(speed, 1),
+            "speedup": round(speed / reference_speed, 2),
+            **drift_report(reference, vectors, args.k),
+        })
+        print(results[-1], file=sys.stderr)
+
+    write_report({
+        "params": {"model": configuration.hf_model_name, "samples": len(texts), "threads": args.threads,
+                   "reference": args.reference, "k": args.k},
+        "results": results,
+    }, args.output)
+
+
+def parse_args():
+    local_variants = [variant for variant in EMBEDDER_VARIANTS if variant != "gigachat"]
+    parser = argparse.ArgumentParser(description="Косинусный дрейф вариантов эмбеддера относительно эталона")
+    parser.add_argument("--reference", choices=local_variants, default="hf")
+    parser.add_argument("--variants", type=lambda value: [v for v in value.split(",") if v],
+                        default=["hf_int8", "hf_onnx"])
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--threads", type=int, default=configuration.embedder_threads,
+                        help="Потоков CPU для всех вариантов (EMBEDDER_THREADS)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+    unknown = set(args.variants) - set(local_variants)
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    main(parse_args())
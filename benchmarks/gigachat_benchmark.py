@@ -0,0 +1,187 @@
+"""Устойчивая скорость векторизации через GigaChat API при задержке сети и лимите частоты запросов.
+
+Поднимает локальную заглушку API (aiohttp): выдачу токена и /embeddings с задержкой
+--latency-ms + --per-text-ms на текст, лимитом --server-rps запросов в секунду (сверх лимита - 429
+с Retry-After) и долей --error-rate ответов 503. Против неё прогоняются конфигурации клиента
+backend.gigachat_client: по одному тексту в запросе последовательно (как прежний синхронный клиент),
+пакетами последовательно, пакетами параллельно без ограничения частоты и с token bucket на лимит
+заглушки. Для каждой - эмбеддингов в секунду, число запросов по статусам и полученных токенов.
+
+Пример:
+    python -m benchmarks.gigachat_benchmark --texts 2000 --latency-ms 150 --server-rps 10 --output gigachat.json
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from aiohttp import web
+
+from benchmarks.common import FakeEmbedder, Timer, load_articles, write_report
+from backend.gigachat_client import AsyncGigaChatClient
+
+TOKEN_TTL_SECONDS = 1800
+
+
+class StubGigaChat:
+    """Заглушка GigaChat API с задержкой, лимитом частоты и случайными ошибками"""
+
+    def __init__(self, args):
+        self.args = args
+        self.embedder = FakeEmbedder(args.dims)
+        self.tokens = set()
+        self.statuses = Counter()
+        self.token_issued = 0
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+        self.rng = random.Random(args.seed)
+
+    def reset(self):
+        self.tokens.clear()
+        self.statuses.clear()
+        self.token_issued = 0
+
+    async def oauth(self, request):
+        token = str(uuid.uuid4())
+        self.tokens.add(token)
+        self.token_issued += 1
+        return web.json_response({"access_token": token,
+                                  "expires_at": int((time.time() + TOKEN_TTL_SECONDS) * 1000)})
+
+    def _over_limit(self) -> bool:
+        # Лимит в окнах по одной секунде, как у счётчиков запросов API
+        now = time.monotonic()
+        if now - self.window_start >= 1:
+            self.window_start, self.window_requests = now, 0
+        self.window_requests += 1
+        return self.args.server_rps > 0 and self.window_requests > self.args.server_rps
+
+    def _reply(self, status: int, response):
+        self.statuses[status] += 1
+        return response
+
+    async def embeddings(self, request):
+        token = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        if token not in self.tokens:
+            return self._reply(401, web.json_response({"message": "Unauthorized"}, status=401))
+        if self._over_limit():
+            retry_after = max(0.0, 1 - (time.monotonic() - self.window_start))
+            return self._reply(429, web.json_response({"message": "Too Many Requests"}, status=429,
+                                                      headers={"Retry-After": f"{retry_after:.3f}"}))
+        texts = (await request.json())["input"]
+        await asyncio.sleep((self.args.latency_ms + self.args.per_text_ms * len(texts)) / 1000)
+        if self.rng.random() < self.args.error_rate:
+            return self._reply(503, web.json_response({"message": "Service Unavailable"}, status=503))
+        vectors = self.embedder.embed(texts)
+        data = [{"object": "embedding", "embedding": vector.tolist(), "index": i} for i, vector in enumerate(vectors)]
+        # Порядок в ответе API не гарантирован
+        self.rng.shuffle(data)
+        return self._reply(200, web.json_response({"object": "list", "data": data, "model": "Embeddings"}))
+
+
+async def start_stub(stub: StubGigaChat, port: int):
+    app = web.Application(client_max_size=64 * 2 ** 20)
+    app.router.add_post("/api/v2/oauth", stub.oauth)
+    app.router.add_post("/api/v1/embeddings", stub.embeddings)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    return runner, runner.addresses[0][1]
+
+
+def configurations(args):
+    return [
+        ("sequential_single", {"max_batch_size": 1, "max_concurrency": 1, "requests_per_second": 0}),
+        ("sequential_batched", {"max_batch_size": args.batch_size, "max_concurrency": 1, "requests_per_second": 0}),
+        ("concurrent_unpaced", {"max_batch_size": args.batch_size, "max_concurrency": args.concurrency,
+                                "requests_per_second": 0}),
+        ("concurrent_paced", {"max_batch_size": args.batch_size, "max_concurrency": args.concurrency,
+                              "requests_per_second": args.server_rps}),
+    ]
+
+
+async def run(args, texts):
+    stub = StubGigaChat(args)
+    runner, port = await start_stub(stub, args.port)
+    base = f"http://127.0.0.1:{port}"
+    results = []
+    try:
+        for name, options in configurations(args):
+            if name in args.skip:
+                continue
+            stub.reset()
+            client = AsyncGigaChatClient("c3R1YjpzdHVi", auth_url=f"{base}/api/v2/oauth", api_url=f"{base}/api/v1",
+                                         max_retries=args.max_retries, initial_backoff=args.initial_backoff,
+                                         **options)
+            sample = texts[:args.single_texts] if options["max_batch_size"] == 1 else texts
+            try:
+                with Timer() as timer:
+                    # Вызовы по --call-size текстов, как пакеты fill_vdb.py
+                    for start in range(0, len(sample), args.call_size):
+                        await client.embed(sample[start:start + args.call_size])
+                error = None
+            except Exception as e:
+                error = str(e)
+            finally:
+                await client.aclose()
+            result = {
+                "config": name,
+                **options,
+                "texts": len(sample),
+                "seconds": round(timer.elapsed, 3),
+                "embeddings_per_second": round(len(sample) / timer.elapsed, 1) if error is None else None,
+                "responses": {str(status): count for status, count in sorted(stub.statuses.items())},
+                "tokens_issued": stub.token_issued,
+                "error": error,
+            }
+            results.append(result)
+            print(result, file=sys.stderr)
+    finally:
+        await runner.cleanup()
+    return results
+
+
+def main(args):
+    df = load_articles(args.csv)
+    texts = df["text_to_embed"].tolist()
+    texts = [texts[i % len(texts)] for i in range(args.texts)]
+    results = asyncio.run(run(args, texts))
+    write_report({
+        "params": {"texts": len(texts), "latency_ms": args.latency_ms, "per_text_ms": args.per_text_ms,
+                   "server_rps": args.server_rps, "error_rate": args.error_rate, "batch_size": args.batch_size,
+                   "concurrency": args.concurrency, "call_size": args.call_size},
+        "results": results,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Скорость векторизации через GigaChat API на локальной заглушке")
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--single-texts", type=int, default=200,
+                        help="Текстов для конфигурации по одному тексту в запросе (она самая медленная)")
+    parser.add_argument("--call-size", type=int, default=256, help="Текстов в одном вызове embed")
+    parser.add_argument("--batch-size", type=int, default=32, help="Текстов в одном запросе к API")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=8)
+    parser.add_argument("--initial-backoff", type=float, default=0.2)
+    parser.add_argument("--latency-ms", type=float, default=150, help="Задержка ответа заглушки")
+    parser.add_argument("--per-text-ms", type=float, default=2, help="Дополнительная задержка на текст")
+    parser.add_argument("--server-rps", type=float, default=10, help="Лимит запросов в секунду заглушки (0 - нет)")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Доля ответов 503")
+    parser.add_argument("--dims", type=int, default=64)
+    parser.add_argument("--port", type=int, default=0, help="Порт заглушки (0 - свободный)")
+    parser.add_argument("--skip", type=lambda value: [v for v in value.split(",") if v], default=[],
+                        help="Пропустить конфигурации (через запятую)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
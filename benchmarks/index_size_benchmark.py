@@ -0,0 +1,183 @@
+"""Размер поискового индекса и задержка knn с полным текстом в документе и без него.
+
+Собирает один и тот же корпус дважды: в прежнем виде (full_text в документе индекса и в маппинге
+как анализируемый text) и в текущем (в индексе только заголовок, аннотация, метаданные и вектор,
+полные тексты - в backend.text_store). Для Elasticsearch после force merge до одного сегмента
+сообщает размер хранилища индекса, для локального бэкенда - размер папки индекса; для обоих -
+p50/p95/p99 задержки и QPS knn-поиска и размер хранилища полных текстов.
+Векторы строит детерминированный FakeEmbedder: модель и сеть не нужны.
+
+Пример:
+    python -m benchmarks.index_size_benchmark --backend elasticsearch --size 100000 --output index_size.json
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import FakeEmbedder, load_articles, scale_up, write_report
+from benchmarks.knn_benchmark import run_queries
+from backend.model import SearchRequest
+from backend.search_backends import ElasticsearchBackend, LocalBackend
+from backend.text_store import FullTextStore
+from config.config import configuration
+
+
+def build_corpus(args):
+    df = load_articles(args.csv)
+    embedder = FakeEmbedder(args.dims)
+    corpus = scale_up(embedder.embed(df["text_to_embed"].tolist()), args.size or len(df), seed=args.seed)
+    texts = df["full_text"].tolist()
+
+    actions, full_texts = [], []
+    for i, vector in enumerate(corpus):
+        row = df.iloc[i % len(df)]
+        actions.append({
+            "_id": str(i),
+            "_source": {
+                "title": row["title"],
+                "url": row["url"],
+                "abstract": row["abstract"],
+                "metadata": {
+                    "author": row["author"],
+                    "authors": list(row["authors"]),
+                    "published_date": row["published_date"] if isinstance(row["published_date"], str) else None,
+                    "tags": list(row["tags"]),
+                },
+                "vector": vector.tolist(),
+            },
+        })
+        full_texts.append((str(i), texts[i % len(df)]))
+
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(df), size=min(args.queries, len(df)), replace=False)
+    query_texts = df["title"].iloc[query_rows].tolist()
+    return actions, full_texts, query_texts, embedder.embed(query_texts)
+
+
+def with_full_text(actions, full_texts):
+    """Документы в прежнем виде: полный текст внутри документа индекса"""
+    return [{"_id": action["_id"], "_source": {**action["_source"], "full_text": text}}
+            for action, (_, text) in zip(actions, full_texts)]
+
+
+def full_text_store_stats(full_texts, tmp: Path) -> dict:
+    store = FullTextStore(tmp / "full_texts.sqlite", compression_level=configuration.full_text_compression_level)
+    store.put_many(full_texts)
+    stats = store.stats()
+    store.close()
+    return stats
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.rglob("*") if file.is_file())
+
+
+async def measure_search(backend, args, query_texts, queries):
+    requests = [SearchRequest(query=text, top_k=args.k) for text in query_texts]
+    _, summary = await run_queries(backend, requests, queries, args.k,
+                                   max(configuration.knn_num_candidates, args.k), args.concurrency)
+    return summary
+
+
+async def bench_local(args, variants, query_texts, queries):
+    from backend.local_store import LocalStoreWriter
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, actions in variants:
+            path = Path(tmp) / name
+            with LocalStoreWriter(path, dtype=args.local_dtype) as writer:
+                writer.submit(actions)
+            backend = LocalBackend(path)
+            try:
+                rows.append({"layout": name, "index_bytes": directory_size(path),
+                             **await measure_search(backend, args, query_texts, queries)})
+            finally:
+                await backend.close()
+            print(rows[-1], file=sys.stderr)
+    return rows
+
+
+def legacy_index_body(dims: int) -> dict:
+    from backend.indexing import load_index_body
+    body = load_index_body(dims)
+    body["mappings"]["properties"]["full_text"] = {"type": "text"}
+    return body
+
+
+async def bench_elasticsearch(args, variants, query_texts, queries):
+    from elasticsearch import AsyncElasticsearch, Elasticsearch, helpers
+    from backend.indexing import load_index_body
+
+    sync_client = Elasticsearch(hosts=args.es_host, request_timeout=600)
+    async_client = AsyncElasticsearch(hosts=args.es_host)
+    rows = []
+    try:
+        for name, actions in variants:
+            index = f"bench_index_size_{name}"
+            body = legacy_index_body(args.dims) if name == "with_full_text" else load_index_body(args.dims)
+            if sync_client.indices.exists(index=index):
+                sync_client.indices.delete(index=index)
+            sync_client.indices.create(index=index, body=body)
+            start = time.perf_counter()
+            helpers.bulk(sync_client, actions, index=index, chunk_size=500)
+            sync_client.indices.refresh(index=index)
+            sync_client.indices.forcemerge(index=index, max_num_segments=1)
+            build_seconds = time.perf_counter() - start
+            stats = sync_client.indices.stats(index=index, metric="store,docs")["indices"][index]["primaries"]
+
+            rows.append({"layout": name, "index_bytes": stats["store"]["size_in_bytes"],
+                         "docs": stats["docs"]["count"], "build_seconds": round(build_seconds, 2),
+                         **await measure_search(ElasticsearchBackend(async_client, index), args, query_texts,
+                                                queries)})
+            print(rows[-1], file=sys.stderr)
+            if not args.keep_indices:
+                sync_client.indices.delete(index=index)
+    finally:
+        await async_client.close()
+        sync_client.close()
+    return rows
+
+
+async def main(args):
+    actions, full_texts, query_texts, queries = build_corpus(args)
+    variants = [("with_full_text", with_full_text(actions, full_texts)), ("slim", actions)]
+
+    bench = bench_local if args.backend == "local" else bench_elasticsearch
+    rows = await bench(args, variants, query_texts, queries)
+    with tempfile.TemporaryDirectory() as tmp:
+        text_store = full_text_store_stats(full_texts, Path(tmp))
+
+    before, after = rows
+    write_report({
+        "params": {"backend": args.backend, "corpus_size": len(actions), "dims": args.dims,
+                   "queries": len(query_texts), "k": args.k},
+        "results": rows,
+        "full_text_store": text_store,
+        "index_size_ratio": round(after["index_bytes"] / before["index_bytes"], 4) if before["index_bytes"] else None,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Размер индекса и задержка knn с полным текстом в индексе и без")
+    parser.add_argument("--backend", choices=["local", "elasticsearch"], default=configuration.search_backend)
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--size", type=int, default=0, help="Размер корпуса после синтетического увеличения")
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных запросов при замере QPS")
+    parser.add_argument("--local-dtype", choices=["float32", "float16"], default=configuration.local_store_dtype)
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--keep-indices", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
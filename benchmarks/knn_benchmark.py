@@ -0,0 +1,291 @@
+"""Бенчмарк качества и скорости knn-поиска.
+
+Загружает датасет (при необходимости синтетически увеличивая его), считает точных соседей
+и перебирает num_candidates, k, параметры HNSW (m, ef_construction) и селективность фильтра.
+С --author-filter дополнительно замеряет фильтр по автору.
+Для каждой комбинации выводит recall@k, p50/p95/p99 задержки и QPS в JSON-отчёт.
+Векторы строит детерминированный FakeEmbedder: модель и сеть не нужны.
+
+Пример:
+    python -m benchmarks.knn_benchmark --backend elasticsearch --size 100000 \\
+        --num-candidates 50,100,200,500 --hnsw-m 16,32 --ef-construction 100,200 --output knn.json
+"""
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import (FakeEmbedder, exact_top_k, latency_summary, load_articles, recall_at_k,
+                               scale_up, write_report)
+from backend.model import SearchRequest
+from backend.search_backends import ElasticsearchBackend, LocalBackend
+from config.config import configuration
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def float_list(value):
+    return [float(v) for v in value.split(",") if v]
+
+
+def selectivity_tag(selectivity: float) -> str:
+    return f"bench_sel_{selectivity:g}"
+
+
+def build_corpus(args):
+    df = load_articles(args.csv)
+    embedder = FakeEmbedder(args.dims)
+    corpus = scale_up(embedder.embed(df["text_to_embed"].tolist()), args.size or len(df), seed=args.seed)
+
+    rng = np.random.default_rng(args.seed)
+    masks = {1.0: np.ones(len(corpus), dtype=bool)}
+    for selectivity in args.selectivity:
+        if selectivity < 1:
+            masks[selectivity] = rng.random(len(corpus)) < selectivity
+
+    actions = []
+    for i, vector in enumerate(corpus):
+        row = df.iloc[i % len(df)]
+        tags = list(row["tags"]) + [selectivity_tag(s) for s, mask in masks.items() if s < 1 and mask[i]]
+        actions.append({
+            "_id": str(i),
+            "_source": {
+                "title": row["title"],
+                "url": row["url"],
+                "abstract": row["abstract"],
+                "metadata": {
+                    "author": row["author"],
+                    "authors": list(row["authors"]),
+                    "published_date": row["published_date"] if isinstance(row["published_date"], str) else None,
+                    "tags": tags,
+                },
+                "vector": vector.tolist(),
+            },
+        })
+
+    query_rows = rng.choice(len(df), size=min(args.queries, len(df)), replace=args.queries > len(df))
+    query_texts = df["title"].iloc[query_rows].tolist()
+    queries = embedder.embed(query_texts)
+    return corpus, actions, masks, query_texts, queries, query_rows
+
+
+def author_filter_cases(actions, query_rows, prefix_length):
+    """Фильтр по автору для каждого запроса: префикс фамилии автора статьи-источника запроса.
+
+    Возвращает строки фильтра и маски подходящих документов (по нормализованным словам имён).
+    """
+    tokens_by_row = [{token for author in action["_source"]["metadata"]["authors"] for token in author.split()}
+                     for action in actions]
+    filters, masks, cache = [], [], {}
+    for row in query_rows:
+        authors = actions[row]["_source"]["metadata"]["authors"]
+        prefix = authors[0].split()[0][:prefix_length] if authors else ""
+        if prefix not in cache:
+            cache[prefix] = np.array([any(token.startswith(prefix) for token in tokens) for tokens in tokens_by_row])
+        filters.append(prefix or None)
+        masks.append(cache[prefix])
+    return filters, masks
+
+
+class LegacyWildcardBackend(ElasticsearchBackend):
+    """Фильтр по автору до появления metadata.authors: leading wildcard по keyword-полю metadata.author.
+
+    case_insensitive добавлен, чтобы старый вариант находил те же документы и сравнение задержек было честным.
+    """
+
+    @staticmethod
+    def build_filters(request):
+        return [{"wildcard": {"metadata.author": {"value": f"*{request.author_filter}*", "case_insensitive": True}}}]
+
+
+async def author_sweep(backend, label, args, corpus, queries, query_texts, author_filters, author_masks):
+    rows = []
+    for k in args.k:
+        expected = [[str(i) for i in exact_top_k(corpus, query[None, :], k, mask)[0]]
+                    for query, mask in zip(queries, author_masks)]
+        requests = [SearchRequest(query=text, top_k=k, author_filter=author)
+                    for text, author in zip(query_texts, author_filters)]
+        num_candidates = max(args.num_candidates[0], k)
+        found, summary = await run_queries(backend, requests, queries, k, num_candidates, args.concurrency)
+        rows.append({
+            **label,
+            "filter": "author",
+            "selectivity": round(float(np.mean([mask.mean() for mask in author_masks])), 5),
+            "k": k,
+            "num_candidates": num_candidates if label["backend"] == "elasticsearch" else None,
+            "recall_at_k": round(recall_at_k(found, expected), 4),
+            **summary,
+        })
+        print(f"{label} author filter k={k}: recall={rows[-1]['recall_at_k']} p99={summary['p99_ms']}ms "
+              f"qps={summary['qps']}", file=sys.stderr)
+    return rows
+
+
+async def run_queries(backend, requests, queries, k, num_candidates, concurrency):
+    """Последовательный прогон для задержек и параллельный для QPS"""
+    latencies, found = [], []
+    for request, vector in zip(requests, queries):
+        start = time.perf_counter()
+        results = await backend.search(vector.tolist(), request, k=k, num_candidates=num_candidates)
+        latencies.append(time.perf_counter() - start)
+        found.append([r.id for r in results])
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(request, vector):
+        async with semaphore:
+            await backend.search(vector.tolist(), request, k=k, num_candidates=num_candidates)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(r, v) for r, v in zip(requests, queries)))
+    wall_time = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary["qps"] = round(len(requests) / wall_time, 2)
+    summary["concurrency"] = concurrency
+    return found, summary
+
+
+async def sweep(backend, label, args, corpus, masks, query_texts, queries, truth):
+    rows = []
+    candidates = args.num_candidates if label["backend"] == "elasticsearch" else [None]
+    for selectivity, mask in masks.items():
+        tag = selectivity_tag(selectivity) if selectivity < 1 else None
+        for k in args.k:
+            expected = [[str(i) for i in row[:k]] for row in truth[selectivity]]
+            for num_candidates in candidates:
+                if num_candidates is not None and num_candidates < k:
+                    continue
+                requests = [SearchRequest(query=text, top_k=k, tags_filter=tag) for text in query_texts]
+                found, summary = await run_queries(backend, requests, queries, k, num_candidates or k,
+                                                   args.concurrency)
+                rows.append({
+                    **label,
+                    "filter": "tag",
+                    "selectivity": selectivity,
+                    "matching_docs": int(mask.sum()),
+                    "k": k,
+                    "num_candidates": num_candidates,
+                    "recall_at_k": round(recall_at_k(found, expected), 4),
+                    **summary,
+                })
+                print(f"{label} sel={selectivity} k={k} nc={num_candidates}: "
+                      f"recall={rows[-1]['recall_at_k']} p99={summary['p99_ms']}ms qps={summary['qps']}",
+                      file=sys.stderr)
+    return rows
+
+
+async def bench_local(args, corpus, actions, masks, query_texts, queries, truth, author_cases):
+    from backend.local_store import LocalStoreWriter
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench"
+        with LocalStoreWriter(path, dtype=args.local_dtype) as writer:
+            writer.submit(actions)
+        backend = LocalBackend(path)
+        try:
+            label = {"backend": "local", "dtype": args.local_dtype}
+            rows = await sweep(backend, label, args, corpus, masks, query_texts, queries, truth)
+            if author_cases:
+                rows += await author_sweep(backend, {**label, "author_query": "prefix"}, args, corpus, queries,
+                                           query_texts, *author_cases)
+            return rows
+        finally:
+            await backend.close()
+
+
+async def bench_elasticsearch(args, corpus, actions, masks, query_texts, queries, truth, author_cases):
+    from elasticsearch import AsyncElasticsearch, Elasticsearch, helpers
+    from backend.indexing import load_index_body
+
+    sync_client = Elasticsearch(hosts=args.es_host, request_timeout=600)
+    async_client = AsyncElasticsearch(hosts=args.es_host)
+    rows = []
+    try:
+        for m in args.hnsw_m:
+            for ef_construction in args.ef_construction:
+                index = f"bench_knn_m{m}_ef{ef_construction}"
+                body = load_index_body(corpus.shape[1])
+                body["mappings"]["properties"]["vector"]["index_options"].update(m=m, ef_construction=ef_construction)
+                if sync_client.indices.exists(index=index):
+                    sync_client.indices.delete(index=index)
+                sync_client.indices.create(index=index, body=body)
+                start = time.perf_counter()
+                helpers.bulk(sync_client, actions, index=index, chunk_size=500)
+                sync_client.indices.refresh(index=index)
+                sync_client.indices.forcemerge(index=index, max_num_segments=1)
+                build_seconds = time.perf_counter() - start
+
+                backend = ElasticsearchBackend(async_client, index)
+                label = {"backend": "elasticsearch", "m": m, "ef_construction": ef_construction,
+                         "build_seconds": round(build_seconds, 2)}
+                rows += await sweep(backend, label, args, corpus, masks, query_texts, queries, truth)
+                if author_cases:
+                    # До/после: leading wildcard по metadata.author против edge n-gram по metadata.authors
+                    for author_query, author_backend in (("wildcard", LegacyWildcardBackend(async_client, index)),
+                                                         ("prefix", backend)):
+                        rows += await author_sweep(author_backend, {**label, "author_query": author_query}, args,
+                                                   corpus, queries, query_texts, *author_cases)
+                if not args.keep_indices:
+                    sync_client.indices.delete(index=index)
+    finally:
+        await async_client.close()
+        sync_client.close()
+    return rows
+
+
+async def main(args):
+    corpus, actions, masks, query_texts, queries, query_rows = build_corpus(args)
+    k_max = max(args.k)
+    truth = {selectivity: exact_top_k(corpus, queries, k_max, mask if selectivity < 1 else None)
+             for selectivity, mask in masks.items()}
+    author_cases = None
+    if args.author_filter:
+        author_cases = author_filter_cases(actions, query_rows, args.author_prefix_length)
+
+    bench = bench_local if args.backend == "local" else bench_elasticsearch
+    rows = await bench(args, corpus, actions, masks, query_texts, queries, truth, author_cases)
+
+    write_report({
+        "params": {
+            "backend": args.backend,
+            "corpus_size": int(corpus.shape[0]),
+            "dims": int(corpus.shape[1]),
+            "queries": len(query_texts),
+            "seed": args.seed,
+        },
+        "results": rows,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall/latency бенчмарк knn-поиска")
+    parser.add_argument("--backend", choices=["local", "elasticsearch"], default=configuration.search_backend)
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--size", type=int, default=0, help="Размер корпуса после синтетического увеличения")
+    parser.add_argument("--dims", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int_list, default=[5, 10, 50])
+    parser.add_argument("--num-candidates", type=int_list, default=[configuration.knn_num_candidates])
+    parser.add_argument("--hnsw-m", type=int_list, default=[configuration.knn_hnsw_m])
+    parser.add_argument("--ef-construction", type=int_list, default=[configuration.knn_hnsw_ef_construction])
+    parser.add_argument("--selectivity", type=float_list, default=[1.0, 0.1, 0.01],
+                        help="Доли корпуса, проходящие фильтр по тегу")
+    parser.add_argument("--author-filter", action="store_true",
+                        help="Добавить прогон с фильтром по префиксу фамилии автора (для ES - до/после: wildcard и prefix)")
+    parser.add_argument("--author-prefix-length", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=8, help="Параллельных запросов при замере QPS")
+    parser.add_argument("--local-dtype", choices=["float32", "float16"], default=configuration.local_store_dtype)
+    parser.add_argument("--es-host", default="http://localhost:9200")
+    parser.add_argument("--keep-indices", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
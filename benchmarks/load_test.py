@@ -0,0 +1,141 @@
+"""Нагрузочный сценарий насыщения бэкенда.
+
+На запущенный бэкенд подаётся поток поисковых запросов с заданным числом одновременных клиентов
+(каждый уровень - отдельный прогон длительностью --duration), при желании одновременно с всплеском
+загрузки статей через /ingest. Для каждого уровня сообщает число ответов по кодам (200, 503 - отказ
+контроля допуска, 504 - истёк дедлайн), долю отказов и p50/p95/p99 задержек принятых запросов.
+При исправной работе с ростом нагрузки растёт доля быстрых 503, а задержки принятых запросов остаются
+ограниченными SEARCH_TIMEOUT_SECONDS.
+
+Пример:
+    python -m benchmarks.load_test --url http://localhost:8000 --concurrency 8,32,128 --duration 30 --ingest-concurrency 16 --output load.json
+"""
+import argparse
+import asyncio
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import aiohttp
+
+from benchmarks.common import latency_summary, load_articles, write_report
+
+
+class Stats:
+    def __init__(self):
+        self.statuses = Counter()
+        self.latencies = []
+        self.rejected_latencies = []
+
+    def add(self, status, elapsed: float):
+        self.statuses[status] += 1
+        if status == 200:
+            self.latencies.append(elapsed)
+        elif status == 503:
+            self.rejected_latencies.append(elapsed)
+
+    def report(self, wall_time: float) -> dict:
+        total = sum(self.statuses.values())
+        report = {
+            "requests": total,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "rejection_rate": round(self.statuses[503] / total, 4) if total else None,
+        }
+        if self.latencies:
+            report["accepted"] = latency_summary(self.latencies, wall_time)
+        if self.rejected_latencies:
+            # Отказ должен приходить быстро, а не после ожидания в очереди до таймаута
+            report["rejected_p95_ms"] = latency_summary(self.rejected_latencies)["p95_ms"]
+        return report
+
+
+async def client_loop(session, url: str, payloads, stop_at: float, stats: Stats, offset: int):
+    i = offset
+    while time.perf_counter() < stop_at:
+        payload = payloads[i % len(payloads)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            async with session.post(url, json=payload) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        stats.add(status, time.perf_counter() - start)
+        if status == 503:
+            # Клиент, соблюдающий Retry-After, не повторяет запрос сразу
+            await asyncio.sleep(0.1)
+
+
+async def run_level(args, concurrency: int, queries, articles) -> dict:
+    timeout = aiohttp.ClientTimeout(total=args.client_timeout)
+    connector = aiohttp.TCPConnector(limit=concurrency + args.ingest_concurrency)
+    search_stats, ingest_stats = Stats(), Stats()
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+        start = time.perf_counter()
+        stop_at = start + args.duration
+        search_payloads = [{"query": query, "top_k": args.top_k} for query in queries]
+        tasks = [client_loop(session, f"{args.url}/search", search_payloads, stop_at, search_stats, i)
+                 for i in range(concurrency)]
+        tasks += [client_loop(session, f"{args.url}/ingest", articles, stop_at, ingest_stats, i)
+                  for i in range(args.ingest_concurrency)]
+        await asyncio.gather(*tasks)
+        wall_time = time.perf_counter() - start
+
+    result = {"concurrency": concurrency, "search": search_stats.report(wall_time)}
+    if args.ingest_concurrency:
+        result["ingest"] = ingest_stats.report(wall_time)
+    return result
+
+
+def ingest_payloads(df, limit: int):
+    # Отдельный префикс id, чтобы нагрузочные статьи не перезаписывали статьи датасета
+    return [{
+        "id": f"loadtest-{row.id}",
+        "title": row.title,
+        "abstract": row.abstract,
+        "url": row.url,
+        "metadata": {"author": row.author,
+                     "published_date": row.published_date if isinstance(row.published_date, str) else "",
+                     "tags": row.tags},
+    } for row in df.head(limit).itertuples()]
+
+
+async def main(args):
+    df = load_articles(args.csv)
+    queries = df["title"].sample(n=min(args.queries, len(df)), random_state=args.seed).tolist()
+    articles = ingest_payloads(df, args.queries) if args.ingest_concurrency else []
+
+    levels = []
+    for concurrency in args.concurrency:
+        print(f"Running {concurrency} search clients for {args.duration}s", file=sys.stderr)
+        levels.append(await run_level(args, concurrency, queries, articles))
+        print(levels[-1], file=sys.stderr)
+
+    write_report({
+        "params": {"url": args.url, "duration_s": args.duration, "top_k": args.top_k,
+                   "ingest_concurrency": args.ingest_concurrency},
+        "levels": levels,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Нагрузочный сценарий: отказы и задержки поиска под насыщением")
+    parser.add_argument("--url", default="http://localhost:8000", help="Адрес запущенного бэкенда")
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",")], default=[8, 32, 128],
+                        help="Уровни числа одновременных поисковых клиентов")
+    parser.add_argument("--duration", type=float, default=20, help="Длительность прогона одного уровня, с")
+    parser.add_argument("--ingest-concurrency", type=int, default=0,
+                        help="Одновременных клиентов /ingest (всплеск загрузки во время поиска)")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--queries", type=int, default=200, help="Число разных запросов (и статей для /ingest)")
+    parser.add_argument("--client-timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,114 @@
+"""Пропускная способность разбиения полных текстов на пассажи и их векторизации (PASSAGE_MODE).
+
+Полные тексты удлиняются склейкой текстов соседних статей (--scales), и для каждого бюджета
+PASSAGE_MAX_PER_ARTICLE (--budgets, 0 - без ограничения) измеряются: время разбиения статьи
+(p50/p95/p99), статей и мегабайт текста в секунду, пассажей на статью, пропуски повторов и
+коротких окон, а затем скорость векторизации пассажей пакетами --batch-size и оценка времени
+векторизации на статью. С бюджетом стоимость статьи не должна расти с длиной текста.
+
+Векторы по умолчанию строит детерминированный FakeEmbedder; с --embedder model - эмбеддер из настроек.
+
+Пример:
+    python -m benchmarks.passage_benchmark --embedder model --scales 1,4,16 --budgets 8,16,0 --output passages.json
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import FakeEmbedder, Timer, latency_summary, load_articles, write_report
+from backend.passages import PassageChunker
+from config.config import configuration
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def long_texts(texts, scale: int):
+    """Тексты длиннее исходных в scale раз: к тексту статьи дописываются тексты следующих"""
+    return ["\n".join(texts[(i + j) % len(texts)] for j in range(scale)) for i in range(len(texts))]
+
+
+def make_embedder(args):
+    if args.embedder == "fake":
+        return FakeEmbedder(args.dims).embed
+    from backend.utils import get_embeddings_array
+    return get_embeddings_array
+
+
+def chunk_all(texts, args, budget: int):
+    chunker = PassageChunker(args.max_tokens, args.overlap_tokens, args.min_tokens, budget or sys.maxsize)
+    passages, latencies = [], []
+    for text in texts:
+        start = time.perf_counter()
+        passages.extend(chunker.split(text))
+        latencies.append(time.perf_counter() - start)
+    return passages, latencies, chunker.stats
+
+
+def embed_all(passages, embed, batch_size: int) -> float:
+    with Timer() as timer:
+        for start in range(0, len(passages), batch_size):
+            embed(passages[start:start + batch_size])
+    return timer.elapsed
+
+
+def main(args):
+    df = load_articles(args.csv)
+    texts = df["full_text"].tolist()[:args.articles or None]
+    embed = make_embedder(args)
+    results = []
+    for scale in args.scales:
+        scaled = long_texts(texts, scale)
+        text_mb = sum(len(text.encode("utf-8")) for text in scaled) / 2 ** 20
+        for budget in args.budgets:
+            passages, latencies, stats = chunk_all(scaled, args, budget)
+            chunk_seconds = float(np.sum(latencies))
+            embed_seconds = embed_all(passages, embed, args.batch_size) if passages else 0.0
+            result = {
+                "scale": scale,
+                "budget": budget or None,
+                "avg_text_kb": round(text_mb * 1024 / len(scaled), 1),
+                "passages_per_article": round(stats["passages"] / len(scaled), 2),
+                "skipped": {key: stats[key] for key in ("duplicate", "short", "over_budget")},
+                "chunk": {**latency_summary(latencies), "mb_per_second": round(text_mb / chunk_seconds, 2)},
+                "embed": {
+                    "passages_per_second": round(len(passages) / embed_seconds, 1) if embed_seconds else None,
+                    "ms_per_article": round(embed_seconds * 1000 / len(scaled), 3),
+                },
+            }
+            results.append(result)
+            print(result, file=sys.stderr)
+
+    write_report({
+        "params": {"embedder": args.embedder, "articles": len(texts), "max_tokens": args.max_tokens,
+                   "overlap_tokens": args.overlap_tokens, "min_tokens": args.min_tokens,
+                   "batch_size": args.batch_size},
+        "results": results,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Скорость разбиения полных текстов на пассажи и их векторизации")
+    parser.add_argument("--embedder", choices=["fake", "model"], default="fake",
+                        help="fake - детерминированный FakeEmbedder, model - эмбеддер из настроек")
+    parser.add_argument("--dims", type=int, default=256, help="Размерность FakeEmbedder")
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--articles", type=int, default=0, help="Сколько статей датасета взять (0 - все)")
+    parser.add_argument("--scales", type=int_list, default=[1, 4, 16], help="Во сколько раз удлинить тексты")
+    parser.add_argument("--budgets", type=int_list, default=[configuration.passage_max_per_article, 0],
+                        help="Пассажей на статью (0 - без ограничения)")
+    parser.add_argument("--max-tokens", type=int, default=configuration.passage_max_tokens)
+    parser.add_argument("--overlap-tokens", type=int, default=configuration.passage_overlap_tokens)
+    parser.add_argument("--min-tokens", type=int, default=configuration.passage_min_tokens)
+    parser.add_argument("--batch-size", type=int, default=configuration.ingest_batch_size,
+                        help="Пассажей в одном вызове эмбеддера")
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,115 @@
+"""Бенчмарк понижения размерности векторов (VECTOR_REDUCTION).
+
+Для каждого метода (pca, truncate) и целевой размерности обучает проекцию на векторах корпуса,
+как это делает fill_vdb.py, и сравнивает точный поиск по спроецированным векторам с точным поиском
+по полным: recall@k относительно полноразмерного индекса, задержку поиска, размер вектора в байтах
+и (для pca) долю объяснённой дисперсии. Точный поиск отделяет потери от проекции от погрешности HNSW;
+влияние num_candidates на уменьшенный индекс можно затем проверить benchmarks.knn_benchmark с --dims.
+
+Векторы по умолчанию строит детерминированный FakeEmbedder; с --embedder model - эмбеддер из настроек
+(нужна загруженная модель или доступ к GigaChat), что и нужно для выбора VECTOR_DIMS.
+
+Пример:
+    python -m benchmarks.reduction_benchmark --embedder model --targets 128,256,512 --k 10 --output reduction.json
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.common import (FakeEmbedder, Timer, exact_top_k, latency_summary, load_articles, normalize,
+                               recall_at_k, scale_up, write_report)
+from backend.projection import Projection
+
+
+def int_list(value):
+    return [int(v) for v in value.split(",") if v]
+
+
+def embed(texts, args) -> np.ndarray:
+    if args.embedder == "fake":
+        return FakeEmbedder(args.dims).embed(texts)
+    from backend.utils import get_embeddings_array
+    vectors = [get_embeddings_array(texts[i:i + args.batch_size]) for i in range(0, len(texts), args.batch_size)]
+    return normalize(np.vstack(vectors))
+
+
+def search_latencies(corpus: np.ndarray, queries: np.ndarray, k: int) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        exact_top_k(corpus, query[None, :], k)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(args):
+    df = load_articles(args.csv)
+    print(f"Embedding {len(df)} articles with {args.embedder} embedder", file=sys.stderr)
+    corpus = scale_up(embed(df["text_to_embed"].tolist(), args), args.size or len(df), seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    query_rows = rng.choice(len(df), size=min(args.queries, len(df)), replace=False)
+    queries = embed(df["title"].iloc[query_rows].tolist(), args)
+
+    truth = exact_top_k(corpus, queries, args.k).tolist()
+    full = {"method": "none", "dims": corpus.shape[1], "vector_bytes": corpus.shape[1] * 4,
+            "recall_at_k": 1.0, "search": latency_summary(search_latencies(corpus, queries, args.k))}
+    results = [full]
+    print(full, file=sys.stderr)
+
+    fit_sample = corpus[:args.fit_samples]
+    for method in args.methods:
+        for dims in args.targets:
+            if dims >= corpus.shape[1]:
+                continue
+            with Timer() as timer:
+                projection = Projection.fit(method, fit_sample, dims)
+            reduced_corpus = projection.apply(corpus)
+            reduced_queries = projection.apply(queries)
+            found = exact_top_k(reduced_corpus, reduced_queries, args.k).tolist()
+            result = {
+                "method": method,
+                "dims": dims,
+                "vector_bytes": dims * 4,
+                "recall_at_k": round(recall_at_k(found, truth), 4),
+                "fit_seconds": round(timer.elapsed, 3),
+                "search": latency_summary(search_latencies(reduced_corpus, reduced_queries, args.k)),
+            }
+            if projection.explained_variance is not None:
+                result["explained_variance"] = round(projection.explained_variance, 4)
+            results.append(result)
+            print(result, file=sys.stderr)
+
+    write_report({
+        "params": {"embedder": args.embedder, "size": len(corpus), "source_dims": corpus.shape[1],
+                   "queries": len(queries), "k": args.k, "fit_samples": len(fit_sample)},
+        "results": results,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Recall@k спроецированных векторов относительно полноразмерного индекса")
+    parser.add_argument("--embedder", choices=["fake", "model"], default="fake",
+                        help="fake - детерминированный FakeEmbedder, model - эмбеддер из настроек")
+    parser.add_argument("--dims", type=int, default=1024, help="Размерность FakeEmbedder")
+    parser.add_argument("--methods", type=lambda value: [v for v in value.split(",") if v], default=["pca", "truncate"])
+    parser.add_argument("--targets", type=int_list, default=[64, 128, 256, 512])
+    parser.add_argument("--csv", type=Path, default=None, help="CSV датасета (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--size", type=int, default=None, help="Размер корпуса (синтетическое увеличение)")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--fit-samples", type=int, default=20000, help="Векторов для обучения проекции")
+    parser.add_argument("--batch-size", type=int, default=64, help="Размер пакета для --embedder model")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+    unknown = set(args.methods) - {"pca", "truncate"}
+    if unknown:
+        parser.error(f"unknown methods: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,111 @@
+"""Бенчмарк запуска бэкенда.
+
+Замеряет время импорта модулей (в отдельных процессах, чтобы не мешал кэш импортов)
+и время от запуска uvicorn до ответа /healthz, до готовности /readyz (эмбеддер загружен и прогрет)
+и задержку первого поискового запроса после готовности.
+Использует настройки из .env: для замера загрузки модели нужен локальный эмбеддер (EMBEDDER=hf, hf_int8 или hf_onnx).
+
+Пример:
+    python -m benchmarks.startup_benchmark --runs 3 --output startup.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.common import write_report
+from backend.external import get_embedder_model_name, get_embedder_type
+from config.config import configuration
+
+IMPORT_SNIPPET = "import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+
+
+def measure_import(module: str) -> float:
+    result = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+                            cwd=configuration.project_root, capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def wait_for(url: str, deadline: float, expected_status: int = 200) -> float:
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == expected_status:
+                return time.perf_counter()
+        except requests.RequestException:
+            pass
+        time.sleep(0.05)
+    raise TimeoutError(f"{url} did not return {expected_status} in time")
+
+
+def measure_startup(args) -> dict:
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, EMBEDDER_BACKGROUND_LOAD="true")
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port)],
+                               cwd=configuration.project_root, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + args.timeout
+        healthy = wait_for(f"{base_url}/healthz", deadline)
+        ready = wait_for(f"{base_url}/readyz", deadline)
+        result = {
+            "time_to_healthy_s": round(healthy - start, 3),
+            "time_to_ready_s": round(ready - start, 3),
+            "readyz": requests.get(f"{base_url}/readyz", timeout=1).json(),
+        }
+        if args.query:
+            query_start = time.perf_counter()
+            response = requests.post(f"{base_url}/search", json={"query": args.query, "top_k": 5}, timeout=60)
+            result["first_search_ms"] = round((time.perf_counter() - query_start) * 1000, 1)
+            result["first_search_status"] = response.status_code
+        return result
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def summarize(values):
+    return {"min": round(float(np.min(values)), 3), "median": round(float(np.median(values)), 3),
+            "max": round(float(np.max(values)), 3)}
+
+
+def main(args):
+    imports = {}
+    for module in args.modules:
+        times = [measure_import(module) for _ in range(args.runs)]
+        imports[module] = summarize(times)
+        print(f"import {module}: {imports[module]}", file=sys.stderr)
+
+    startups = []
+    for i in range(args.runs):
+        startups.append(measure_startup(args))
+        print(f"startup run {i + 1}: {startups[-1]}", file=sys.stderr)
+
+    write_report({
+        "params": {"runs": args.runs, "embedder": get_embedder_type(), "model": get_embedder_model_name(),
+                   "warmup_batch_sizes": configuration.embedder_warmup_batch_sizes if configuration.embedder_warmup else []},
+        "import_seconds": imports,
+        "time_to_healthy_s": summarize([run["time_to_healthy_s"] for run in startups]),
+        "time_to_ready_s": summarize([run["time_to_ready_s"] for run in startups]),
+        "runs": startups,
+    }, args.output)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк времени импорта и запуска бэкенда")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--modules", nargs="+", default=["backend.utils", "main"],
+                        help="Модули, время импорта которых замеряется")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=600, help="Предельное время ожидания готовности, с")
+    parser.add_argument("--query", default=None, help="Поисковый запрос для замера первой задержки после готовности")
+    parser.add_argument("--output", default=None, help="Файл отчёта (по умолчанию stdout)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
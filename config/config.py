@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import SettingsConfigDict, BaseSettings
@@ -9,13 +10,121 @@ class Config(BaseSettings):
     gigachat_credentials: str | None = Field(validation_alias="GIGACHAT_CREDENTIALS", default=None)
     gigachat_scope: str | None = Field(validation_alias="GIGACHAT_SCOPE", default=None)
     gigachat_verify_ssl: bool = Field(validation_alias="GIGACHAT_VERIFY_SSL", default=False)
+    gigachat_embeddings_model: str = Field(validation_alias="GIGACHAT_EMBEDDINGS_MODEL", default="Embeddings")
+    gigachat_auth_url: str = Field(validation_alias="GIGACHAT_AUTH_URL",
+                                   default="https://ngw.devices.sberbank.ru:9443/api/v2/oauth")
+    gigachat_api_url: str = Field(validation_alias="GIGACHAT_API_URL",
+                                  default="https://gigachat.devices.sberbank.ru/api/v1")
+    gigachat_max_batch_size: int = Field(validation_alias="GIGACHAT_MAX_BATCH_SIZE", default=32)
+    gigachat_max_concurrency: int = Field(validation_alias="GIGACHAT_MAX_CONCURRENCY", default=4)
+    gigachat_requests_per_second: float = Field(validation_alias="GIGACHAT_REQUESTS_PER_SECOND", default=5.0)
+    gigachat_max_retries: int = Field(validation_alias="GIGACHAT_MAX_RETRIES", default=5)
+    gigachat_initial_backoff: float = Field(validation_alias="GIGACHAT_INITIAL_BACKOFF", default=0.5)
+    gigachat_max_backoff: float = Field(validation_alias="GIGACHAT_MAX_BACKOFF", default=30.0)
+    gigachat_timeout: float = Field(validation_alias="GIGACHAT_TIMEOUT", default=60.0)
 
     use_hf_embedder: bool = Field(validation_alias="USE_HF_EMBEDDER", default=False)
+    embedder: Literal["gigachat", "hf", "hf_int8", "hf_onnx"] | None = Field(validation_alias="EMBEDDER", default=None)
+    embedder_threads: int | None = Field(validation_alias="EMBEDDER_THREADS", default=None)
     hf_model_name: str = Field(validation_alias="HF_MODEL_NAME", default="ai-forever/FRIDA")
     hf_cache_dir: str = Field(validation_alias="HF_CACHE_DIR", default="./hf_cache")
 
+    embedder_background_load: bool = Field(validation_alias="EMBEDDER_BACKGROUND_LOAD", default=True)
+    embedder_warmup: bool = Field(validation_alias="EMBEDDER_WARMUP", default=True)
+    embedder_warmup_batch_sizes: list[int] = Field(validation_alias="EMBEDDER_WARMUP_BATCH_SIZES", default=[1, 16])
+
+    embedding_batch_size: int = Field(validation_alias="EMBEDDING_BATCH_SIZE", default=32)
+    ingest_batch_size: int = Field(validation_alias="INGEST_BATCH_SIZE", default=256)
+    embedding_store_dir: str | None = Field(validation_alias="EMBEDDING_STORE_DIR", default="embedding_store")
+    embedding_store_shard_size: int = Field(validation_alias="EMBEDDING_STORE_SHARD_SIZE", default=4096)
+    query_batch_max_size: int = Field(validation_alias="QUERY_BATCH_MAX_SIZE", default=16)
+    query_batch_max_wait_ms: float = Field(validation_alias="QUERY_BATCH_MAX_WAIT_MS", default=5.0)
+
+    embedding_server_socket: str | None = Field(validation_alias="EMBEDDING_SERVER_SOCKET", default=None)
+    embedding_server_max_batch_size: int = Field(validation_alias="EMBEDDING_SERVER_MAX_BATCH_SIZE", default=64)
+    embedding_server_max_wait_ms: float = Field(validation_alias="EMBEDDING_SERVER_MAX_WAIT_MS", default=5.0)
+    embedding_client_pool_size: int = Field(validation_alias="EMBEDDING_CLIENT_POOL_SIZE", default=4)
+    embedding_client_timeout: float = Field(validation_alias="EMBEDDING_CLIENT_TIMEOUT", default=30.0)
+
+    query_cache_size: int = Field(validation_alias="QUERY_CACHE_SIZE", default=10000)
+    query_cache_ttl_seconds: float = Field(validation_alias="QUERY_CACHE_TTL_SECONDS", default=86400)
+    query_cache_path: str | None = Field(validation_alias="QUERY_CACHE_PATH", default=None)
+
     data_csv_filename: str = Field(validation_alias="DATA_CSV_FILENAME", default="data_sample_with_summaries.csv")
     data_mapping_filename: str = Field(validation_alias="DATA_MAPPING_FILENAME", default="mapping.json")
+    prepared_dataset_filename: str = Field(validation_alias="PREPARED_DATASET_FILENAME", default="articles.parquet")
+    missing_date_policy: Literal["today", "reject"] = Field(validation_alias="MISSING_DATE_POLICY", default="today")
+
+    knn_num_candidates: int = Field(validation_alias="KNN_NUM_CANDIDATES", default=100)
+    knn_hnsw_m: int = Field(validation_alias="KNN_HNSW_M", default=16)
+    knn_hnsw_ef_construction: int = Field(validation_alias="KNN_HNSW_EF_CONSTRUCTION", default=100)
+
+    search_page_window: int = Field(validation_alias="SEARCH_PAGE_WINDOW", default=50)
+    search_max_results: int = Field(validation_alias="SEARCH_MAX_RESULTS", default=200)
+    search_cursor_cache_size: int = Field(validation_alias="SEARCH_CURSOR_CACHE_SIZE", default=1000)
+    search_cursor_ttl_seconds: float = Field(validation_alias="SEARCH_CURSOR_TTL_SECONDS", default=600)
+
+    search_max_top_k: int = Field(validation_alias="SEARCH_MAX_TOP_K", default=100)
+    knn_max_num_candidates: int = Field(validation_alias="KNN_MAX_NUM_CANDIDATES", default=1000)
+    search_max_concurrency: int = Field(validation_alias="SEARCH_MAX_CONCURRENCY", default=32)
+    search_max_queue: int = Field(validation_alias="SEARCH_MAX_QUEUE", default=64)
+    search_timeout_seconds: float = Field(validation_alias="SEARCH_TIMEOUT_SECONDS", default=10.0)
+    ingest_max_concurrency: int = Field(validation_alias="INGEST_MAX_CONCURRENCY", default=4)
+    ingest_max_queue: int = Field(validation_alias="INGEST_MAX_QUEUE", default=16)
+    ingest_timeout_seconds: float = Field(validation_alias="INGEST_TIMEOUT_SECONDS", default=30.0)
+    admission_queue_timeout_seconds: float = Field(validation_alias="ADMISSION_QUEUE_TIMEOUT_SECONDS", default=2.0)
+    admission_retry_after_seconds: float = Field(validation_alias="ADMISSION_RETRY_AFTER_SECONDS", default=1.0)
+
+    search_coalescing: bool = Field(validation_alias="SEARCH_COALESCING", default=True)
+    search_response_cache_ttl_seconds: float = Field(validation_alias="SEARCH_RESPONSE_CACHE_TTL_SECONDS", default=0)
+    search_response_cache_size: int = Field(validation_alias="SEARCH_RESPONSE_CACHE_SIZE", default=1000)
+
+    search_backend: Literal["elasticsearch", "local"] = Field(validation_alias="SEARCH_BACKEND", default="elasticsearch")
+    local_store_dtype: Literal["float32", "float16"] = Field(validation_alias="LOCAL_STORE_DTYPE", default="float32")
+    local_store_dir: str = Field(validation_alias="LOCAL_STORE_DIR", default="local_store")
+
+    vector_reduction: Literal["none", "pca", "truncate"] = Field(validation_alias="VECTOR_REDUCTION", default="none")
+    vector_dims: int = Field(validation_alias="VECTOR_DIMS", default=256)
+    projection_fit_samples: int = Field(validation_alias="PROJECTION_FIT_SAMPLES", default=20000)
+    projection_dir: str = Field(validation_alias="PROJECTION_DIR", default="projections")
+
+    full_text_store_path: str = Field(validation_alias="FULL_TEXT_STORE_PATH", default="full_text/articles.sqlite")
+    full_text_compression_level: int = Field(validation_alias="FULL_TEXT_COMPRESSION_LEVEL", default=6)
+
+    facets_dir: str = Field(validation_alias="FACETS_DIR", default="facets")
+    facets_max_limit: int = Field(validation_alias="FACETS_MAX_LIMIT", default=100)
+
+    passage_mode: bool = Field(validation_alias="PASSAGE_MODE", default=False)
+    passage_max_tokens: int = Field(validation_alias="PASSAGE_MAX_TOKENS", default=128)
+    passage_overlap_tokens: int = Field(validation_alias="PASSAGE_OVERLAP_TOKENS", default=32)
+    passage_min_tokens: int = Field(validation_alias="PASSAGE_MIN_TOKENS", default=16)
+    passage_max_per_article: int = Field(validation_alias="PASSAGE_MAX_PER_ARTICLE", default=16)
+
+    dedup_mode: Literal["off", "skip", "merge"] = Field(validation_alias="DEDUP_MODE", default="off")
+    dedup_num_perm: int = Field(validation_alias="DEDUP_NUM_PERM", default=64)
+    dedup_bands: int = Field(validation_alias="DEDUP_BANDS", default=16)
+    dedup_shingle_size: int = Field(validation_alias="DEDUP_SHINGLE_SIZE", default=3)
+    dedup_cosine_threshold: float = Field(validation_alias="DEDUP_COSINE_THRESHOLD", default=0.97)
+
+    es_refresh_interval: str = Field(validation_alias="ES_REFRESH_INTERVAL", default="1s")
+    es_number_of_replicas: int = Field(validation_alias="ES_NUMBER_OF_REPLICAS", default=1)
+
+    csv_chunk_size: int = Field(validation_alias="CSV_CHUNK_SIZE", default=1000)
+    bulk_threads: int = Field(validation_alias="BULK_THREADS", default=4)
+    bulk_chunk_size: int = Field(validation_alias="BULK_CHUNK_SIZE", default=500)
+    bulk_max_chunk_bytes: int = Field(validation_alias="BULK_MAX_CHUNK_BYTES", default=10 * 1024 * 1024)
+    bulk_max_retries: int = Field(validation_alias="BULK_MAX_RETRIES", default=5)
+    bulk_initial_backoff: float = Field(validation_alias="BULK_INITIAL_BACKOFF", default=2.0)
+    bulk_max_backoff: float = Field(validation_alias="BULK_MAX_BACKOFF", default=60.0)
+
+    metrics_enabled: bool = Field(validation_alias="METRICS_ENABLED", default=True)
+    server_timing_enabled: bool = Field(validation_alias="SERVER_TIMING_ENABLED", default=True)
+
+    log_body_sample_rate: float = Field(validation_alias="LOG_BODY_SAMPLE_RATE", default=1.0)
+    log_body_max_bytes: int = Field(validation_alias="LOG_BODY_MAX_BYTES", default=4096)
+    log_body_max_chars: int = Field(validation_alias="LOG_BODY_MAX_CHARS", default=500)
+    log_results_sample_rate: float = Field(validation_alias="LOG_RESULTS_SAMPLE_RATE", default=0.1)
+    log_results_max_chars: int = Field(validation_alias="LOG_RESULTS_MAX_CHARS", default=2000)
 
     project_root: Path = Path(__file__).resolve().parents[1]
     env_file_path: Path = project_root / ".env"
@@ -1,12 +1,27 @@
 import os
-import uuid
+import csv
 import json
-from datetime import datetime
-import pandas as pd
+import pyarrow as pa
 from tqdm.asyncio import tqdm
 from elasticsearch import helpers, Elasticsearch
-from backend.external import get_embedding_dimension
-from backend.utils import get_embedding
+import hashlib
+import time
+from datetime import date
+from backend.external import get_embedder_type, get_index_dimension, get_index_name
+from backend.indexing import (BulkIndexer, load_index_body, current_index, create_build_index,
+                              finalize_build_index, swap_alias)
+from backend.utils import get_embeddings
+from backend.embedding_store import EmbeddingStore, content_key
+from backend.local_store import LocalStoreWriter, LocalVectorStore
+from backend.metrics import (backend_errors, ingest_duplicates, ingest_passages, registry, stage, stage_report,
+                             stage_seconds)
+from backend.dataset import default_prepared_path, iter_articles
+from backend.dedup import Deduplicator
+from backend.facets import FacetIndex, get_facets_path
+from backend.passages import PassageChunker, passage_settings
+from backend.projection import ProjectingIndexer, get_projection, get_projection_path
+from backend.search_backends import get_local_store_path
+from backend.text_store import get_full_text_store
 from config.config import configuration
 import logging
 from pathlib import Path
@@ -29,15 +44,20 @@ def prepare_logger(logger_name: str, log_path: Path):
     logger.addHandler(file_handler)
 
 LOG_PATH = configuration.project_root / "logs" / "fill_vdb.log"
+# Найденные почти-дубликаты (DEDUP_MODE): id, id оставленной статьи, косинусная близость
+DUPLICATES_REPORT_PATH = configuration.project_root / "logs" / "duplicates.csv"
 
 prepare_logger("fill_vdb", LOG_PATH)
 script_logger = logging.getLogger("fill_vdb")
 
-script_logger.info("Using HF embedder for embeddings" if configuration.use_hf_embedder else "Using GigaChat API for embeddings")
+script_logger.info(f"Using {get_embedder_type()} embedder for embeddings")
 
 # --- Настройки ---
 ES_HOST = "http://localhost:9200"
-INDEX_NAME = f"scientific_articles_{'hf' if configuration.use_hf_embedder else 'gigachat'}"
+INDEX_NAME = get_index_name()  # алиас, через который работает поиск
+# Поле origin документов, загруженных из датасета, и статей из /ingest и /ingest/batch
+DATASET_ORIGIN = "dataset"
+INGEST_ORIGIN = "ingest"
 
 # --- Инициализация ---
 if not configuration.gigachat_credentials:
@@ -45,121 +65,565 @@ if not configuration.gigachat_credentials:
 
 es_client = Elasticsearch(hosts=ES_HOST)
 
-try:
-    info = es_client.info()
-    script_logger.info(f"Elasticsearch info: {info}")
-except Exception as e:
-    script_logger.error(f"Error connecting to ES: {e}")
-    exit(1)
+# Для локального поискового бэкенда Elasticsearch не нужен
+if configuration.search_backend == "elasticsearch":
+    try:
+        info = es_client.info()
+        script_logger.info(f"Elasticsearch info: {info}")
+    except Exception as e:
+        script_logger.error(f"Error connecting to ES: {e}")
+        exit(1)
+
+# --- Основная логика ---
+
+def prepare_document(article):
+    """Документ (без вектора), текст для векторизации и полный текст из подготовленной статьи (backend.dataset).
+
+    Полный текст в документ индекса не входит: он хранится отдельно (backend.text_store).
+    """
+    source = {
+        "title": article["title"],
+        "url": article["url"],
+        "abstract": article["abstract"],
+        "metadata": {
+            "author": article["author"],
+            "authors": article["authors"],
+            "published_date": article["published_date"],
+            "tags": article["tags"]
+        }
+    }
+    source["content_hash"] = document_hash(source, article["text_to_embed"], article["full_text"])
+    if source["metadata"]["published_date"] is None and configuration.missing_date_policy == "today":
+        # Дата загрузки ставится после подсчёта хэша: иначе статья без даты менялась бы каждый день
+        source["metadata"]["published_date"] = date.today().isoformat()
+    source["origin"] = DATASET_ORIGIN
+    doc = {
+        "_id": article["id"],
+        "_source": source
+    }
+    return doc, article["text_to_embed"], article["full_text"]
+
+
+def prepare_documents(articles):
+    """Документы части датасета: даты в ISO-строки одной операцией над колонкой, затем построчно в dict"""
+    date_column = articles.schema.get_field_index("published_date")
+    articles = articles.set_column(date_column, "published_date", articles["published_date"].cast(pa.string()))
+    for article in articles.to_pylist():
+        yield prepare_document(article)
+
+
+def document_hash(source, text_to_embed, full_text):
+    """Хэш содержимого документа, полного текста и векторизуемого текста вместе с моделью эмбеддера
+    (в режиме пассажей - и параметров разбиения на пассажи)"""
+    parts = [source, full_text, content_key(text_to_embed)]
+    if configuration.passage_mode:
+        parts.append(passage_settings())
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
-# --- Утилиты ---
-def clean_date(date_str):
+def fetch_content_hashes(index_name):
+    """_id -> content_hash для статей датасета в индексе.
+
+    Статьи из /ingest и /ingest/batch (origin "ingest") не возвращаются: инкрементальное обновление
+    их не удаляет. Документы, записанные до появления origin, считаются статьями датасета,
+    если у них есть content_hash (его пишет только fill_vdb.py).
+    """
+    hashes = {}
+    for hit in helpers.scan(es_client, index=index_name, _source=["content_hash", "origin"]):
+        source = hit["_source"]
+        if source.get("origin", DATASET_ORIGIN if source.get("content_hash") else None) == DATASET_ORIGIN:
+            hashes[hit["_id"]] = source.get("content_hash")
+    return hashes
+
+
+def compute_embeddings(docs, texts):
+    """Векторизация пакета текстов одним вызовом эмбеддера (с поштучным fallback)"""
     try:
-        if pd.isna(date_str):
-            return datetime.now().strftime("%d.%m.%Y")
+        return get_embeddings(texts)
+    except Exception as e:
+        script_logger.error(f"Ошибка пакетной векторизации, переход на поштучную обработку: {e}")
+    vectors = []
+    for doc, text in zip(docs, texts):
+        try:
+            vectors.append(get_embeddings([text])[0])
+        except Exception as e:
+            script_logger.error(f"Ошибка при обработке ID {doc['_id']} {e}")
+            vectors.append(None)
+    return vectors
 
-        return str(pd.to_datetime(date_str).date())
-    except:
-        return datetime.now().strftime("%d.%m.%Y") # Fallback
 
-# --- Основная логика ---
+def embed_batch(batch, store: EmbeddingStore = None):
+    """Векторизация пакета документов (doc, текст статьи, пассажи полного текста).
+
+    Тексты статей и их пассажи векторизуются вместе одним вызовом эмбеддера; уже посчитанные
+    векторы берутся из хранилища. В режиме пассажей документ получает
+    nested-поле passages: вектор статьи и векторы пассажей, которые удалось посчитать.
+    """
+    docs = [doc for doc, _, _ in batch]
+    texts, owners = [], []
+    for position, (_, text, passages) in enumerate(batch):
+        for item in [text, *passages]:
+            texts.append(item)
+            owners.append(position)
+    vectors = [None] * len(texts)
+
+    keys = None
+    if store is not None:
+        keys = [content_key(text) for text in texts]
+        for i, vector in enumerate(store.get_many(keys)):
+            if vector is not None:
+                vectors[i] = vector.tolist()
+
+    missing = [i for i, vector in enumerate(vectors) if vector is None]
+    if missing:
+        computed = compute_embeddings([docs[owners[i]] for i in missing], [texts[i] for i in missing])
+        for i, vector in zip(missing, computed):
+            vectors[i] = vector
+            if store is not None and vector is not None:
+                store.add(keys[i], vector)
 
-def process_dataset(csv_file_path: str):
-    script_logger.info(f"Loading dataset from {csv_file_path}")
-    df = pd.read_csv(csv_file_path)
-    
+    vectors_by_doc = [[] for _ in batch]
+    for owner, vector in zip(owners, vectors):
+        vectors_by_doc[owner].append(vector)
     actions = []
-    
-    script_logger.info("Starting article processing...")
-    
-    # Проходимся по всем строкам датафрейма
-    count_processed = 0
-    for _, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
-        if pd.isna(row["summary"]):
+    for doc, (vector, *passage_vectors) in zip(docs, vectors_by_doc):
+        if vector is None:
             continue
-        
-        # Извлечение и очистка полей
-        original_id = str(row.get('id', uuid.uuid4()))
-        title = str(row.get('title', 'Без названия')).lower()
-        authors_raw = row.get('authors', 'Unknown')
-        
-        date_raw = row.get('date', None)
-        pub_date = clean_date(date_raw)
-        
-        topics_raw = row.get('topics', '')
-        if isinstance(topics_raw, str):
-            tags = [t.strip() for t in topics_raw.replace(';', ',').split(',') if t.strip()]
-        else:
-            tags = []
-            
-        url = str(row.get('link', ''))
-        full_text = str(row.get('text', ''))
-        summ_text = str(row.get('summary', ''))
-            
-        # Текст для векторизации: Заголовок + краткое содержание
-        text_to_embed = f"{title}. {summ_text}"
-            
-        try:
-            # Получение эмбеддинга
-            vector = get_embedding(text_to_embed)
-                
-            doc = {
-                "_index": INDEX_NAME,
-                "_id": original_id,
-                "_source": {
-                    "title": title,
-                    "url": url,
-                    "abstract": summ_text,
-                    "full_text": full_text,
-                    "metadata": {
-                        "author": str(authors_raw),
-                        "published_date": pub_date,
-                        "tags": tags
-                    },
-                    "vector": vector
-                }
-            }
-            actions.append(doc)
-            count_processed += 1
-                
-        except Exception as e:
-            script_logger.error(f"Ошибка при обработке ID {original_id} {e}")
+        doc["_source"]["vector"] = vector
+        if configuration.passage_mode:
+            doc["_source"]["passages"] = [{"vector": item} for item in [vector, *passage_vectors] if item is not None]
+        actions.append(doc)
+    return actions, len(texts) - len(missing)
+
+
+def check_unchanged(doc, text_to_embed, dedup: Deduplicator = None, facets: FacetIndex = None):
+    """Неизменённая статья проверяется по сохранённому вектору. Дубликат здесь только отмечается в dedup:
+    из индекса и хранилища полных текстов его удаляет process_dataset, так как его id нет в seen_ids"""
+    duplicate_of = None
+    if dedup is not None:
+        duplicate_of = dedup.check(doc["_id"], text_to_embed, content_key(text_to_embed),
+                                   doc["_source"]["metadata"]["tags"])
+    if facets is not None and duplicate_of is None:
+        facets.add(doc["_source"]["metadata"])
+
+
+def drop_duplicates(batch, dedup: Deduplicator, unchanged=(), facets: FacetIndex = None):
+    """Векторизованные статьи пакета, не являющиеся почти-дубликатами уже загруженных
+    (по заголовку и аннотации и вектору).
+
+    Неизменённые статьи инкрементального обновления (unchanged: число статей пакета перед статьёй,
+    документ, текст) проверяются между статьями пакета в порядке датасета, как при полной сборке.
+    """
+    entries = [(position, 1, doc, text) for position, (doc, text, _) in enumerate(batch)]
+    entries += [(position, 0, doc, text) for position, doc, text in unchanged]
+    kept = []
+    for _, changed, doc, text in sorted(entries, key=lambda entry: entry[:2]):
+        source = doc["_source"]
+        if not changed:
+            check_unchanged(doc, text, dedup, facets)
+        elif "vector" in source and dedup.check(doc["_id"], text, content_key(text), source["metadata"]["tags"],
+                                                source["vector"]) is None:
+            kept.append(doc)
+    return kept
+
+
+def embed_and_submit(batch, store, indexer, dedup: Deduplicator = None, facets: FacetIndex = None,
+                     unchanged=()) -> int:
+    """Векторизация пакета и передача в indexer; возвращает число векторов, взятых из хранилища"""
+    with stage("fill_vdb", "embed"):
+        actions, reused = embed_batch(batch, store)
+    if dedup is not None:
+        with stage("fill_vdb", "dedup"):
+            actions = drop_duplicates(batch, dedup, unchanged, facets)
+    if facets is not None:
+        for action in actions:
+            facets.add(action["_source"]["metadata"])
+    # submit блокируется, пока загрузка предыдущих пакетов не освободит место: это время ожидания индекса
+    with stage("fill_vdb", "submit"):
+        indexer.submit(actions)
+    return reused
+
+
+def carry_ingested(ingested, store, indexer, seen_ids, batch_size: int, facets: FacetIndex = None) -> int:
+    """Статьи из /ingest прежней версии индекса (ingested: _id и _source) в собираемой версии.
+
+    Их нет в датасете, поэтому без переноса полная сборка их теряет. Векторы заново считаются по
+    заголовку и аннотации, как в /ingest (через хранилище эмбеддингов): сохранённые векторы могут быть
+    спроецированы прежней проекцией или посчитаны прежней моделью. Статьи с id из датасета
+    (seen_ids) не переносятся - статья датасета новее. Возвращает число перенесённых статей.
+    """
+    count = 0
+    batch = []
+    if facets is not None:
+        # Статьи из /ingest, добавленные с этого момента, бэкенд добавит к снимку фасетов сам
+        facets.built_at = time.time()
+
+    def submit():
+        nonlocal count
+        with stage("fill_vdb", "embed"):
+            actions, _ = embed_batch(batch, store)
+        for action in actions:
+            seen_ids.add(action["_id"])
+            if facets is not None:
+                facets.add(action["_source"]["metadata"])
+        indexer.submit(actions)
+        count += len(actions)
+
+    for doc_id, source in ingested:
+        if doc_id in seen_ids:
             continue
-        
-        # Пакетная отправка в Elastic каждые 50 документов (чтобы не забить память)
-        if len(actions) >= 50:
-            helpers.bulk(es_client, actions)
-            actions = []
+        source = {key: value for key, value in source.items() if key not in ("vector", "passages")}
+        source["origin"] = INGEST_ORIGIN
+        # Полного текста у статьи из /ingest нет: в режиме пассажей её единственный пассаж - сама статья
+        batch.append(({"_id": doc_id, "_source": source}, f"{source['title']} {source['abstract']}", []))
+        if len(batch) >= batch_size:
+            submit()
+            batch = []
+    if batch:
+        submit()
+    return count
+
+
+def scan_ingested(index_name):
+    """_id и _source (без векторов) статей из /ingest в индексе; как и в fetch_content_hashes, документы
+    без origin считаются статьями из /ingest, если у них нет content_hash"""
+    if current_index(es_client, index_name) is None:
+        return
+    # Статьи, добавленные до начала чтения, должны быть видны поиску (см. FacetIndex.built_at)
+    es_client.indices.refresh(index=index_name)
+    query = {"bool": {"should": [
+        {"term": {"origin": INGEST_ORIGIN}},
+        {"bool": {"must_not": [{"exists": {"field": "origin"}}, {"exists": {"field": "content_hash"}}]}},
+    ]}}
+    for hit in helpers.scan(es_client, index=index_name, query={"query": query},
+                            _source_excludes=["vector", "passages"]):
+        yield hit["_id"], hit["_source"]
+
+
+def read_local_ingested(path: Path):
+    """_id и _source статей из /ingest текущей версии локального индекса; версия читается при переносе,
+    после датасета, чтобы захватить статьи, добавленные за время его обработки"""
+    try:
+        store = LocalVectorStore(path)
+    except RuntimeError as e:
+        script_logger.warning(f"Articles added via /ingest are not carried over: {e}")
+        return
+    try:
+        yield from store.iter_ingested()
+    finally:
+        store.close()
+
+
+def open_embedding_store():
+    if not configuration.embedding_store_dir:
+        return None
+    path = Path(configuration.embedding_store_dir)
+    if not path.is_absolute():
+        path = configuration.project_root / path
+    store = EmbeddingStore(path, shard_size=configuration.embedding_store_shard_size)
+    script_logger.info(f"Using embedding store {path} ({len(store)} vectors)")
+    return store
+
+
+def with_projection(indexer, index_name: str = None):
+    """Понижение размерности (VECTOR_REDUCTION): при полной сборке проекция обучается заново,
+    при инкрементальном обновлении индекса index_name используется его сохранённая проекция"""
+    if configuration.vector_reduction == "none":
+        return indexer
+    return ProjectingIndexer(indexer, configuration.vector_reduction, configuration.vector_dims,
+                             configuration.projection_fit_samples,
+                             projection=get_projection(index_name) if index_name else None, logger=script_logger)
+
+
+def save_projection(indexer, index_name: str):
+    """Проекция версионного индекса; сохраняется до переключения алиаса на него"""
+    if isinstance(indexer, ProjectingIndexer) and indexer.projection is not None:
+        path = get_projection_path(index_name)
+        indexer.projection.save(path)
+        script_logger.info(f"Saved {indexer.projection.method} projection to {path}")
+
+
+def remove_projections(index_names):
+    """Проекции удалённых индексов и файл проекции алиаса (от сборок до проекций по версиям)"""
+    for path in [get_projection_path(index) for index in index_names] + [get_projection_path()]:
+        if path.is_file():
+            path.unlink()
 
-    # Отправка оставшихся
-    if actions:
-        helpers.bulk(es_client, actions)
 
-    script_logger.info(f"Processed and loaded {count_processed} articles into Elasticsearch.")
+def process_dataset(dataset_path: Path, indexer, batch_size: int = None,
+                    use_store: bool = True, existing_hashes: dict = None, facets: FacetIndex = None,
+                    ingested=None):
+    """Векторизация и загрузка датасета через indexer.
+
+    Датасет (Parquet из preprocess.py или CSV) читается потоково частями подготовленных статей,
+    пакеты векторизуются и передаются в indexer: BulkIndexer загружает их в Elasticsearch
+    параллельно со следующими пакетами, LocalStoreWriter пишет локальный индекс.
+    Полные тексты записываются в хранилище полных текстов, а в режиме пассажей (PASSAGE_MODE)
+    ещё и разбиваются на пассажи, которые векторизуются вместе со статьёй. Если переданы
+    existing_hashes (инкрементальный режим), статьи с неизменившимся content_hash
+    пропускаются без векторизации, а статьи из existing_hashes, которых больше нет в датасете,
+    удаляются из индекса.
+    С DEDUP_MODE почти-дубликаты уже загруженных статей не индексируются (и удаляются из индекса,
+    если были в нём), а в режиме merge их id и теги добавляются к оставленной статье.
+    В facets считаются теги, авторы и даты статей, которые остаются в индексе.
+    ingested - статьи из /ingest прежней версии индекса, которые полная сборка переносит в новую
+    (см. carry_ingested).
+    Возвращает id статей датасета и перенесённых статей, оставшихся в индексе.
+    """
+    batch_size = batch_size or configuration.ingest_batch_size
+    store = open_embedding_store() if use_store else None
+    text_store = get_full_text_store()
+    chunker = PassageChunker.from_config() if configuration.passage_mode else None
+    # Векторы кандидатов в дубликаты берутся из хранилища эмбеддингов, без него - из памяти
+    dedup = Deduplicator.from_config(vectors=store.get_many if store is not None else None)
+    script_logger.info(f"Loading dataset from {dataset_path}")
+    script_logger.info(f"Starting article processing (batch size {batch_size})...")
+
+    count_reused = 0
+    count_unchanged = 0
+    count_deleted = 0
+    seen_ids = set()
+    with indexer:
+        batch = []
+        # Неизменённые статьи, ожидающие проверки на дубликаты вместе с пакетом (см. drop_duplicates)
+        unchanged = []
+        # Размер пакета - в текстах для векторизации: в режиме пассажей статья даёт несколько текстов
+        batch_texts = 0
+        progress = tqdm(desc="Processing rows")
+        for articles in iter_articles(dataset_path):
+            with stage("fill_vdb", "prepare"):
+                documents = list(prepare_documents(articles))
+            progress.update(len(documents))
+            full_texts = []
+            for doc, text_to_embed, full_text in documents:
+                seen_ids.add(doc["_id"])
+                if existing_hashes is not None and existing_hashes.get(doc["_id"]) == doc["_source"]["content_hash"]:
+                    count_unchanged += 1
+                    if dedup is None:
+                        check_unchanged(doc, text_to_embed, facets=facets)
+                    elif batch:
+                        # Проверка на дубликаты в порядке датасета: после статей пакета, ожидающих векторизации
+                        unchanged.append((len(batch), doc, text_to_embed))
+                    else:
+                        with stage("fill_vdb", "dedup"):
+                            check_unchanged(doc, text_to_embed, dedup, facets)
+                else:
+                    full_texts.append((doc["_id"], full_text))
+                    passages = []
+                    if chunker is not None:
+                        with stage("fill_vdb", "chunk"):
+                            passages = chunker.split(full_text)
+                    batch.append((doc, text_to_embed, passages))
+                    batch_texts += 1 + len(passages)
+                if batch_texts >= batch_size or len(unchanged) >= batch_size:
+                    count_reused += embed_and_submit(batch, store, indexer, dedup, facets, unchanged)
+                    batch, unchanged = [], []
+                    batch_texts = 0
+            with stage("fill_vdb", "full_text"):
+                text_store.put_many(full_texts)
+        progress.close()
+
+        # Отправка оставшихся
+        if batch:
+            count_reused += embed_and_submit(batch, store, indexer, dedup, facets, unchanged)
+
+        count_carried = 0
+        if ingested is not None:
+            count_carried = carry_ingested(ingested, store, indexer, seen_ids, batch_size, facets)
+
+        count_merged = 0
+        if dedup is not None:
+            duplicate_ids = set(dedup.duplicate_ids)
+            seen_ids -= duplicate_ids
+            text_store.delete_many(list(duplicate_ids))
+            merge_actions = dedup.merge_actions()
+            # Обновления оставленных статей отправляются после загрузки самих статей: иначе пакет
+            # с update может опередить пакет с их index в параллельной загрузке
+            indexer.flush()
+            indexer.submit(merge_actions)
+            count_merged = len(merge_actions)
+            if facets is not None:
+                for merge in dedup.merges.values():
+                    facets.add({"tags": merge["added_tags"]}, document=False)
+
+        if existing_hashes is not None:
+            removed_ids = [doc_id for doc_id in existing_hashes if doc_id not in seen_ids]
+            indexer.submit([{"_op_type": "delete", "_id": doc_id} for doc_id in removed_ids])
+            text_store.delete_many(removed_ids)
+            count_deleted = len(removed_ids)
+        # Выход из блока дожидается загрузки всех отправленных пакетов
+        drain_start = time.perf_counter()
+    stage_seconds.observe(time.perf_counter() - drain_start, operation="fill_vdb", stage="drain")
+
+    if store is not None:
+        store.close()
+
+    count_processed = indexer.succeeded - count_deleted - count_merged - count_carried
+    script_logger.info(f"Processed and loaded {count_processed} articles.")
+    script_logger.info(f"Reused {count_reused} stored embeddings.")
+    if chunker is not None:
+        log_passage_stats(chunker.stats)
+    if dedup is not None:
+        log_dedup_stats(dedup)
+    if indexer.failed:
+        backend_errors.inc(indexer.failed, backend=configuration.search_backend, operation="bulk")
+        script_logger.error(f"{indexer.failed} bulk operations failed, see errors above.")
+    if ingested is not None:
+        script_logger.info(f"Carried over {count_carried} articles added via /ingest.")
+    if existing_hashes is not None:
+        script_logger.info(f"Skipped {count_unchanged} unchanged articles, deleted {count_deleted} removed articles.")
 
     # es_client.close()
+    script_logger.info(f"Stage timings: {stage_report('fill_vdb')}")
     script_logger.info("Loading completed!")
+    return seen_ids
+
+
+def log_passage_stats(stats):
+    for result in ("duplicate", "short", "over_budget"):
+        ingest_passages.inc(stats[result], result=result)
+    ingest_passages.inc(stats["passages"], result="embedded")
+    per_article = stats["passages"] / stats["articles"] if stats["articles"] else 0
+    script_logger.info(f"Passages: {stats['passages']} from {stats['articles']} articles ({per_article:.1f} per article), "
+                       f"skipped {stats['duplicate']} duplicate and {stats['short']} short, "
+                       f"{stats['over_budget']} articles truncated by PASSAGE_MAX_PER_ARTICLE.")
+
+
+def log_dedup_stats(dedup: Deduplicator):
+    report = dedup.report()
+    ingest_duplicates.inc(report["duplicates"], action=dedup.mode)
+    script_logger.info(f"Dedup ({dedup.mode}): {report['duplicates']} near-duplicates of {report['checked']} checked "
+                       f"articles (dedup rate {report['dedup_rate']:.2%}), "
+                       f"{report['candidates_per_article']} LSH candidates per article.")
+    if dedup.duplicates:
+        DUPLICATES_REPORT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DUPLICATES_REPORT_PATH, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "duplicate_of", "similarity"])
+            writer.writerows(dedup.duplicates)
+        script_logger.info(f"Near-duplicates are listed in {DUPLICATES_REPORT_PATH}")
+
+
+def save_facets(facets: FacetIndex):
+    """Снимок фасетов индекса для /facets: бэкенд подхватывает его без агрегации в индексе"""
+    facets.save(get_facets_path())
+    script_logger.info(f"Saved facets of {facets.documents} articles to {get_facets_path()}")
+
+
+def rebuild_index(dataset_path: Path, batch_size: int = None, use_store: bool = True, keep_old: bool = False):
+    """Полная переиндексация в новый версионный индекс с атомарным переключением алиаса"""
+    dims = get_index_dimension()
+    script_logger.info(f"Using embedding dimension: {dims} (reduction: {configuration.vector_reduction})")
+    build_index = create_build_index(es_client, INDEX_NAME, load_index_body(dims))
+    script_logger.info(f"Building index {build_index}, search keeps using {current_index(es_client, INDEX_NAME)}")
+    try:
+        indexer = with_projection(BulkIndexer(es_client, build_index, logger=script_logger))
+        facets = FacetIndex()
+        # Статьи из /ingest, добавленные после их чтения из прежнего индекса и до переключения алиаса,
+        # в новый индекс не попадут
+        seen_ids = process_dataset(dataset_path, indexer, batch_size=batch_size, use_store=use_store, facets=facets,
+                                   ingested=scan_ingested(INDEX_NAME))
+        finalize_build_index(es_client, build_index)
+        # Проекция нового индекса должна быть на диске до переключения алиаса: бэкенд, увидевший
+        # новый индекс за алиасом, проецирует запросы его проекцией
+        save_projection(indexer, build_index)
+    except Exception:
+        script_logger.error(f"Build of {build_index} failed, alias {INDEX_NAME} is left unchanged")
+        es_client.indices.delete(index=build_index)
+        raise
+    old_indices = swap_alias(es_client, INDEX_NAME, build_index, delete_old=not keep_old)
+    if not keep_old:
+        remove_projections(old_indices)
+    save_facets(facets)
+    script_logger.info(f"Alias {INDEX_NAME} switched to {build_index} (previous: {old_indices or 'none'})")
+    remove_stale_full_texts(seen_ids)
+
+
+def update_index(dataset_path: Path, batch_size: int = None, use_store: bool = True):
+    """Инкрементальное обновление: upsert новых и изменённых статей, удаление отсутствующих в датасете
+    (статьи из /ingest не удаляются)"""
+    target = current_index(es_client, INDEX_NAME)
+    script_logger.info(f"Incremental update of {target} via alias {INDEX_NAME}")
+    existing_hashes = fetch_content_hashes(INDEX_NAME)
+    # Запись в индекс за алиасом, а не в алиас: векторы проецируются проекцией именно этого индекса
+    indexer = with_projection(BulkIndexer(es_client, target, logger=script_logger), index_name=target)
+    facets = FacetIndex()
+    seen_ids = process_dataset(dataset_path, indexer, batch_size=batch_size, use_store=use_store,
+                               existing_hashes=existing_hashes, facets=facets)
+    # Снимок фасетов включает и статьи из /ingest: бэкенд добавляет к снимку только более поздние
+    facets.built_at = time.time()
+    for doc_id, source in scan_ingested(INDEX_NAME):
+        if doc_id not in seen_ids:
+            facets.add(source.get("metadata", {}))
+    save_facets(facets)
+
+
+def build_local_store(dataset_path: Path, batch_size: int = None, use_store: bool = True):
+    """Сборка локального индекса для SEARCH_BACKEND=local (всегда целиком, векторы берутся из хранилища)"""
+    path = get_local_store_path()
+    script_logger.info(f"Building local vector store {path} ({configuration.local_store_dtype})")
+    writer = with_projection(LocalStoreWriter(path, dtype=configuration.local_store_dtype, logger=script_logger))
+    facets = FacetIndex()
+    # Статьи из /ingest переносятся в новую версию: прежняя вместе с delta.jsonl удаляется при переключении,
+    # а добавленные после их чтения и до переключения в новую версию не попадут.
+    # Проекцию writer сохраняет в папке новой версии до переключения на неё
+    seen_ids = process_dataset(dataset_path, writer, batch_size=batch_size, use_store=use_store, facets=facets,
+                               ingested=read_local_ingested(path))
+    save_facets(facets)
+    script_logger.info(f"Local vector store {path} is ready")
+    remove_stale_full_texts(seen_ids)
+
+
+def remove_stale_full_texts(seen_ids):
+    """После полной сборки в хранилище полных текстов остаются только статьи датасета"""
+    text_store = get_full_text_store()
+    removed = text_store.retain(seen_ids)
+    script_logger.info(f"Full text store: removed {removed} stale texts, {text_store.stats()}")
+
+def select_dataset(csv_path: Path) -> Path:
+    """Подготовленный Parquet, если он есть и не старше CSV, иначе сам CSV (подготовка на лету)"""
+    prepared_path = default_prepared_path()
+    if prepared_path.is_file():
+        if not csv_path.is_file() or prepared_path.stat().st_mtime >= csv_path.stat().st_mtime:
+            return prepared_path
+        script_logger.warning(f"{prepared_path} is older than {csv_path}, reading CSV; run preprocess.py to update it")
+    return csv_path
 
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Заполнение векторной базы данных")
+    parser.add_argument("--mode", choices=["incremental", "rebuild"], default="incremental",
+                        help="incremental - обновить только новые/изменённые статьи, "
+                             "rebuild - собрать новый индекс и переключить на него алиас")
+    parser.add_argument("--batch-size", type=int, default=configuration.ingest_batch_size,
+                        help="Количество текстов (статей и пассажей), векторизуемых за один вызов эмбеддера")
+    parser.add_argument("--no-embedding-store", action="store_true",
+                        help="Не использовать локальное хранилище эмбеддингов и векторизовать всё заново")
+    parser.add_argument("--keep-old", action="store_true",
+                        help="Не удалять предыдущие версии индекса после переключения алиаса")
+    parser.add_argument("--dataset", type=Path, default=None,
+                        help="Parquet из preprocess.py или CSV (по умолчанию PREPARED_DATASET_FILENAME, "
+                             "если он не старше DATA_CSV_FILENAME, иначе CSV)")
+    parser.add_argument("--metrics-file",
+                        help="Записать метрики загрузки в файл в формате Prometheus (для textfile-коллектора)")
+    args = parser.parse_args()
+
     CSV_PATH = configuration.project_root / "data" / configuration.data_csv_filename
-    MAPPING_PATH = configuration.project_root / "data" / configuration.data_mapping_filename
-
-    with open(MAPPING_PATH, "r", encoding="utf-8") as json_mapfile:
-        elastic_mappings = json.load(json_mapfile)
-    
-    elastic_mappings["mappings"]["properties"]["vector"]["dims"] = get_embedding_dimension()
-    script_logger.info(f"Using embedding dimension: {get_embedding_dimension()}")
-    
-    if es_client.indices.exists(index=INDEX_NAME):
-        script_logger.info(f"Index {INDEX_NAME} found, refilling data")
-        es_client.indices.delete(index=INDEX_NAME)
-    else:
-        script_logger.info(f"Index {INDEX_NAME} not found, filling data")
-        es_client.indices.create(index=INDEX_NAME, body=elastic_mappings)
+    DATASET_PATH = args.dataset or select_dataset(CSV_PATH)
 
-    
-    # Проверка наличия файла (для теста создадим dummy файл, если нет)
-    if not os.path.exists(CSV_PATH):
-        script_logger.info(f"File {CSV_PATH} not found. Creating a CSV file with columns: id, title, authors, date, topics, text, link, summary")
+    # Проверка наличия файла
+    if not os.path.exists(DATASET_PATH):
+        script_logger.info(f"File {DATASET_PATH} not found. Creating a CSV file with columns: id, title, authors, date, topics, text, link, summary")
+    elif configuration.search_backend == "local":
+        build_local_store(DATASET_PATH, batch_size=args.batch_size, use_store=not args.no_embedding_store)
+    elif args.mode == "incremental" and current_index(es_client, INDEX_NAME) is not None:
+        update_index(DATASET_PATH, batch_size=args.batch_size, use_store=not args.no_embedding_store)
     else:
-        process_dataset(CSV_PATH)
\ No newline at end of file
+        if args.mode == "incremental":
+            script_logger.info(f"Index {INDEX_NAME} not found, running full build")
+        rebuild_index(DATASET_PATH, batch_size=args.batch_size, use_store=not args.no_embedding_store,
+                      keep_old=args.keep_old)
+
+    if args.metrics_file:
+        Path(args.metrics_file).write_text(registry.render(), encoding="utf-8")
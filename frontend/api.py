@@ -0,0 +1,70 @@
+import os
+from collections import OrderedDict
+from urllib.parse import quote
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+
+BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
+# (подключение, чтение) в секундах: первый запрос к бэкенду может ждать векторизацию
+BACKEND_TIMEOUT = (float(os.getenv("BACKEND_CONNECT_TIMEOUT", "3")), float(os.getenv("BACKEND_READ_TIMEOUT", "30")))
+SEARCH_CACHE_SIZE = int(os.getenv("FRONTEND_SEARCH_CACHE_SIZE", "32"))
+FACETS_CACHE_TTL = float(os.getenv("FRONTEND_FACETS_CACHE_TTL", "60"))
+
+
+# Общая для всех сессий Streamlit HTTP-сессия: соединения с бэкендом переиспользуются (keep-alive)
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=int(os.getenv("BACKEND_POOL_SIZE", "10")))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _search_cache():
+    # Кэш страниц выдачи текущей сессии пользователя (LRU ограниченного размера)
+    if "search_cache" not in st.session_state:
+        st.session_state.search_cache = OrderedDict()
+    return st.session_state.search_cache
+
+
+# Функция запроса страницы выдачи: одинаковые (запрос, фильтры, страница) берутся из кэша сессии
+def search_page(payload: dict, offset: int, cursor: str = None) -> dict:
+    key = (tuple(sorted(payload.items())), offset)
+    cache = _search_cache()
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+
+    response = get_http_session().post(f"{BACKEND_URL}/search/page",
+                                       json={**payload, "offset": offset, "cursor": cursor},
+                                       timeout=BACKEND_TIMEOUT)
+    response.raise_for_status()
+    page = response.json()
+
+    cache[key] = page
+    while len(cache) > SEARCH_CACHE_SIZE:
+        cache.popitem(last=False)
+    return page
+
+
+# Полный текст статьи запрашивается только по требованию пользователя и кэшируется на время работы фронтенда
+@st.cache_data(max_entries=SEARCH_CACHE_SIZE, show_spinner=False)
+def get_full_text(article_id: str) -> str:
+    response = get_http_session().get(f"{BACKEND_URL}/articles/{quote(article_id, safe='')}/full_text",
+                                      timeout=BACKEND_TIMEOUT)
+    response.raise_for_status()
+    return response.json()["full_text"]
+
+
+# Подсказки фильтров: одинаковые префиксы всех сессий отвечаются из кэша фронтенда
+@st.cache_data(ttl=FACETS_CACHE_TTL, max_entries=1024, show_spinner=False)
+def get_facets(field: str, prefix: str = "", limit: int = 20) -> dict:
+    response = get_http_session().get(f"{BACKEND_URL}/facets",
+                                      params={"field": field, "prefix": prefix, "limit": limit},
+                                      timeout=BACKEND_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
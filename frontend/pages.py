@@ -1,5 +1,11 @@
+import datetime
 import streamlit as st
 import requests
+from api import get_facets, get_full_text, search_page
+
+# Сколько подсказок показывать для автора и сколько самых частых тегов предлагать
+AUTHOR_SUGGESTIONS = 10
+TAG_SUGGESTIONS = 100
 
 
 # Функция для страницы описания сервиса
@@ -32,26 +38,87 @@ def show_description_page():
         st.rerun()
 
 
+# Функция загрузки страницы выдачи в состояние сессии
+def load_search_page(offset):
+    payload = st.session_state.search_payload
+    current = st.session_state.search_page
+    cursor = current['cursor'] if current else None
+    with st.spinner('ИИ анализирует базу знаний...'):
+        try:
+            st.session_state.search_page = search_page(payload, offset, cursor)
+            return True
+        except requests.exceptions.ConnectionError:
+            st.error("Не удалось подключиться к серверу поиска (Backend недоступен).")
+        except requests.exceptions.Timeout:
+            st.error("Сервер поиска не ответил вовремя, попробуйте ещё раз.")
+        except requests.exceptions.HTTPError as e:
+            st.error(f"Ошибка сервера: {e.response.text}")
+        except Exception as e:
+            st.error(f"Произошла ошибка: {str(e)}")
+    return False
+
+
+# Функция запроса подсказок фильтров: без фасетов поля фильтров работают как обычный ввод
+def load_facets(field, prefix="", limit=20):
+    try:
+        return get_facets(field, prefix, limit)
+    except requests.exceptions.RequestException:
+        return None
+
+
+# Границы дат публикации статей базы по гистограмме дат
+def date_bounds():
+    facets = load_facets("dates", limit=1)
+    if not facets or not facets['dates']:
+        return None, None
+    first, last = facets['dates'][0]['key'], facets['dates'][-1]['key']
+    year, month = map(int, last.split("-"))
+    # Последний день последнего месяца
+    next_month = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return datetime.date.fromisoformat(f"{first}-01"), next_month - datetime.timedelta(days=1)
+
+
 # Функция для страницы поиска статей
 def show_search_page():
     st.title("Поиск научных статей")
     st.write(f"Привет, {st.session_state.username}! Здесь вы можете искать статьи.")
     
     # Initialize session state for results
-    if 'search_results' not in st.session_state:
-        st.session_state.search_results = None
+    if 'search_page' not in st.session_state:
+        st.session_state.search_page = None
+        st.session_state.search_payload = None
     
     # Фильтры
     st.subheader("Фильтры")
     col1, col2, col3, col4 = st.columns(4)
     with col1:
         author_filter = st.text_input("Автор", key="author_filter")
+        # Подсказки по началу имени: выбор известного автора вместо угадывания написания
+        if author_filter.strip():
+            facets = load_facets("authors", author_filter, AUTHOR_SUGGESTIONS)
+            if facets is not None and not facets['authors']:
+                st.caption("Авторов с таким именем в базе нет.")
+            elif facets is not None:
+                counts = {item['value']: item['count'] for item in facets['authors']}
+                author_choice = st.selectbox("Подходящие авторы", list(counts), index=None,
+                                             format_func=lambda name: f"{name} ({counts[name]})",
+                                             placeholder="Выберите автора", key="author_choice")
+                author_filter = author_choice or author_filter
+    min_date, max_date = date_bounds()
     with col2:
-        date_from = st.date_input("Дата от", value=None, key="date_from")
+        date_from = st.date_input("Дата от", value=None, min_value=min_date, max_value=max_date, key="date_from")
     with col3:
-        date_to = st.date_input("Дата до", value=None, key="date_to")
+        date_to = st.date_input("Дата до", value=None, min_value=min_date, max_value=max_date, key="date_to")
     with col4:
-        tags_filter = st.text_input("Теги", key="tags_filter")
+        # Самые частые теги с числом статей; ввод фильтрует список, можно ввести и свой тег
+        facets = load_facets("tags", limit=TAG_SUGGESTIONS)
+        if facets is not None and facets['tags']:
+            counts = {item['value']: item['count'] for item in facets['tags']}
+            tags_filter = st.selectbox("Теги", list(counts), index=None, accept_new_options=True,
+                                       format_func=lambda tag: f"{tag} ({counts[tag]})" if tag in counts else tag,
+                                       placeholder="Любой тег", key="tags_filter")
+        else:
+            tags_filter = st.text_input("Теги", key="tags_filter")
     
     # Поиск
     st.subheader("Поиск")
@@ -59,45 +126,31 @@ def show_search_page():
     col1, col2 = st.columns(2)
     with col1:
         query = st.text_input("Введите запрос (например, 'машинное обучение в медицине')", key="query")
+    with col2:
+        page_size = st.selectbox("Результатов на странице", [5, 10, 20], key="page_size")
     
     if st.button("Начать поиск", key="search_btn"):
         if query.strip():
-            with st.spinner('ИИ анализирует базу знаний...'):
-                try:
-                    # Подготовка данных для API
-                    payload = {
-                        "query": query,
-                        "top_k": 5,
-                        "author_filter": author_filter if author_filter else None,
-                        "date_from": str(date_from) if date_from else None,
-                        "date_to": str(date_to) if date_to else None,
-                        "tags_filter": tags_filter if tags_filter else None
-                    }
-
-                    # Запрос к Backend API
-                    response = requests.post("http://localhost:8000/search", json=payload)
-                    
-                    if response.status_code == 200:
-                        results = response.json()
-                        st.success(f"Найдено результатов: {len(results)}")
-                        
-                        if results:
-                            st.session_state.search_results = results
-                        else:
-                            st.info("По вашему запросу ничего не найдено в векторной базе.")
-                    else:
-                        st.error(f"Ошибка сервера: {response.text}")
-                        
-                except requests.exceptions.ConnectionError:
-                    st.error("Не удалось подключиться к серверу поиска (Backend недоступен).")
-                except Exception as e:
-                    st.error(f"Произошла ошибка: {str(e)}")
+            # Подготовка данных для API
+            st.session_state.search_payload = {
+                "query": query,
+                "top_k": page_size,
+                "author_filter": author_filter if author_filter else None,
+                "date_from": str(date_from) if date_from else None,
+                "date_to": str(date_to) if date_to else None,
+                "tags_filter": tags_filter if tags_filter else None
+            }
+            load_search_page(0)
         else:
             st.warning("Введите запрос для поиска.")
     
-    if st.session_state.search_results:
-        st.write("**Найденные статьи:**")
-        for res in st.session_state.search_results:
+    page = st.session_state.search_page
+    if page is not None and not page['results']:
+        st.info("По вашему запросу ничего не найдено в векторной базе.")
+    elif page is not None:
+        first = page['offset'] + 1
+        st.write(f"**Найденные статьи {first}–{page['offset'] + len(page['results'])}:**")
+        for res in page['results']:
             col1, col2 = st.columns([3, 1])
             with col1:
                 score_percent = round(res['similarity_score'] * 100, 1) # Условная конвертация для наглядности
@@ -108,8 +161,30 @@ def show_search_page():
             with col2:
                 with st.expander("Аннотация"):
                     st.write(res['abstract'])
+            # Полный текст не приходит в выдаче и загружается отдельным запросом при включении
+            if st.toggle("Полный текст", key=f"full_text_{res['id']}"):
+                try:
+                    st.write(get_full_text(res['id']))
+                except requests.exceptions.HTTPError as e:
+                    if e.response.status_code == 404:
+                        st.info("Полный текст статьи недоступен.")
+                    else:
+                        st.error(f"Ошибка сервера: {e.response.text}")
+                except requests.exceptions.RequestException:
+                    st.error("Не удалось загрузить полный текст статьи.")
             st.divider()
 
+        # Пагинация: следующие страницы берутся из сохранённой на бэкенде выдачи по курсору
+        col1, col2 = st.columns(2)
+        with col1:
+            if page['offset'] > 0 and st.button("← Предыдущая страница", key="prev_page"):
+                if load_search_page(max(page['offset'] - st.session_state.search_payload['top_k'], 0)):
+                    st.rerun()
+        with col2:
+            if page['next_offset'] is not None and st.button("Следующая страница →", key="next_page"):
+                if load_search_page(page['next_offset']):
+                    st.rerun()
+
     # Кнопка назад к описанию
     if st.button("Вернуться к описанию"):
         st.session_state.page = "description"
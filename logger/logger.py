@@ -1,6 +1,10 @@
+import atexit
 import logging
 import logging.config
+import logging.handlers
 import json
+import queue
+import random
 from datetime import datetime
 from pathlib import Path
 
@@ -9,13 +13,63 @@ from pathlib import Path
 class JSONFormatter(logging.Formatter):
     def format(self, record):
         log_record = {
-            "time": datetime.now().isoformat(),
+            # Время создания записи, а не записи в файл: форматирование выполняется в фоновом потоке
+            "time": datetime.fromtimestamp(record.created).isoformat(),
             "name": record.name,
             "level": record.levelname,
             "message": record.getMessage(),
         }
         return json.dumps(log_record, ensure_ascii=False)
 
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler, который при переполненной очереди отбрасывает запись, а не блокирует вызывающий поток"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_queue_listener = None
+
+
+def _setup_queue(queue_config: dict):
+    """Переносит обработчики корневого логгера в фоновый QueueListener.
+
+    В корневом логгере остаётся только DroppingQueueHandler: вызовы логгера в обработчиках запросов
+    лишь кладут запись в очередь, а форматирование (json.dumps) и запись в файл выполняет поток listener'а.
+    """
+    global _queue_listener
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    if not handlers:
+        return
+
+    log_queue = queue.Queue(maxsize=queue_config.get("maxsize", 0))
+    queue_handler = DroppingQueueHandler(log_queue)
+    for handler in handlers:
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+
+    _queue_listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _queue_listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописывает оставшиеся в очереди записи и останавливает фоновый поток"""
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()
+        _queue_listener = None
+
+
 def setup_logging(config_path: Path):
     logs_folder = Path("logs")
     if not logs_folder.is_dir():
@@ -25,7 +79,24 @@ def setup_logging(config_path: Path):
         config = json.load(f)
 
     config["formatters"]["json"]["()"] = JSONFormatter
+    # Ключ "queue" не входит в схему dictConfig: обрабатываем его сами
+    queue_config = config.pop("queue", None)
 
     logging.config.dictConfig(config)
 
+    if queue_config and queue_config.get("enabled", True):
+        _setup_queue(queue_config)
+
+
+def sampled(rate: float) -> bool:
+    """Решение о логировании для доли rate запросов (0 - никогда, 1 - всегда)"""
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... [{len(text) - limit} chars truncated]"
+
+
 back_logger = logging.getLogger("backend_logger")
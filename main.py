@@ -1,4 +1,4 @@
-from logger.logger import setup_logging, back_logger
+from logger.logger import setup_logging, back_logger, sampled
 from config.config import configuration
 
 logger_config_path = configuration.project_root / "logger_config.json"
@@ -6,12 +6,19 @@ setup_logging(
     config_path=logger_config_path
 )
 
+import math
 import time
 import uvicorn
 from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 import backend.endpoints as endpoints
 
-from backend.external import es_client
+from backend.search_backends import get_search_backend
+from backend.metrics import http_request_seconds, http_requests, server_timing_header, start_request_timing
+from backend.batcher import query_batcher
+from backend.startup import embedder_loader
+from backend.embedding_server import get_embedding_client
+from backend.admission import DeadlineExceeded, Overloaded
 from contextlib import asynccontextmanager
 
 
@@ -19,29 +26,70 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # startup
+    await query_batcher.start()
+    # Модель загружается и прогревается в фоне; до готовности /readyz отвечает 503
+    await embedder_loader.start(background=configuration.embedder_background_load)
     yield
     # shutdown
-    await es_client.close()
+    await embedder_loader.stop()
+    await query_batcher.stop()
+    if get_embedding_client() is not None:
+        await get_embedding_client().close()
+    await get_search_backend().close()
 
 app = FastAPI(title="AI Science Finder Backend", lifespan=lifespan)
 
+def should_log_body(request: Request) -> bool:
+    """Тело буферизуется для лога только у выбранных запросов известного и небольшого размера"""
+    # Потоковые NDJSON-запросы (/ingest/batch) и тела без Content-Length не буферизуем ради логирования
+    if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+        return False
+    content_length = request.headers.get("content-length")
+    if content_length is None or not content_length.isdigit():
+        return False
+    if int(content_length) == 0 or int(content_length) > configuration.log_body_max_bytes:
+        return False
+    return sampled(configuration.log_body_sample_rate)
+
+
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    request_body = await request.body()
-    back_logger.info(f"Request body: {request_body.decode('utf-8', errors='ignore')[:500]}")
-    
-    async def receive():
-        return {"type": "http.request", "body": request_body, "more_body": False}
-    
-    request = Request(request.scope, receive=receive)
-    
-    start_time = time.time()
+    if should_log_body(request):
+        # Starlette кэширует прочитанное тело и передаёт его обработчику запроса
+        request_body = await request.body()
+        back_logger.info("Request body: %s",
+                         request_body.decode("utf-8", errors="ignore")[:configuration.log_body_max_chars])
+
+    timings = start_request_timing()
+    start_time = time.perf_counter()
     response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    back_logger.info(f"{request.method} {request.url} | {response.status_code} | {response.headers.get('content-type', 'N/A')} | {response.headers.get('content-length', 'N/A')} | {process_time:.4f}s")
+    process_time = time.perf_counter() - start_time
+
+    if configuration.metrics_enabled:
+        # Шаблон маршрута, а не фактический путь: число рядов метрик не зависит от параметров в URL
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        http_requests.inc(method=request.method, route=route, status=response.status_code)
+        http_request_seconds.observe(process_time, method=request.method, route=route)
+    if configuration.server_timing_enabled:
+        response.headers["Server-Timing"] = server_timing_header(timings, process_time)
+
+    back_logger.info("%s %s | %s | %s | %s | %.4fs", request.method, request.url, response.status_code,
+                     response.headers.get("content-type", "N/A"), response.headers.get("content-length", "N/A"),
+                     process_time)
     return response
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded):
+    # Быстрый отказ вместо ожидания в очереди: клиент повторит запрос через Retry-After секунд
+    return JSONResponse(status_code=503, content={"detail": str(exc)},
+                        headers={"Retry-After": str(math.ceil(exc.retry_after))})
+
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
 app.include_router(endpoints.router)
 
 if __name__ == "__main__":
@@ -0,0 +1,34 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+
+from backend.dataset import default_prepared_path, write_prepared_dataset
+from config.config import configuration
+
+# Подготовка датасета для fill_vdb.py: CSV -> типизированный Parquet (backend.dataset).
+# Даты, теги и авторы нормализуются колоночными операциями один раз, а не при каждой переиндексации;
+# отклонённые строки (без аннотации, без даты или с неразборчивой датой, с повтором id) пишутся в отчёт.
+
+logging.basicConfig(level=logging.INFO, format="%(levelname)s | %(asctime)s | %(name)s | %(message)s")
+script_logger = logging.getLogger("preprocess")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Подготовка датасета статей в Parquet")
+    parser.add_argument("--csv", type=Path, default=configuration.project_root / "data" / configuration.data_csv_filename,
+                        help="Исходный CSV (по умолчанию DATA_CSV_FILENAME)")
+    parser.add_argument("--output", type=Path, default=default_prepared_path(),
+                        help="Подготовленный датасет (по умолчанию PREPARED_DATASET_FILENAME)")
+    parser.add_argument("--rejects", type=Path, default=None,
+                        help="CSV отклонённых строк: номер строки, id, причина (по умолчанию рядом с --output)")
+    parser.add_argument("--chunk-size", type=int, default=configuration.csv_chunk_size,
+                        help="Количество строк CSV, обрабатываемых за раз")
+    args = parser.parse_args()
+
+    rejects_path = args.rejects or args.output.with_suffix(".rejects.csv")
+    start = time.perf_counter()
+    stats = write_prepared_dataset(args.csv, args.output, rejects_path, chunk_size=args.chunk_size)
+    script_logger.info(f"Prepared {stats['articles']} articles from {args.csv} into {args.output} "
+                       f"in {time.perf_counter() - start:.2f}s")
+    script_logger.info(f"Rejected {stats['rejected']} rows {stats['rejected_by_reason']}, see {rejects_path}")